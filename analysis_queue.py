@@ -0,0 +1,228 @@
+"""LLM 分析工作佇列 - 以 Postgres 資料表保存，多個工作者以 FOR UPDATE SKIP LOCKED 領取."""
+
+import random
+from datetime import datetime, timedelta
+import uuid
+from typing import Any, Dict, Iterable, List, Tuple
+
+from loguru import logger
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from config import settings
+from database import db_manager
+from models import AnalysisJob, PTTArticle
+
+# 工作優先順序
+PRIORITY_BACKFILL = 0  # 補分析既有文章
+PRIORITY_CRAWL_FAILED = 10  # 爬蟲當下分析失敗的新文章
+
+# 分析結果對應的文章欄位（批次 upsert 時一併更新）
+ANALYSIS_COLUMNS = (
+    'analysis_result', 'analysis_time', 'recommended_stocks', 'analysis_reason',
+    'llm_sentiment', 'llm_sectors', 'llm_strategy', 'llm_risk_level', 'is_analyzed'
+)
+
+def analysis_fields(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """將 LLM 分析結果轉為文章欄位值."""
+    return {
+        'analysis_result': analysis,
+        'analysis_time': datetime.utcnow(),
+        'recommended_stocks': analysis.get('recommended_stocks'),
+        'analysis_reason': analysis.get('reason'),
+        'llm_sentiment': analysis.get('sentiment'),
+        'llm_sectors': analysis.get('sectors'),
+        'llm_strategy': analysis.get('strategy'),
+        'llm_risk_level': analysis.get('risk_level'),
+        'is_analyzed': True
+    }
+
+def apply_analysis_result(article: PTTArticle, analysis: Dict[str, Any]):
+    """將 LLM 分析結果寫入文章欄位."""
+    for column, value in analysis_fields(analysis).items():
+        setattr(article, column, value)
+
+class AnalysisQueue:
+    """分析工作佇列操作."""
+
+    async def enqueue(self, article_ids: Iterable[str], priority: int = PRIORITY_BACKFILL) -> int:
+        """加入工作；已存在的未完成工作提高優先順序，已失敗的工作重新排隊。回傳新增或重新排隊的數量."""
+        article_ids = list(dict.fromkeys(article_ids))
+        if not article_ids:
+            return 0
+
+        queued = 0
+        try:
+            async with db_manager.get_async_session() as session:
+                existing = {
+                    job.article_id: job
+                    for job in (await session.scalars(
+                        select(AnalysisJob).where(AnalysisJob.article_id.in_(article_ids))
+                    )).all()
+                }
+                now = datetime.utcnow()
+                for job in existing.values():
+                    if job.status in ("failed", "done"):
+                        job.status = "pending"
+                        job.priority = priority
+                        job.attempts = 0
+                        job.next_run_at = now
+                        job.last_error = None
+                        queued += 1
+                    else:
+                        job.priority = max(job.priority, priority)
+                
+                # 並行加入的相同文章由唯一鍵略過，不影響同批其他工作
+                new_ids = [article_id for article_id in article_ids if article_id not in existing]
+                batch_size = max(1, settings.db_upsert_batch_size)
+                for offset in range(0, len(new_ids), batch_size):
+                    inserted = (await session.scalars(
+                        insert(AnalysisJob).values([
+                            {
+                                'id': uuid.uuid4(), 'article_id': article_id, 'status': 'pending',
+                                'priority': priority, 'attempts': 0,
+                                'max_attempts': settings.analysis_job_max_attempts,
+                                'next_run_at': now, 'created_at': now, 'updated_at': now
+                            }
+                            for article_id in new_ids[offset:offset + batch_size]
+                        ]).on_conflict_do_nothing(index_elements=[AnalysisJob.article_id]).returning(AnalysisJob.article_id)
+                    )).all()
+                    queued += len(inserted)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error enqueueing analysis jobs: {e}")
+            return 0
+
+        if queued:
+            logger.info(f"Enqueued {queued} analysis jobs (priority={priority})")
+        return queued
+
+    async def enqueue_unanalyzed(self) -> int:
+        """將所有尚未分析、也沒有待處理工作的文章加入佇列."""
+        try:
+            async with db_manager.get_async_session() as session:
+                article_ids = (await session.scalars(
+                    select(PTTArticle.article_id).outerjoin(
+                        AnalysisJob, AnalysisJob.article_id == PTTArticle.article_id
+                    ).where(
+                        PTTArticle.is_analyzed == False,
+                        or_(AnalysisJob.id == None, AnalysisJob.status.in_(("done", "failed")))
+                    )
+                )).all()
+        except Exception as e:
+            logger.error(f"Error finding unanalyzed articles: {e}")
+            return 0
+        return await self.enqueue(article_ids, PRIORITY_BACKFILL)
+
+    async def enqueue_prefiltered(self) -> int:
+        """將預篩後未送 LLM 的文章加入佇列，改以 LLM 重新分析."""
+        try:
+            async with db_manager.get_async_session() as session:
+                article_ids = (await session.scalars(
+                    select(PTTArticle.article_id).where(
+                        PTTArticle.analysis_result['prefiltered'].as_boolean() == True
+                    )
+                )).all()
+        except Exception as e:
+            logger.error(f"Error finding prefiltered articles: {e}")
+            return 0
+        return await self.enqueue(article_ids, PRIORITY_BACKFILL)
+
+    async def claim(self, batch_size: int = None) -> List[Tuple[uuid.UUID, str]]:
+        """領取一批到期的工作（含逾時未完成的 running 工作），回傳 [(job_id, article_id)]."""
+        batch_size = batch_size or settings.analysis_job_batch_size
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.analysis_job_lock_timeout_seconds)
+        try:
+            async with db_manager.get_async_session() as session:
+                jobs = (await session.scalars(
+                    select(AnalysisJob).where(
+                        or_(
+                            and_(AnalysisJob.status == "pending", AnalysisJob.next_run_at <= now),
+                            and_(AnalysisJob.status == "running", AnalysisJob.locked_at < stale_before)
+                        )
+                    ).order_by(
+                        AnalysisJob.priority.desc(),
+                        AnalysisJob.next_run_at.asc()
+                    ).limit(batch_size).with_for_update(skip_locked=True)
+                )).all()
+
+                claimed = []
+                for job in jobs:
+                    job.status = "running"
+                    job.locked_at = now
+                    job.attempts += 1
+                    claimed.append((job.id, job.article_id))
+                await session.commit()
+                return claimed
+        except Exception as e:
+            logger.error(f"Error claiming analysis jobs: {e}")
+            return []
+
+    async def complete(self, job_id: uuid.UUID):
+        """標記工作完成."""
+        try:
+            async with db_manager.get_async_session() as session:
+                job = await session.get(AnalysisJob, job_id)
+                if job is not None:
+                    job.status = "done"
+                    job.locked_at = None
+                    job.last_error = None
+                    await session.commit()
+        except Exception as e:
+            logger.error(f"Error completing analysis job {job_id}: {e}")
+
+    def _backoff(self, attempts: int) -> float:
+        """指數退避秒數（加入隨機抖動避免同時重試）."""
+        delay = min(
+            settings.analysis_job_backoff_max_seconds,
+            settings.analysis_job_backoff_seconds * (2 ** max(attempts - 1, 0))
+        )
+        return delay * random.uniform(0.5, 1.0)
+
+    async def fail(self, job_id: uuid.UUID, error: str):
+        """記錄失敗；未超過次數上限時依指數退避重新排隊."""
+        try:
+            async with db_manager.get_async_session() as session:
+                job = await session.get(AnalysisJob, job_id)
+                if job is None:
+                    return
+                job.last_error = error[:1000]
+                job.locked_at = None
+                if job.attempts >= job.max_attempts:
+                    job.status = "failed"
+                    logger.error(f"Analysis job for {job.article_id} failed permanently: {error}")
+                else:
+                    job.status = "pending"
+                    job.next_run_at = datetime.utcnow() + timedelta(seconds=self._backoff(job.attempts))
+                    logger.warning(f"Analysis job for {job.article_id} retry at {job.next_run_at}: {error}")
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error failing analysis job {job_id}: {e}")
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """取得各狀態的工作數量."""
+        try:
+            async with db_manager.get_async_session() as session:
+                counts = dict((await session.execute(
+                    select(AnalysisJob.status, func.count(AnalysisJob.id)).group_by(AnalysisJob.status)
+                )).all())
+                due = await session.scalar(
+                    select(func.count(AnalysisJob.id)).where(
+                        AnalysisJob.status == "pending",
+                        AnalysisJob.next_run_at <= datetime.utcnow()
+                    )
+                )
+            return {
+                "pending": counts.get("pending", 0),
+                "due": due,
+                "running": counts.get("running", 0),
+                "done": counts.get("done", 0),
+                "failed": counts.get("failed", 0)
+            }
+        except Exception as e:
+            logger.error(f"Error getting analysis queue stats: {e}")
+            return {}
+
+# 創建全局實例
+analysis_queue = AnalysisQueue()
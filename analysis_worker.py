@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""LLM 分析背景工作者 - 分批領取 analysis_jobs 並寫回文章分析結果.
+
+用法:
+    python analysis_worker.py                 # 持續執行（PM2: chaser-analysis-worker）
+    python analysis_worker.py --drain         # 處理完目前到期的工作後結束
+    python analysis_worker.py --enqueue-missing --drain   # 先將所有未分析文章加入佇列
+    python analysis_worker.py --promote-prefiltered       # 預篩略過的文章改送 LLM 分析
+"""
+
+import argparse
+import asyncio
+import uuid
+from typing import Dict, Any
+
+from loguru import logger
+from sqlalchemy import select, update
+
+from analysis_queue import analysis_queue, analysis_fields
+from article_analyzer import analyzer
+from article_stocks import replace_article_stocks
+from author_profiles import update_author_profiles
+from config import settings
+from database import db_manager
+from http_client import http_client
+from models import PTTArticle
+
+class AnalysisWorker:
+    """從分析工作佇列領取工作並執行 LLM 分析."""
+
+    def __init__(self):
+        self.queue = analysis_queue
+        self.analyzer = analyzer
+        self.running = False
+        self.succeeded = 0
+        self.failed = 0
+
+    async def _process_job(self, job_id: uuid.UUID, article_id: str):
+        """分析單篇文章；分析失敗時交回佇列退避重試."""
+        try:
+            async with db_manager.get_async_session() as session:
+                article = await session.scalar(select(PTTArticle).where(PTTArticle.article_id == article_id))
+            if article is None:
+                await self.queue.complete(job_id)
+                return
+
+            # 佇列中的文章都已確定要交給 LLM（含預篩後補送的文章）
+            analysis = await self.analyzer._analyze_content(article, force_llm=True)
+            if not analysis or analysis.get("failed"):
+                self.failed += 1
+                await self.queue.fail(job_id, (analysis or {}).get("reason", "analysis failed"))
+                return
+
+            fields = analysis_fields(analysis)
+            async with db_manager.get_async_session() as session:
+                # 只有由未分析轉為已分析的那一次計入作者的已分析數，並行的寫入不會重複計算
+                newly_analyzed = (await session.execute(
+                    update(PTTArticle).where(
+                        PTTArticle.article_id == article_id, PTTArticle.is_analyzed == False
+                    ).values(**fields).returning(PTTArticle.article_id)
+                )).first() is not None
+                if not newly_analyzed:
+                    # 已分析的文章（預篩後補送，或已由爬蟲寫入分析）直接覆寫結果
+                    await session.execute(
+                        update(PTTArticle).where(PTTArticle.article_id == article_id).values(**fields)
+                    )
+                # 推薦標的與情緒改變，一併更新 article_stocks 與作者最常提及的股票
+                stock_deltas = {}
+                await replace_article_stocks(session, [{
+                    'article_id': article.article_id,
+                    'author': article.author,
+                    'publish_time': article.publish_time,
+                    'stock_symbols': article.stock_symbols,
+                    'stock_mentions': article.stock_mentions,
+                    **fields
+                }], stock_deltas)
+                await update_author_profiles(
+                    session, [], [article.author] if newly_analyzed else [], stock_deltas
+                )
+                await session.commit()
+            await self.queue.complete(job_id)
+            self.succeeded += 1
+        except Exception as e:
+            logger.error(f"Error processing analysis job for {article_id}: {e}")
+            self.failed += 1
+            await self.queue.fail(job_id, str(e))
+
+    async def run_batch(self) -> int:
+        """領取並並發處理一批工作，回傳工作數量."""
+        jobs = await self.queue.claim()
+        if jobs:
+            # 實際送往 Ollama 的並發由分析器的工作池控制
+            await asyncio.gather(*(self._process_job(job_id, article_id) for job_id, article_id in jobs))
+        return len(jobs)
+
+    async def drain(self) -> Dict[str, Any]:
+        """處理所有到期工作直到佇列為空."""
+        processed = 0
+        while True:
+            count = await self.run_batch()
+            if not count:
+                break
+            processed += count
+        logger.info(f"Analysis backlog drained: {processed} jobs ({self.succeeded} succeeded, {self.failed} failed)")
+        return {"processed_count": processed, "succeeded": self.succeeded, "failed": self.failed}
+
+    async def run_forever(self):
+        """持續處理工作，佇列為空時等待下一次輪詢."""
+        self.running = True
+        logger.info("Analysis worker started")
+        while self.running:
+            try:
+                if not await self.run_batch():
+                    await asyncio.sleep(settings.analysis_job_poll_seconds)
+            except Exception as e:
+                logger.error(f"Analysis worker error: {e}")
+                await asyncio.sleep(settings.analysis_job_poll_seconds)
+
+async def main():
+    parser = argparse.ArgumentParser(description="LLM analysis backlog worker")
+    parser.add_argument("--drain", action="store_true", help="處理完到期的工作後結束")
+    parser.add_argument("--enqueue-missing", action="store_true", help="將所有未分析的文章加入佇列")
+    parser.add_argument("--promote-prefiltered", action="store_true", help="將預篩後未送 LLM 的文章加入佇列")
+    args = parser.parse_args()
+
+    db_manager.create_tables()
+    worker = AnalysisWorker()
+    try:
+        await analyzer.warm_up()
+        if args.enqueue_missing:
+            await analysis_queue.enqueue_unanalyzed()
+        if args.promote_prefiltered:
+            await analysis_queue.enqueue_prefiltered()
+        if args.drain:
+            await worker.drain()
+        else:
+            await worker.run_forever()
+    finally:
+        await analyzer.worker_pool.shutdown()
+        await http_client.close()
+        await db_manager.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,11 +3,289 @@
 import json
 import asyncio
 import aiohttp
-from typing import Dict, Any, Optional
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Any, Optional
 from loguru import logger
-from models import PTTArticle
+from sqlalchemy import delete, func, select
+from models import PTTArticle, AnalysisCache
 import os
+import platform
 from system_detector import system_detector
+from http_client import http_client
+from cache import TTLLRUCache
+from config import settings
+from database import db_manager
+from relevance_filter import relevance_filter
+
+# 提示詞模板；修改內容時必須調整 PROMPT_VERSION，舊的快取結果才不會被沿用
+PROMPT_VERSION = "1"
+PROMPT_CONTENT_CHARS = 300  # 只送出文章前 300 字
+# 專業化提示詞，增加分析深度
+PROMPT_TEMPLATE = """你是一位資深的證券研究分析師，熟悉台灣與國際股市的新聞解讀與市場心理。忽略政治立場或網路俚語，只分析對股票市場的潛在影響，只用繁體中文回覆並以 JSON 格式輸出：
+
+請從技術面、基本面、消息面三個角度分析以下股票文章，並只返回JSON格式，不要其他文字：
+
+{content}
+
+必須返回以下JSON格式：
+{{"recommended_stocks":["股票代碼"],"sentiment":"pos/neg/neu","reason":"分析原因","sectors":["產業類別"],"strategy":"投資策略","risk_level":"low/medium/high"}}
+
+分析要求：
+- 情緒分析請考慮：市場恐慌程度、投資人信心、資金流向、外資動向
+- 風險等級請考慮：市場風險、流動性風險、政策風險、個股風險
+- 投資策略請包含：進場時機、停損點位、目標價位、持有期間
+- 產業類別請包含：主要產業、次產業、相關概念股、上下游供應鏈"""
+
+class JSONObjectScanner:
+    """逐段接收串流文字，追蹤括號深度與字串狀態，頂層物件完整且可解析時回傳."""
+    
+    def __init__(self):
+        self.text = ""
+        self.start: Optional[int] = None  # 目前頂層物件的起點
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+    
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """加入一段文字，取得第一個完整的頂層 JSON 物件（尚未完成時回傳 None）."""
+        offset = len(self.text)
+        self.text += chunk
+        for index in range(offset, len(self.text)):
+            char = self.text[index]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.start is not None:
+                    self.in_string = True
+            elif char == '{':
+                if self.start is None:
+                    self.start = index
+                self.depth += 1
+            elif char == '}' and self.start is not None:
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        candidate = json.loads(self.text[self.start:index + 1])
+                    except json.JSONDecodeError:
+                        candidate = None
+                    if isinstance(candidate, dict):
+                        return candidate
+                    # 不是合法物件，繼續尋找下一個
+                    self.start = None
+        return None
+
+class AnalysisWorkerPool:
+    """LLM 分析工作池：以 AIMD 依延遲與吞吐量調整同時送往 Ollama 的請求數."""
+    
+    def __init__(
+        self,
+        handler: Callable[[str], Awaitable[Dict[str, Any]]],
+        timeout_result: Callable[[], Dict[str, Any]]
+    ):
+        self.handler = handler
+        self.timeout_result = timeout_result  # 重試用盡後回傳的預設結果
+        self.min_concurrency = max(1, settings.llm_min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, settings.llm_max_concurrency or self._hardware_concurrency())
+        self.limit = float(self.min_concurrency)
+        self.active = 0
+        self.queue: Optional[asyncio.Queue] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.tasks: set = set()  # 進行中的工作與喚醒任務；事件迴圈只以弱參照保存 task
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.slot_available: Optional[asyncio.Condition] = None
+        
+        # 延遲與吞吐量量測（每個調整視窗重新計算）
+        self.baseline_latency: Optional[float] = None
+        self.window_started = time.monotonic()
+        self.window_latencies = []
+        self.window_timeouts = 0
+        self.last_throughput = 0.0
+        
+        # 統計資料
+        self.completed = 0
+        self.timeouts = 0
+        self.requeued = 0
+        self.failed = 0
+    
+    @staticmethod
+    def _hardware_info() -> Dict[str, Any]:
+        """取得（或檢測）硬體資訊."""
+        return system_detector.system_info or system_detector.detect_system()
+    
+    def _hardware_concurrency(self) -> int:
+        """依硬體決定並發上限：GPU 可並行解碼，CPU 推論每個請求至少保留兩個實體核心."""
+        info = self._hardware_info()
+        if (info.get("gpu") or {}).get("total_vram_gb", 0) > 0:
+            return 4
+        cores = (info.get("cpu") or {}).get("physical_cores") or 1
+        return max(1, cores // 2)
+    
+    def threads_per_request(self) -> int:
+        """每個請求的 num_thread：實體核心平均分給並發上限（固定值，避免 Ollama 重新載入模型）."""
+        cores = (self._hardware_info().get("cpu") or {}).get("physical_cores") or 1
+        return max(1, cores // self.max_concurrency)
+    
+    def _ensure_started(self):
+        """在目前的事件迴圈啟動派送工作（事件迴圈更換時重建）."""
+        loop = asyncio.get_running_loop()
+        if self.loop is loop and self.dispatcher and not self.dispatcher.done():
+            return
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.slot_available = asyncio.Condition()
+        self.active = 0
+        self.tasks = set()
+        self.dispatcher = loop.create_task(self._dispatch())
+    
+    def _spawn(self, coro: Awaitable) -> asyncio.Task:
+        """建立背景任務並保留參照直到完成，避免執行中被垃圾回收."""
+        task = self.loop.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+    
+    async def shutdown(self):
+        """停止派送並取消進行中與排隊中的工作，等待中的呼叫者會收到 CancelledError."""
+        if self.loop is not asyncio.get_running_loop():
+            # 其他（已結束的）事件迴圈的任務無法在此等待
+            self.dispatcher = None
+            self.tasks = set()
+            return
+        
+        tasks = list(self.tasks)
+        if self.dispatcher is not None:
+            tasks.append(self.dispatcher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        while not self.queue.empty():
+            job = self.queue.get_nowait()
+            if not job["future"].done():
+                job["future"].cancel()
+        self.dispatcher = None
+    
+    async def submit(self, content: str) -> Dict[str, Any]:
+        """送出分析工作並等待結果."""
+        self._ensure_started()
+        future = self.loop.create_future()
+        await self.queue.put({"content": content, "future": future, "attempts": 0})
+        return await future
+    
+    async def _dispatch(self):
+        """依目前的並發上限從佇列取出工作執行."""
+        while True:
+            job = await self.queue.get()
+            async with self.slot_available:
+                await self.slot_available.wait_for(lambda: self.active < int(self.limit))
+                self.active += 1
+            self._spawn(self._run_job(job))
+    
+    async def _run_job(self, job: Dict[str, Any]):
+        """執行單一工作；逾時時重新排隊，超過重試次數才回傳預設結果."""
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self.handler(job["content"]), timeout=settings.llm_timeout_seconds)
+            self._record_success(time.monotonic() - started)
+            if not job["future"].done():
+                job["future"].set_result(result)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._record_timeout()
+            job["attempts"] += 1
+            if job["attempts"] <= settings.llm_max_retries:
+                logger.warning(f"LLM analysis timed out, re-queueing (attempt {job['attempts']})")
+                self.requeued += 1
+                self.queue.put_nowait(job)
+            else:
+                logger.error(f"LLM analysis timed out after {job['attempts']} attempts")
+                self.failed += 1
+                if not job["future"].done():
+                    job["future"].set_result(self.timeout_result())
+        except asyncio.CancelledError:
+            if not job["future"].done():
+                job["future"].cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            if not job["future"].done():
+                job["future"].set_exception(e)
+        finally:
+            async with self.slot_available:
+                self.active -= 1
+                self.slot_available.notify_all()
+    
+    def _record_success(self, latency: float):
+        """記錄成功的延遲，視窗結束時調整並發."""
+        self.completed += 1
+        self.window_latencies.append(latency)
+        if len(self.window_latencies) >= max(1, int(self.limit)):
+            self._adjust()
+    
+    def _record_timeout(self):
+        """逾時代表服務已過載，立即乘法遞減."""
+        self.window_timeouts += 1
+        self._adjust()
+    
+    def _adjust(self):
+        """AIMD：延遲正常且吞吐量未下降時加一，逾時或延遲過高時減半."""
+        elapsed = max(time.monotonic() - self.window_started, 1e-6)
+        throughput = len(self.window_latencies) / elapsed
+        avg_latency = sum(self.window_latencies) / len(self.window_latencies) if self.window_latencies else None
+        if avg_latency is not None:
+            self.baseline_latency = min(self.baseline_latency or avg_latency, avg_latency)
+        
+        previous = self.limit
+        if self.window_timeouts or (
+            avg_latency is not None and avg_latency > self.baseline_latency * settings.llm_latency_tolerance
+        ):
+            self.limit = max(self.min_concurrency, self.limit / 2)
+        elif throughput >= self.last_throughput * 0.95:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+        else:
+            # 加大並發反而降低吞吐量，退回一格
+            self.limit = max(self.min_concurrency, self.limit - 1)
+        
+        if int(self.limit) != int(previous):
+            logger.info(
+                f"LLM concurrency {int(previous)} -> {int(self.limit)} "
+                f"(avg latency {avg_latency or 0:.1f}s, throughput {throughput * 60:.2f}/min)"
+            )
+        
+        self.last_throughput = throughput
+        self.window_started = time.monotonic()
+        self.window_latencies = []
+        self.window_timeouts = 0
+        if self.slot_available is not None and self.loop is not None and self.loop.is_running():
+            self._spawn(self._notify_slots())
+    
+    async def _notify_slots(self):
+        """並發上限提高時喚醒等待中的派送工作."""
+        async with self.slot_available:
+            self.slot_available.notify_all()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """取得工作池狀態."""
+        return {
+            "concurrency_limit": int(self.limit),
+            "min_concurrency": self.min_concurrency,
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": self.queue.qsize() if self.queue else 0,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "requeued": self.requeued,
+            "failed": self.failed,
+            "baseline_latency_seconds": round(self.baseline_latency, 2) if self.baseline_latency else None,
+            "throughput_per_min": round(self.last_throughput * 60, 2)
+        }
 
 class ArticleAnalyzer:
     """文章分析器類別."""
@@ -16,163 +294,387 @@ class ArticleAnalyzer:
         self.ollama_url = "http://localhost:11434"
         # 允許以環境變數覆寫，預設採用更省記憶體的 instruct 變體
         env_model = os.getenv("OLLAMA_MODEL")
+        profile = self._load_model_profile()
         if env_model:
             self.model_name = env_model
+            self.model_source = "env"
+        elif profile:
+            # 使用 model_calibration.py 在本機實測選出的模型
+            self.model_name = profile["model"]
+            self.model_source = "calibration"
         else:
             # 根據系統硬體自動選擇模型（超低記憶體優先）
             system_info = system_detector.detect_system()
             self.model_name = system_info.get("recommended_model", "qwen2.5:0.5b-instruct")
-        logger.info(f"Selected model: {self.model_name}")
+            self.model_source = "hardware"
+        logger.info(f"Selected model: {self.model_name} ({self.model_source})")
+        
+        # 模型預熱狀態
+        self.warm_until: Optional[datetime] = None  # 預期模型仍留在 Ollama 記憶體中的時間
+        self.warm_up_seconds: Optional[float] = None
+        self.warm_up_lock: Optional[asyncio.Lock] = None
+        
+        # 分析結果快取：記憶體 LRU + 資料庫
+        self.memory_cache = TTLLRUCache(
+            maxsize=settings.analysis_cache_size,
+            ttl=settings.analysis_cache_max_age_days * 86400
+        )
+        self.db_hits = 0
+        self.db_misses = 0
+        self.llm_calls = 0
+        
+        # 送往 Ollama 的並發由工作池依延遲與吞吐量自動調整
+        self.worker_pool = AnalysisWorkerPool(
+            self._generate_analysis,
+            lambda: self._get_default_analysis("分析超時 - 請稍後重試")
+        )
+        self.num_thread = int(os.getenv("OLLAMA_NUM_THREAD", "0")) or self.worker_pool.threads_per_request()
+        
+        # 串流生成統計：提前中止 / 生成到結束
+        self.early_stops = 0
+        self.full_generations = 0
+    
+    @staticmethod
+    def _load_model_profile() -> Optional[Dict[str, Any]]:
+        """讀取本機的模型校準結果；檔案不存在或屬於其他主機時回傳 None."""
+        path = settings.llm_profile_path
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+            if profile.get("host") != platform.node() or not profile.get("model"):
+                logger.warning(f"Ignoring model profile {path}: calibrated on another host")
+                return None
+            return profile
+        except Exception as e:
+            logger.error(f"Error loading model profile {path}: {e}")
+            return None
+    
+    def _generation_options(self) -> Dict[str, Any]:
+        """Ollama 生成參數（分析與校準共用）."""
+        return {
+            # 低記憶體配置（~1GB）：降低上下文、依硬體分配執行緒、保守取樣
+            "temperature": 0.4,
+            "max_tokens": 180,
+            "num_ctx": int(os.getenv("OLLAMA_NUM_CTX", "512")),
+            "num_predict": 180,
+            "num_thread": self.num_thread,
+            "num_gpu": 0,
+            "repeat_penalty": 1.1,
+            "top_p": 0.9,
+            "top_k": 40
+        }
+    
+    async def _set_keep_alive(self, keep_alive: str, model_name: Optional[str] = None) -> bool:
+        """送出空提示詞：Ollama 只載入模型並依 keep_alive 保留（"0" 表示立即卸載）."""
+        try:
+            session = await http_client.get_session()
+            async with session.post(
+                f"{self.ollama_url}/api/generate",
+                json={"model": model_name or self.model_name, "prompt": "", "keep_alive": keep_alive},
+                timeout=aiohttp.ClientTimeout(total=settings.llm_timeout_seconds)
+            ) as response:
+                if response.status != 200:
+                    logger.warning(f"Ollama keep_alive={keep_alive} request failed: {response.status}")
+                    return False
+                await response.read()
+                return True
+        except Exception as e:
+            logger.warning(f"Error setting Ollama keep_alive={keep_alive}: {e}")
+            return False
+    
+    def _touch_model(self, keep_alive: Optional[int] = None):
+        """記錄模型會保留到何時（每次請求都會重設 Ollama 的 keep_alive 計時）."""
+        keep_alive = settings.ollama_keep_alive_seconds if keep_alive is None else keep_alive
+        self.warm_until = datetime.utcnow() + timedelta(seconds=keep_alive)
+    
+    async def warm_up(self) -> bool:
+        """預先載入模型，讓第一篇文章不必等待模型載入；已預熱且仍在 keep_alive 內時略過."""
+        if not settings.ollama_warmup:
+            return False
+        if self.warm_up_lock is None:
+            self.warm_up_lock = asyncio.Lock()
+        async with self.warm_up_lock:
+            if self.warm_until and datetime.utcnow() < self.warm_until:
+                return True
+            start = time.monotonic()
+            if not await self._set_keep_alive(f"{settings.ollama_keep_alive_seconds}s"):
+                return False
+            self.warm_up_seconds = round(time.monotonic() - start, 2)
+            self._touch_model()
+            logger.info(f"Model {self.model_name} warmed up in {self.warm_up_seconds}s")
+            return True
+    
+    async def hold_model(self, seconds: int) -> bool:
+        """爬蟲會話結束後決定模型去留：下次會話在上限內就延長保留，否則卸載釋放記憶體."""
+        if seconds <= settings.ollama_hold_max_seconds:
+            # 多保留一段緩衝，避免下一個會話剛好遇到模型卸載
+            keep_alive = seconds + settings.ollama_keep_alive_seconds
+            if await self._set_keep_alive(f"{keep_alive}s"):
+                self._touch_model(keep_alive)
+                logger.info(f"Keeping model {self.model_name} loaded for {keep_alive}s")
+                return True
+            return False
+        
+        self.warm_until = None
+        if await self._set_keep_alive("0"):
+            logger.info(f"Unloaded model {self.model_name} until next session")
+            return True
+        return False
+    
+    def get_model_stats(self) -> Dict[str, Any]:
+        """取得目前模型與預熱狀態."""
+        return {
+            "model": self.model_name,
+            "source": self.model_source,
+            "warm_until": self.warm_until.isoformat() if self.warm_until else None,
+            "warm_up_seconds": self.warm_up_seconds
+        }
+    
+    def _cache_key(self, content: str) -> str:
+        """以送出的內容、模型與提示詞版本計算快取鍵."""
+        raw = f"{self.model_name}\0{PROMPT_VERSION}\0{(content or '')[:PROMPT_CONTENT_CHARS]}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    async def _get_cached_analysis(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """依序查詢記憶體與資料庫快取."""
+        found, analysis = self.memory_cache.get(cache_key)
+        if found:
+            return analysis
+        
+        try:
+            async with db_manager.get_async_session() as session:
+                entry = await session.scalar(
+                    select(AnalysisCache).where(
+                        AnalysisCache.cache_key == cache_key,
+                        AnalysisCache.created_at > datetime.utcnow() - timedelta(days=settings.analysis_cache_max_age_days)
+                    )
+                )
+                if entry is None:
+                    self.db_misses += 1
+                    return None
+                
+                self.db_hits += 1
+                entry.hit_count = (entry.hit_count or 0) + 1
+                entry.last_hit_at = datetime.utcnow()
+                analysis = entry.result
+                await session.commit()
+            
+            self.memory_cache.set(cache_key, analysis)
+            return analysis
+        except Exception as e:
+            logger.warning(f"Error reading analysis cache: {e}")
+            return None
+    
+    async def _set_cached_analysis(self, cache_key: str, analysis: Dict[str, Any]):
+        """寫入兩層快取."""
+        self.memory_cache.set(cache_key, analysis)
+        try:
+            async with db_manager.get_async_session() as session:
+                entry = await session.scalar(select(AnalysisCache).where(AnalysisCache.cache_key == cache_key))
+                if entry is None:
+                    entry = AnalysisCache(cache_key=cache_key)
+                    session.add(entry)
+                
+                entry.model_name = self.model_name
+                entry.prompt_version = PROMPT_VERSION
+                entry.result = analysis
+                entry.created_at = datetime.utcnow()
+                entry.last_hit_at = datetime.utcnow()
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Error writing analysis cache: {e}")
+    
+    async def evict_analysis_cache(self) -> int:
+        """淘汰過期與超出容量（最久未命中）的快取項目，回傳刪除數量."""
+        try:
+            async with db_manager.get_async_session() as session:
+                cutoff = datetime.utcnow() - timedelta(days=settings.analysis_cache_max_age_days)
+                deleted = (await session.execute(
+                    delete(AnalysisCache).where(AnalysisCache.created_at <= cutoff)
+                )).rowcount
+                
+                overflow = await session.scalar(select(func.count(AnalysisCache.id))) - settings.analysis_cache_max_entries
+                if overflow > 0:
+                    stale_ids = select(AnalysisCache.id).order_by(
+                        AnalysisCache.last_hit_at.asc()
+                    ).limit(overflow).scalar_subquery()
+                    deleted += (await session.execute(
+                        delete(AnalysisCache).where(AnalysisCache.id.in_(stale_ids))
+                    )).rowcount
+                
+                await session.commit()
+                if deleted:
+                    logger.info(f"Evicted {deleted} analysis cache entries")
+                return deleted
+        except Exception as e:
+            logger.error(f"Error evicting analysis cache: {e}")
+            return 0
+    
+    def get_stream_stats(self) -> Dict[str, Any]:
+        """取得串流生成的提前中止統計."""
+        total = self.early_stops + self.full_generations
+        return {
+            "early_stops": self.early_stops,
+            "full_generations": self.full_generations,
+            "early_stop_rate": round(self.early_stops / total, 3) if total else 0
+        }
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """取得分析快取的命中統計."""
+        memory = self.memory_cache.get_stats()
+        hits = memory["hits"] + self.db_hits
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "memory": memory,
+            "db_hits": self.db_hits,
+            "db_misses": self.db_misses,
+            "llm_calls": self.llm_calls,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0
+        }
     
     async def _analyze_with_llm(self, content: str) -> Dict[str, Any]:
-        """使用 LLM 分析文章內容."""
+        """使用 LLM 分析文章內容（相同內容、模型與提示詞版本直接使用快取）."""
+        cache_key = self._cache_key(content)
+        cached = await self._get_cached_analysis(cache_key)
+        if cached is not None:
+            logger.info(f"Analysis cache hit: {cache_key[:12]}")
+            return dict(cached)
+        
+        self.llm_calls += 1
+        analysis = await self.worker_pool.submit(content)
+        # 失敗的預設結果不快取，下次會重新分析
+        if not analysis.get("failed"):
+            await self._set_cached_analysis(cache_key, analysis)
+        return analysis
+    
+    def _normalize_analysis(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """確保所有必要字段存在並有合理值."""
+        return {
+            "recommended_stocks": analysis.get("recommended_stocks", []) if isinstance(analysis.get("recommended_stocks"), list) else [],
+            "reason": analysis.get("reason", "技術分析") if analysis.get("reason") else "技術分析",
+            "sentiment": analysis.get("sentiment", "neutral") if analysis.get("sentiment") in ["pos", "neg", "neu"] else "neutral",
+            "sectors": analysis.get("sectors", []) if isinstance(analysis.get("sectors"), list) else [],
+            "strategy": analysis.get("strategy", "投資策略") if analysis.get("strategy") else "投資策略",
+            "risk_level": analysis.get("risk_level", "medium") if analysis.get("risk_level") in ["low", "medium", "high"] else "medium"
+        }
+    
+    def _extract_analysis(self, response_text: str) -> Optional[Dict[str, Any]]:
+        """串流結束仍未取得完整物件時，以多種方式從全文提取JSON."""
+        # 清理回應文字，移除可能的額外文字
+        cleaned_response = response_text.strip()
+        
+        # 嘗試多種方式提取JSON
+        json_candidates = []
+        
+        # 方法1: 尋找完整的JSON對象
+        json_start = cleaned_response.find('{')
+        json_end = cleaned_response.rfind('}') + 1
+        if json_start != -1 and json_end > json_start:
+            json_candidates.append(cleaned_response[json_start:json_end])
+        
+        # 方法2: 尋找多行JSON
+        lines = cleaned_response.split('\n')
+        for line in lines:
+            line = line.strip()
+            if line.startswith('{') and line.endswith('}'):
+                json_candidates.append(line)
+        
+        # 方法3: 尋找包含特定關鍵字的JSON
+        for line in lines:
+            if any(keyword in line for keyword in ['recommended_stocks', 'sentiment', 'reason']):
+                if '{' in line and '}' in line:
+                    json_candidates.append(line)
+        
+        # 嘗試解析每個候選JSON
+        for json_str in json_candidates:
+            try:
+                analysis = json.loads(json_str)
+                if isinstance(analysis, dict):
+                    logger.info(f"Successfully parsed JSON: {json_str[:100]}...")
+                    return analysis
+            except json.JSONDecodeError:
+                continue
+        return None
+    
+    async def _generate_analysis(self, content: str) -> Dict[str, Any]:
+        """以串流呼叫 Ollama，頂層 JSON 物件一完成即中止生成；逾時交由工作池重新排隊."""
         try:
-            # 專業化提示詞，增加分析深度
-            prompt = f"""你是一位資深的證券研究分析師，熟悉台灣與國際股市的新聞解讀與市場心理。忽略政治立場或網路俚語，只分析對股票市場的潛在影響，只用繁體中文回覆並以 JSON 格式輸出：
-
-請從技術面、基本面、消息面三個角度分析以下股票文章，並只返回JSON格式，不要其他文字：
-
-{content[:300]}
+            prompt = PROMPT_TEMPLATE.format(content=content[:PROMPT_CONTENT_CHARS])
+            scanner = JSONObjectScanner()
 
-必須返回以下JSON格式：
-{{"recommended_stocks":["股票代碼"],"sentiment":"pos/neg/neu","reason":"分析原因","sectors":["產業類別"],"strategy":"投資策略","risk_level":"low/medium/high"}}
-
-分析要求：
-- 情緒分析請考慮：市場恐慌程度、投資人信心、資金流向、外資動向
-- 風險等級請考慮：市場風險、流動性風險、政策風險、個股風險
-- 投資策略請包含：進場時機、停損點位、目標價位、持有期間
-- 產業類別請包含：主要產業、次產業、相關概念股、上下游供應鏈"""
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.ollama_url}/api/generate",
-                    json={
-                        "model": self.model_name,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            # 低記憶體配置（~1GB）：降低上下文、單執行緒、保守取樣
-                            "temperature": 0.4,
-                            "max_tokens": 180,
-                            "num_ctx": int(os.getenv("OLLAMA_NUM_CTX", "512")),
-                            "num_predict": 180,
-                            "num_thread": int(os.getenv("OLLAMA_NUM_THREAD", "1")),
-                            "num_gpu": 0,
-                            "repeat_penalty": 1.1,
-                            "top_p": 0.9,
-                            "top_k": 40
-                        }
-                    },
-                    timeout=aiohttp.ClientTimeout(total=180)  # 增加超時時間到 180 秒 (3分鐘)
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        response_text = result.get("response", "")
-                        
-                        # 嘗試解析JSON，增加容錯機制
-                        try:
-                            # 清理回應文字，移除可能的額外文字
-                            cleaned_response = response_text.strip()
-                            
-                            # 嘗試多種方式提取JSON
-                            json_candidates = []
-                            
-                            # 方法1: 尋找完整的JSON對象
-                            json_start = cleaned_response.find('{')
-                            json_end = cleaned_response.rfind('}') + 1
-                            if json_start != -1 and json_end > json_start:
-                                json_candidates.append(cleaned_response[json_start:json_end])
-                            
-                            # 方法2: 尋找多行JSON
-                            lines = cleaned_response.split('\n')
-                            for line in lines:
-                                line = line.strip()
-                                if line.startswith('{') and line.endswith('}'):
-                                    json_candidates.append(line)
-                            
-                            # 方法3: 尋找包含特定關鍵字的JSON
-                            for line in lines:
-                                if any(keyword in line for keyword in ['recommended_stocks', 'sentiment', 'reason']):
-                                    if '{' in line and '}' in line:
-                                        json_candidates.append(line)
-                            
-                            # 嘗試解析每個候選JSON
-                            for json_str in json_candidates:
-                                try:
-                                    analysis = json.loads(json_str)
-                                    
-                                    # 驗證必要字段
-                                    if isinstance(analysis, dict):
-                                        logger.info(f"Successfully parsed JSON: {json_str[:100]}...")
-                                        
-                                        # 確保所有必要字段存在並有合理值
-                                        return {
-                                            "recommended_stocks": analysis.get("recommended_stocks", []) if isinstance(analysis.get("recommended_stocks"), list) else [],
-                                            "reason": analysis.get("reason", "技術分析") if analysis.get("reason") else "技術分析",
-                                            "sentiment": analysis.get("sentiment", "neutral") if analysis.get("sentiment") in ["pos", "neg", "neu"] else "neutral",
-                                            "sectors": analysis.get("sectors", []) if isinstance(analysis.get("sectors"), list) else [],
-                                            "strategy": analysis.get("strategy", "投資策略") if analysis.get("strategy") else "投資策略",
-                                            "risk_level": analysis.get("risk_level", "medium") if analysis.get("risk_level") in ["low", "medium", "high"] else "medium"
-                                        }
-                                except json.JSONDecodeError:
-                                    continue
-                            
-                            logger.warning(f"Failed to parse any JSON from response: {response_text[:200]}...")
-                            
-                        except Exception as e:
-                            logger.error(f"Error processing LLM response: {e}")
-                        
-                        # 如果所有JSON解析都失敗，返回默認值
-                        return {
-                            "recommended_stocks": [],
-                            "reason": "分析失敗 - JSON解析錯誤",
-                            "sentiment": "neutral",
-                            "sectors": [],
-                            "strategy": "未知",
-                            "risk_level": "medium"
-                        }
-                    else:
-                        logger.error(f"LLM API error: {response.status}")
-                        return self._get_default_analysis()
-                        
+            session = await http_client.get_session()
+            async with session.post(
+                f"{self.ollama_url}/api/generate",
+                json={
+                    "model": self.model_name,
+                    "prompt": prompt,
+                    "stream": True,
+                    "keep_alive": f"{settings.ollama_keep_alive_seconds}s",
+                    "options": self._generation_options()
+                },
+                timeout=aiohttp.ClientTimeout(total=settings.llm_timeout_seconds)
+            ) as response:
+                if response.status != 200:
+                    logger.error(f"LLM API error: {response.status}")
+                    return self._get_default_analysis()
+                self._touch_model()
+                
+                # 每行是一個 {"response": "<token>", "done": false} 物件
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    analysis = scanner.feed(chunk.get("response", ""))
+                    if analysis is not None:
+                        # 關閉連線讓 Ollama 停止生成 JSON 之後的多餘 token
+                        response.close()
+                        self.early_stops += 1
+                        logger.info(f"Successfully parsed streamed JSON after {len(scanner.text)} chars")
+                        return self._normalize_analysis(analysis)
+                    if chunk.get("done"):
+                        break
+            
+            self.full_generations += 1
+            analysis = self._extract_analysis(scanner.text)
+            if analysis is not None:
+                return self._normalize_analysis(analysis)
+            
+            logger.warning(f"Failed to parse any JSON from response: {scanner.text[:200]}...")
+            # 如果所有JSON解析都失敗，返回默認值
+            return self._get_default_analysis("分析失敗 - JSON解析錯誤")
+                    
         except asyncio.TimeoutError:
-            logger.error("LLM analysis timeout after 3 minutes")
-            return {
-                "recommended_stocks": [],
-                "reason": "分析超時 - 請稍後重試",
-                "sentiment": "neutral",
-                "sectors": [],
-                "strategy": "未知",
-                "risk_level": "medium"
-            }
+            # 逾時交由工作池重新排隊
+            raise
         except aiohttp.ClientError as e:
             logger.error(f"Network error during LLM analysis: {e}")
-            return {
-                "recommended_stocks": [],
-                "reason": "網路錯誤 - 無法連接分析服務",
-                "sentiment": "neutral",
-                "sectors": [],
-                "strategy": "未知",
-                "risk_level": "medium"
-            }
+            return self._get_default_analysis("網路錯誤 - 無法連接分析服務")
         except Exception as e:
             logger.error(f"Unexpected error during LLM analysis: {e}")
             return self._get_default_analysis()
     
-    def _get_default_analysis(self) -> Dict[str, Any]:
-        """返回默認分析結果."""
+    def _get_default_analysis(self, reason: str = "分析失敗") -> Dict[str, Any]:
+        """返回默認分析結果（標記為失敗，不寫入快取）."""
         return {
             "recommended_stocks": [],
-            "reason": "分析失敗",
+            "reason": reason,
             "sentiment": "neutral",
             "sectors": [],
             "strategy": "未知",
-            "risk_level": "medium"
+            "risk_level": "medium",
+            "failed": True
         }
     
-    async def _analyze_content(self, article: PTTArticle) -> Dict[str, Any]:
-        """分析文章內容."""
+    async def _analyze_content(self, article: PTTArticle, force_llm: bool = False) -> Dict[str, Any]:
+        """分析文章內容；未通過相關性預篩的文章不送 LLM（force_llm 時略過預篩）."""
         try:
+            if not force_llm:
+                decision = relevance_filter.should_analyze(article)
+                if not decision["needs_llm"]:
+                    return relevance_filter.cheap_analysis(article.stock_symbols, decision)
+            
             logger.info(f"Analyzing article: {article.article_id}")
             
             # 使用LLM分析
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""文章－股票事實表 - 由文章的股票代碼、提及次數與 LLM 推薦結果產生 article_stocks 列.
+
+用法:
+    python article_stocks.py --backfill    # 由既有文章重建整個事實表
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from author_profiles import update_author_profiles
+from config import settings
+from database import db_manager
+from models import ArticleStock, PTTArticle
+
+# 產生事實表所需的文章欄位
+ARTICLE_STOCK_SOURCE_COLUMNS = (
+    PTTArticle.article_id, PTTArticle.author, PTTArticle.publish_time, PTTArticle.stock_symbols,
+    PTTArticle.stock_mentions, PTTArticle.recommended_stocks, PTTArticle.llm_sentiment
+)
+
+def _market(code: str) -> str:
+    """台股代碼為數字開頭（含 ETF），其餘視為美股."""
+    return 'TW' if code[:1].isdigit() else 'US'
+
+def build_article_stock_rows(article: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """由文章欄位（dict）產生事實表列：驗證過的代碼、名稱提及與推薦標的的聯集."""
+    mentions = article.get('stock_mentions') or {}
+    recommended = {str(code).strip().upper() for code in article.get('recommended_stocks') or [] if code}
+    codes = dict.fromkeys(
+        str(code).strip().upper()
+        for code in [*(article.get('stock_symbols') or []), *mentions, *recommended]
+        if code and str(code).strip()
+    )
+
+    return [
+        {
+            'article_id': article['article_id'],
+            'code': code[:20],
+            'market': _market(code),
+            'author': article['author'],
+            'publish_time': article['publish_time'],
+            # 只出現在代碼規則或推薦中的股票至少算一次提及
+            'mention_count': mentions.get(code) or 1,
+            'is_recommended': code in recommended,
+            'sentiment': article.get('llm_sentiment')
+        }
+        for code in codes
+    ]
+
+async def replace_article_stocks(
+    session,
+    articles: Iterable[Dict[str, Any]],
+    stock_deltas: Optional[Dict[str, Counter]] = None
+) -> int:
+    """以文章的最新內容重建其事實表列（在呼叫端的交易中執行，不 commit），回傳寫入列數.
+    
+    指定 stock_deltas 時累加每位作者各代碼的列數變化（作者 -> 代碼 -> 增減），供作者檔案增量更新。
+    """
+    articles = list(articles)
+    if not articles:
+        return 0
+
+    removed = (await session.execute(
+        delete(ArticleStock).where(
+            ArticleStock.article_id.in_([article['article_id'] for article in articles])
+        ).returning(ArticleStock.author, ArticleStock.code)
+    )).all()
+    rows = [row for article in articles for row in build_article_stock_rows(article)]
+    inserted = []
+    if rows:
+        inserted = (await session.execute(
+            insert(ArticleStock).values(rows).on_conflict_do_nothing().returning(ArticleStock.author, ArticleStock.code)
+        )).all()
+
+    if stock_deltas is not None:
+        for author, code in removed:
+            stock_deltas.setdefault(author, Counter())[code] -= 1
+        for author, code in inserted:
+            stock_deltas.setdefault(author, Counter())[code] += 1
+    return len(rows)
+
+async def refresh_article_stocks(
+    article_ids: Iterable[str],
+    stock_deltas: Optional[Dict[str, Counter]] = None
+) -> int:
+    """由資料庫中的文章重建指定文章的事實表列."""
+    article_ids = list(article_ids)
+    if not article_ids:
+        return 0
+    try:
+        async with db_manager.get_async_session() as session:
+            articles = (await session.execute(
+                select(*ARTICLE_STOCK_SOURCE_COLUMNS).where(PTTArticle.article_id.in_(article_ids))
+            )).mappings().all()
+            changes: Dict[str, Counter] = {}
+            count = await replace_article_stocks(session, articles, changes)
+            await session.commit()
+        # 交易成功後才交給呼叫端，失敗時作者檔案不套用變化
+        if stock_deltas is not None:
+            for author, author_changes in changes.items():
+                stock_deltas.setdefault(author, Counter()).update(author_changes)
+        return count
+    except Exception as e:
+        logger.error(f"Error refreshing article stocks: {e}")
+        return 0
+
+async def backfill_article_stocks(batch_size: int = None) -> Dict[str, int]:
+    """依 article_id 分批（keyset 分頁）重建所有文章的事實表列，並同步作者檔案的最常提及股票."""
+    batch_size = batch_size or settings.db_upsert_batch_size
+    last_article_id = ''
+    articles_count = 0
+    rows_count = 0
+
+    while True:
+        async with db_manager.get_async_session() as session:
+            articles = (await session.execute(
+                select(*ARTICLE_STOCK_SOURCE_COLUMNS).where(
+                    PTTArticle.article_id > last_article_id
+                ).order_by(PTTArticle.article_id).limit(batch_size)
+            )).mappings().all()
+            if not articles:
+                break
+
+            stock_deltas = {}
+            rows_count += await replace_article_stocks(session, articles, stock_deltas)
+            await update_author_profiles(session, [], stock_deltas=stock_deltas)
+            await session.commit()
+
+        articles_count += len(articles)
+        last_article_id = articles[-1]['article_id']
+        logger.info(f"Backfilled article stocks for {articles_count} articles ({rows_count} rows)")
+
+    return {"articles": articles_count, "rows": rows_count}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Article-stock fact table")
+    parser.add_argument("--backfill", action="store_true", help="由既有文章重建 article_stocks")
+    parser.add_argument("--batch-size", type=int, help="每批處理的文章數，預設為 DB_UPSERT_BATCH_SIZE")
+    args = parser.parse_args()
+
+    db_manager.create_tables()
+    try:
+        if args.backfill:
+            result = await backfill_article_stocks(args.batch_size)
+            logger.info(f"Article stocks backfill completed: {result}")
+        else:
+            parser.print_help()
+    finally:
+        await db_manager.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""作者檔案彙總 - 保存文章時增量更新 author_profiles，作者列表與統計只需讀取 O(作者數) 列.
+
+用法:
+    python author_profiles.py --reconcile    # 由既有文章重建所有作者檔案
+"""
+
+import argparse
+import asyncio
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from loguru import logger
+from sqlalchemy import delete, extract, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from config import settings
+from database import db_manager
+from models import ArticleStock, AuthorProfile, PTTArticle
+
+HOURS_PER_WEEK = 7 * 24
+
+class ProfileDelta:
+    """單一作者在一次保存中的增量."""
+
+    def __init__(self):
+        self.articles = 0
+        self.analyzed = 0
+        self.push_count = 0
+        self.boo_count = 0
+        self.last_article_time: Optional[datetime] = None
+        self.stocks: Counter = Counter()  # 代碼 -> 提及文章數
+        self.activity = [0] * HOURS_PER_WEEK
+
+def _hour_of_week(publish_time: datetime) -> int:
+    """星期一 0 時為第 0 格."""
+    return publish_time.weekday() * 24 + publish_time.hour
+
+def _latest(*times: Optional[datetime]) -> Optional[datetime]:
+    """忽略 None 的最大時間."""
+    return max((t for t in times if t is not None), default=None)
+
+def _trim_stocks(counts: Counter) -> Dict[str, int]:
+    """只保留提及文章數最多的股票（依次數排序）."""
+    return dict(counts.most_common(settings.author_profile_stock_limit))
+
+def top_stocks(profile: AuthorProfile, limit: int = 10) -> List[Dict[str, Any]]:
+    """作者最常提及的股票."""
+    return [
+        {"code": code, "articles": count}
+        for code, count in Counter(profile.favorite_stocks or {}).most_common(limit)
+    ]
+
+def _collect_deltas(
+    articles: Iterable[Dict[str, Any]],
+    analyzed_authors: Iterable[str],
+    stock_deltas: Optional[Dict[str, Counter]]
+) -> Dict[str, ProfileDelta]:
+    """依作者彙總新增文章、補上分析結果的文章與 article_stocks 變化的增量."""
+    deltas: Dict[str, ProfileDelta] = {}
+    for article in articles:
+        delta = deltas.setdefault(article['author'], ProfileDelta())
+        delta.articles += 1
+        delta.analyzed += bool(article.get('is_analyzed'))
+        delta.push_count += article.get('push_count') or 0
+        delta.boo_count += article.get('boo_count') or 0
+        publish_time = article.get('publish_time')
+        if publish_time:
+            delta.last_article_time = _latest(delta.last_article_time, publish_time)
+            delta.activity[_hour_of_week(publish_time)] += 1
+
+    # 既有文章補上分析結果，只增加已分析數
+    for author in analyzed_authors:
+        deltas.setdefault(author, ProfileDelta()).analyzed += 1
+    
+    # 最常提及股票以 article_stocks 實際增減的列計算，與 --reconcile 的結果一致
+    for author, changes in (stock_deltas or {}).items():
+        changes = Counter({code: change for code, change in changes.items() if change})
+        if changes:
+            deltas.setdefault(author, ProfileDelta()).stocks.update(changes)
+    return deltas
+
+def _apply_delta(profile: AuthorProfile, delta: ProfileDelta):
+    """將增量合併到作者檔案（JSON 欄位以新物件指定，確保被偵測為變更）."""
+    profile.total_articles = (profile.total_articles or 0) + delta.articles
+    profile.analyzed_articles = (profile.analyzed_articles or 0) + delta.analyzed
+    profile.total_push_count = (profile.total_push_count or 0) + delta.push_count
+    profile.total_boo_count = (profile.total_boo_count or 0) + delta.boo_count
+    if profile.total_articles:
+        profile.avg_push_count = round(profile.total_push_count / profile.total_articles)
+        profile.avg_boo_count = round(profile.total_boo_count / profile.total_articles)
+    profile.last_article_time = _latest(profile.last_article_time, delta.last_article_time)
+    # Counter 相加會移除歸零（或負數）的代碼
+    stocks = Counter(profile.favorite_stocks or {})
+    stocks.update(delta.stocks)
+    profile.favorite_stocks = _trim_stocks(+stocks)
+    activity = profile.activity_pattern or [0] * HOURS_PER_WEEK
+    profile.activity_pattern = [current + added for current, added in zip(activity, delta.activity)]
+    profile.updated_at = datetime.utcnow()
+
+async def update_author_profiles(
+    session,
+    articles: Iterable[Dict[str, Any]],
+    analyzed_authors: Iterable[str] = (),
+    stock_deltas: Optional[Dict[str, Counter]] = None
+) -> int:
+    """增量更新作者檔案（在呼叫端的交易中執行，不 commit），回傳更新的作者數.
+    
+    articles 為新增的文章（dict），analyzed_authors 為既有文章補上分析結果時的作者（每篇一次），
+    stock_deltas 為 replace_article_stocks 累加的代碼列數變化。
+    """
+    deltas = _collect_deltas(articles, analyzed_authors, stock_deltas)
+    if not deltas:
+        return 0
+
+    authors = sorted(deltas)
+    now = datetime.utcnow()
+    await session.execute(
+        insert(AuthorProfile).values([
+            {
+                'id': uuid.uuid4(), 'author': author, 'total_articles': 0, 'analyzed_articles': 0,
+                'total_push_count': 0, 'total_boo_count': 0, 'avg_push_count': 0, 'avg_boo_count': 0,
+                'favorite_stocks': {}, 'activity_pattern': [0] * HOURS_PER_WEEK,
+                'created_at': now, 'updated_at': now
+            }
+            for author in authors
+        ]).on_conflict_do_nothing(index_elements=[AuthorProfile.author])
+    )
+    # 依作者排序鎖定，避免並行的保存互相死結
+    profiles = (await session.scalars(
+        select(AuthorProfile).where(AuthorProfile.author.in_(authors)).order_by(AuthorProfile.author).with_for_update()
+    )).all()
+    for profile in profiles:
+        _apply_delta(profile, deltas[profile.author])
+    return len(profiles)
+
+async def record_author_articles(
+    articles: Iterable[Dict[str, Any]],
+    stock_deltas: Optional[Dict[str, Counter]] = None
+) -> int:
+    """以獨立交易增量更新作者檔案（逐列寫入文章的備援路徑與補驗證股票代碼時使用）."""
+    articles = list(articles)
+    if not articles and not stock_deltas:
+        return 0
+    try:
+        async with db_manager.get_async_session() as session:
+            count = await update_author_profiles(session, articles, stock_deltas=stock_deltas)
+            await session.commit()
+            return count
+    except Exception as e:
+        logger.error(f"Error updating author profiles: {e}")
+        return 0
+
+async def reconcile_author_profiles() -> Dict[str, int]:
+    """由 ptt_articles 與 article_stocks 重建所有作者檔案."""
+    async with db_manager.get_async_session() as session:
+        # 阻擋重建期間的增量更新；等待中的保存會在重建 commit 後再套用自己的增量
+        await session.execute(text("LOCK TABLE author_profiles IN SHARE ROW EXCLUSIVE MODE"))
+
+        totals = (await session.execute(
+            select(
+                PTTArticle.author,
+                func.count(PTTArticle.id),
+                func.count(PTTArticle.id).filter(PTTArticle.is_analyzed == True),
+                func.coalesce(func.sum(PTTArticle.push_count), 0),
+                func.coalesce(func.sum(PTTArticle.boo_count), 0),
+                func.max(PTTArticle.publish_time)
+            ).group_by(PTTArticle.author)
+        )).all()
+
+        stocks: Dict[str, Counter] = {}
+        for author, code, count in (await session.execute(
+            select(ArticleStock.author, ArticleStock.code, func.count(ArticleStock.id))
+            .group_by(ArticleStock.author, ArticleStock.code)
+        )).all():
+            stocks.setdefault(author, Counter())[code] = count
+
+        activity: Dict[str, List[int]] = {}
+        isodow = extract('isodow', PTTArticle.publish_time)  # 星期一為 1
+        hour = extract('hour', PTTArticle.publish_time)
+        for author, day, hour_of_day, count in (await session.execute(
+            select(PTTArticle.author, isodow, hour, func.count(PTTArticle.id)).group_by(PTTArticle.author, isodow, hour)
+        )).all():
+            activity.setdefault(author, [0] * HOURS_PER_WEEK)[(int(day) - 1) * 24 + int(hour_of_day)] = count
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                'id': uuid.uuid4(),
+                'author': author,
+                'total_articles': total,
+                'analyzed_articles': analyzed,
+                'total_push_count': push_sum,
+                'total_boo_count': boo_sum,
+                'avg_push_count': round(push_sum / total),
+                'avg_boo_count': round(boo_sum / total),
+                'last_article_time': last_article_time,
+                'favorite_stocks': _trim_stocks(stocks.get(author, Counter())),
+                'activity_pattern': activity.get(author, [0] * HOURS_PER_WEEK),
+                'created_at': now,
+                'updated_at': now
+            }
+            for author, total, analyzed, push_sum, boo_sum, last_article_time in totals
+        ]
+
+        await session.execute(
+            delete(AuthorProfile).where(AuthorProfile.author.notin_([row['author'] for row in rows]))
+        )
+        batch_size = max(1, settings.db_upsert_batch_size)
+        for offset in range(0, len(rows), batch_size):
+            stmt = insert(AuthorProfile).values(rows[offset:offset + batch_size])
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[AuthorProfile.author],
+                # 保留原本的 id 與 created_at
+                set_={
+                    column: stmt.excluded[column]
+                    for column in rows[0] if column not in ('id', 'author', 'created_at')
+                }
+            ))
+        await session.commit()
+
+    logger.info(f"Reconciled {len(rows)} author profiles")
+    return {"authors": len(rows), "articles": sum(row['total_articles'] for row in rows)}
+
+async def main():
+    parser = argparse.ArgumentParser(description="Author profile rollups")
+    parser.add_argument("--reconcile", action="store_true", help="由既有文章重建 author_profiles")
+    args = parser.parse_args()
+
+    db_manager.create_tables()
+    try:
+        if args.reconcile:
+            result = await reconcile_author_profiles()
+            logger.info(f"Author profiles reconcile completed: {result}")
+        else:
+            parser.print_help()
+    finally:
+        await db_manager.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -10,6 +10,8 @@ from config import settings
 from database import db_manager
 from ptt_crawler import PTTCrawler
 from crawl_orchestrator import CrawlOrchestrator
+from http_client import http_client
+from article_analyzer import analyzer
 
 async def daily_crawl():
     """每天下午3點執行的爬蟲任務 - 追蹤配置的作者名單."""
@@ -28,10 +30,18 @@ async def daily_crawl():
         result = await orchestrator.run_crawl_session()
         
         logger.info(f"Daily crawl completed: {result}")
+        
+        # 下次排程在一天後，卸載模型釋放記憶體
+        await analyzer.hold_model(24 * 3600)
         return result
     except Exception as e:
         logger.error(f"Daily crawl failed: {e}")
         return None
+    finally:
+        # 每次排程都在新的事件迴圈執行，結束時關閉 LLM 工作池與共用連線池
+        await analyzer.worker_pool.shutdown()
+        await http_client.close()
+        await db_manager.close()
 
 def run_daily_crawl():
     """同步包裝器."""
@@ -0,0 +1,148 @@
+"""解析器效能比較 - BeautifulSoup html.parser（舊）與 lxml/XPath（新）的每頁解析時間.
+
+用法:
+    python benchmark_parser.py                     # 使用內建的模擬 PTT 頁面
+    python benchmark_parser.py --article a.html --list index.html --rounds 200
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+import ptt_parser
+
+BASE_URL = "https://www.ptt.cc"
+
+def build_sample_article(pushes: int = 300) -> str:
+    """產生結構與 PTT 文章頁相同的模擬頁面."""
+    push_lines = "".join(
+        f'<div class="push"><span class="hl push-tag">推 </span>'
+        f'<span class="f3 hl push-userid">user{i}</span>'
+        f'<span class="f3 push-content">: 2330 明天漲停 {i}</span>'
+        f'<span class="push-ipdatetime"> 10/15 13:{i % 60:02d}\n</span></div>'
+        for i in range(pushes)
+    )
+    body = "台積電 2330 與聯發科 2454 本季營收成長，外資連續買超。\n" * 40
+    return (
+        '<html><head><title>[標的] 2330 台積電 多</title></head><body>'
+        '<div id="main-container"><div id="main-content" class="bbs-screen bbs-content">'
+        '<div class="article-metaline"><span class="article-meta-tag">作者</span>'
+        '<span class="article-meta-value">homoho (阿和)</span></div>'
+        '<div class="article-metaline-right"><span class="article-meta-tag">看板</span>'
+        '<span class="article-meta-value">Stock</span></div>'
+        '<div class="article-metaline"><span class="article-meta-tag">標題</span>'
+        '<span class="article-meta-value">[標的] 2330 台積電 多</span></div>'
+        '<div class="article-metaline"><span class="article-meta-tag">時間</span>'
+        '<span class="article-meta-value">Wed Oct 15 13:16:00 2025</span></div>'
+        f'{body}<span class="f6">: 引述某某之銘言</span>\n'
+        '--\n<span class="f2">※ 發信站: 批踢踢實業坊(ptt.cc)</span>'
+        f'{push_lines}</div></div></body></html>'
+    )
+
+def build_sample_list(rows: int = 20) -> str:
+    """產生結構與 PTT 看板索引頁相同的模擬頁面."""
+    entries = "".join(
+        f'<div class="r-ent"><div class="nrec"><span class="hl f3">{i}</span></div>'
+        f'<div class="title"><a href="/bbs/Stock/M.{1760000000 + i}.A.{i:03d}.html">[標的] 測試 {i}</a></div>'
+        f'<div class="meta"><div class="author">author{i % 5}</div>'
+        f'<div class="article-menu"></div><div class="date">10/{i % 28 + 1:02d}</div>'
+        f'<div class="mark"></div></div></div>'
+        for i in range(rows)
+    )
+    return (
+        '<html><body><div class="btn-group btn-group-paging">'
+        '<a class="btn wide" href="/bbs/Stock/index1.html">最舊</a>'
+        '<a class="btn wide" href="/bbs/Stock/index9000.html">&lsaquo; 上頁</a>'
+        '<a class="btn wide disabled">下頁 &rsaquo;</a></div>'
+        f'<div class="r-list-container action-bar-margin bbs-screen">{entries}'
+        '<div class="r-list-sep"></div>'
+        '<div class="r-ent"><div class="title"><a href="/bbs/Stock/M.1500000000.A.000.html">[公告] 板規</a></div>'
+        '<div class="meta"><div class="author">admin</div><div class="date">1/01</div></div></div>'
+        '</div></body></html>'
+    )
+
+def bs4_parse_article(html: str) -> Optional[Dict]:
+    """舊版實作：BeautifulSoup html.parser 並逐一 decompose 推文."""
+    soup = BeautifulSoup(html, 'html.parser')
+    meta_values = [element.get_text().strip() for element in soup.find_all('span', class_='article-meta-value')]
+    main_content = soup.find('div', id='main-content')
+    if not main_content:
+        return None
+    for push in main_content.find_all('div', class_='push'):
+        push.decompose()
+    for span in main_content.find_all('span', class_='f6'):
+        if span.text.strip().startswith(':'):
+            span.decompose()
+    return {
+        'author': meta_values[0].split(' ')[0] if meta_values else None,
+        'publish_time': ptt_parser.parse_publish_time(meta_values),
+        'content': main_content.get_text().strip()
+    }
+
+def bs4_parse_list_page(html: str) -> Tuple[List[Dict], Optional[str]]:
+    """舊版實作：BeautifulSoup html.parser 解析列表頁."""
+    soup = BeautifulSoup(html, 'html.parser')
+    articles = []
+    container = soup.find('div', class_='r-list-container') or soup
+    for element in container.find_all('div', class_=['r-ent', 'r-list-sep']):
+        if 'r-list-sep' in element.get('class', []):
+            break
+        title_element = element.find('div', class_='title')
+        link_element = title_element.find('a') if title_element else None
+        if not link_element:
+            continue
+        date_element = element.find('div', class_='date')
+        author_element = element.find('div', class_='author')
+        articles.append({
+            'title': link_element.get_text().strip(),
+            'url': urljoin(BASE_URL, link_element.get('href')),
+            'date': date_element.get_text().strip() if date_element else "",
+            'author': author_element.get_text().strip() if author_element else ""
+        })
+    prev_url = None
+    for link in soup.select('div.btn-group-paging a'):
+        if '上頁' in link.get_text() and link.get('href'):
+            prev_url = urljoin(BASE_URL, link.get('href'))
+            break
+    return articles, prev_url
+
+def time_per_page(func: Callable, html, rounds: int) -> float:
+    """回傳每頁平均解析時間（毫秒）."""
+    func(html)  # 暖身
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(html)
+    return (time.perf_counter() - start) / rounds * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="PTT parser benchmark")
+    parser.add_argument("--article", help="文章頁 HTML 檔案（預設使用模擬頁面）")
+    parser.add_argument("--list", help="列表頁 HTML 檔案（預設使用模擬頁面）")
+    parser.add_argument("--rounds", type=int, default=100, help="每種解析器的執行次數")
+    args = parser.parse_args()
+
+    article_html = open(args.article, encoding='utf-8').read() if args.article else build_sample_article()
+    list_html = open(args.list, encoding='utf-8').read() if args.list else build_sample_list()
+
+    # 先確認兩種實作的輸出一致
+    old_article, new_article = bs4_parse_article(article_html), ptt_parser.parse_article(article_html)
+    assert old_article['content'] == new_article['content'], "article content mismatch"
+    old_rows, old_prev = bs4_parse_list_page(list_html)
+    new_rows, new_prev = ptt_parser.parse_list_page(list_html, BASE_URL)
+    assert [row['url'] for row in old_rows] == [row['url'] for row in new_rows] and old_prev == new_prev, "list mismatch"
+
+    cases = [
+        ("article", article_html, bs4_parse_article, ptt_parser.parse_article),
+        ("list", list_html, bs4_parse_list_page, lambda html: ptt_parser.parse_list_page(html, BASE_URL)),
+    ]
+    print(f"{'page':<10}{'bs4 html.parser (ms)':>24}{'lxml xpath (ms)':>20}{'speedup':>10}")
+    for name, html, old_func, new_func in cases:
+        before = time_per_page(old_func, html, args.rounds)
+        after = time_per_page(new_func, html, args.rounds)
+        print(f"{name:<10}{before:>24.3f}{after:>20.3f}{before / after:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
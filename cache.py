@@ -0,0 +1,77 @@
+"""記憶體快取 - 具 TTL 的 LRU 快取與命中統計."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class TTLLRUCache:
+    """容量上限 + 每筆到期時間的 LRU 快取（可快取 None 作為負向結果）."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+        # 統計資料
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """查詢快取，回傳 (是否命中, 值)；值本身可能為 None."""
+        entry = self.data.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.data[key]
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+
+        self.data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """寫入快取，超過容量時淘汰最久未使用的項目."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self.data[key] = (time.monotonic() + ttl, value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable):
+        """移除快取項目."""
+        self.data.pop(key, None)
+
+    def clear(self):
+        """清空快取."""
+        self.data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """是否有未到期的項目；不計入命中統計，也不改變 LRU 順序."""
+        entry = self.data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得命中率與容量統計."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
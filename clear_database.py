@@ -17,6 +17,14 @@ def clear_database():
             session.commit()
             logger.info(f"已清除 {result.rowcount} 篇文章")
         
+        # 清除由文章衍生的事實表與作者檔案
+        logger.info("正在清除文章衍生資料...")
+        with db_manager.get_session() as session:
+            session.execute(text("DELETE FROM article_stocks"))
+            session.execute(text("DELETE FROM author_profiles"))
+            session.execute(text("DELETE FROM pending_stock_validations"))
+            session.commit()
+        
         # 清除所有爬蟲日誌
         logger.info("正在清除爬蟲日誌...")
         with db_manager.get_session() as session:
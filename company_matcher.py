@@ -0,0 +1,214 @@
+"""公司名稱比對模組 - 以 Aho-Corasick 自動機單次線性掃描文章中的中文公司名稱與別名."""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from symbol_master import symbol_master
+
+# 常見簡稱與俗稱：代碼 -> (市場, 正式名稱, 別名)
+COMMON_ALIASES: Dict[str, Tuple[str, str, List[str]]] = {
+    '2330': ('TW', '台積電', ['台積', '臺積電', '護國神山', 'TSMC']),
+    '2317': ('TW', '鴻海', ['鴻海精密', '海公公', 'Foxconn']),
+    '2454': ('TW', '聯發科', ['發哥', 'MTK']),
+    '2303': ('TW', '聯電', ['UMC']),
+    '2308': ('TW', '台達電', ['台達']),
+    '2382': ('TW', '廣達', ['廣達電腦']),
+    '2412': ('TW', '中華電', ['中華電信']),
+    '2603': ('TW', '長榮', ['長榮海運']),
+    '2609': ('TW', '陽明', ['陽明海運']),
+    '2615': ('TW', '萬海', ['萬海航運']),
+    '2618': ('TW', '長榮航', ['長榮航空']),
+    '2002': ('TW', '中鋼', ['中國鋼鐵']),
+    '2881': ('TW', '富邦金', ['富邦金控']),
+    '2882': ('TW', '國泰金', ['國泰金控']),
+    '2891': ('TW', '中信金', ['中信金控']),
+    '3008': ('TW', '大立光', ['大立']),
+    '3711': ('TW', '日月光投控', ['日月光']),
+    'NVDA': ('US', 'NVIDIA', ['輝達', '老黃']),
+    'TSLA': ('US', 'Tesla', ['特斯拉']),
+    'AAPL': ('US', 'Apple', ['蘋果公司']),
+    'MSFT': ('US', 'Microsoft', ['微軟']),
+    'AMD': ('US', 'AMD', ['超微']),
+    'GOOGL': ('US', 'Alphabet', ['谷歌', 'Google']),
+    'AMZN': ('US', 'Amazon', ['亞馬遜']),
+    'META': ('US', 'Meta', ['臉書']),
+    'INTC': ('US', 'Intel', ['英特爾']),
+    'MU': ('US', 'Micron', ['美光']),
+    'AVGO': ('US', 'Broadcom', ['博通']),
+}
+
+# 與日常用語相同、單獨出現時多半不是指該公司的名稱
+_AMBIGUOUS_NAMES = {'統一', '國產', '大眾', '全新', '精華', '正道', '中華', '台灣', '新光', '永豐'}
+
+# 正式名稱中可去掉的後綴，用來產生簡稱
+_NAME_SUFFIXES = ('股份有限公司', '-創', '-KY', '*')
+
+# 主檔名稱至少要這麼長才作為樣式；兩字名稱（南亞、大同、全家）太常與日常用語重疊，只使用 COMMON_ALIASES
+MIN_MASTER_NAME_LENGTH = 3
+
+# 名稱前後 CONTEXT_WINDOW 字內出現股票代碼或這些詞，才視為在談論該公司；
+# 只用指向個別公司的多字詞，「股」「漲」「跌」或「股市」「大跌」在股板文章裡幾乎處處可見
+STOCK_CONTEXT_KEYWORDS = (
+    '股價', '個股', '持股', '漲停', '跌停', '買進', '賣出', '進場', '出場', '營收', '財報', '法說',
+    '除息', '配息', '殖利率', '本益比', 'EPS', '目標價', '加碼', '減碼', '停損', '停利', '概念股',
+    '供應鏈', '訂單', '出貨', '產能', '毛利'
+)
+CONTEXT_WINDOW = 12
+
+def _is_ascii_word(pattern: str) -> bool:
+    """英數字樣式需要檢查字界，避免比對到較長單字的一部分."""
+    return pattern.isascii() and pattern.isalnum()
+
+class AhoCorasick:
+    """多樣式字串比對自動機."""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, str]]] = [[]]  # (樣式長度, 值)
+        self.size = 0
+
+    def add(self, pattern: str, value: str):
+        """加入樣式；建構完成前可重複呼叫."""
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        if (len(pattern), value) not in self.output[state]:
+            self.output[state].append((len(pattern), value))
+            self.size += 1
+
+    def build(self):
+        """以 BFS 建立失敗連結，並合併後綴節點的輸出."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """單次掃描文字，產生所有 (起點, 終點, 值)，可能重疊."""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.output[state]:
+                yield index - length + 1, index + 1, value
+
+class CompanyMatcher:
+    """由股票代碼主檔與別名表建立的公司名稱比對器."""
+
+    def __init__(self):
+        self.automaton: Optional[AhoCorasick] = None
+        self.stocks: Dict[str, Dict] = {}  # 代碼 -> 股票信息
+        self.master_version = -1
+
+    def _patterns(self) -> Iterator[Tuple[str, Dict]]:
+        """產生 (樣式, 股票信息)：三字以上的主檔名稱與去後綴簡稱，以及常見別名."""
+        for code, stock_info in symbol_master.taiwan.items():
+            name = (stock_info.get('name') or '').strip()
+            names = [name] + [name[:-len(suffix)].strip() for suffix in _NAME_SUFFIXES if name.endswith(suffix)]
+            for pattern in names:
+                if len(pattern) >= MIN_MASTER_NAME_LENGTH:
+                    yield pattern, stock_info
+
+        for code, (market, name, aliases) in COMMON_ALIASES.items():
+            lookup = symbol_master.lookup_taiwan if market == 'TW' else symbol_master.lookup_us
+            stock_info = lookup(code) or {
+                'code': code,
+                'name': name,
+                'market': market,
+                'type': 'taiwan_stock' if market == 'TW' else 'us_stock',
+                'valid': True
+            }
+            yield name, stock_info
+            for alias in aliases:
+                yield alias, stock_info
+
+    def build(self):
+        """重新建立自動機."""
+        automaton = AhoCorasick()
+        stocks = {}
+        for pattern, stock_info in self._patterns():
+            # 單一字元太容易誤判；與代碼相同的樣式已由代碼規則計數
+            if len(pattern) < 2 or pattern == stock_info['code'] or pattern in _AMBIGUOUS_NAMES:
+                continue
+            automaton.add(pattern, stock_info['code'])
+            stocks[stock_info['code']] = stock_info
+        automaton.build()
+
+        self.automaton = automaton
+        self.stocks = stocks
+        self.master_version = symbol_master.version
+        logger.info(f"Built company matcher with {automaton.size} patterns for {len(stocks)} stocks")
+
+    def _ensure_built(self):
+        """主檔重新載入後重建自動機."""
+        if self.automaton is None or self.master_version != symbol_master.version:
+            self.build()
+
+    @staticmethod
+    def _is_corroborated(text: str, start: int, end: int, code: str) -> bool:
+        """名稱前後出現代碼或股票相關詞（不含名稱本身）."""
+        context = text[max(0, start - CONTEXT_WINDOW):start] + ' ' + text[end:end + CONTEXT_WINDOW]
+        return code in context or any(keyword in context for keyword in STOCK_CONTEXT_KEYWORDS)
+
+    def find_mentions(self, text: str, known_codes: Iterable[str] = ()) -> Dict[str, int]:
+        """回傳文中提及的股票代碼與次數（重疊時取最左最長的名稱）.
+        
+        只計入有佐證的名稱：代碼已在文中出現（known_codes），或名稱附近有代碼或股票相關詞。
+        """
+        self._ensure_built()
+        if not text:
+            return {}
+
+        matches = []
+        for start, end, code in self.automaton.iter_matches(text):
+            pattern = text[start:end]
+            if _is_ascii_word(pattern):
+                before = text[start - 1] if start > 0 else ''
+                after = text[end] if end < len(text) else ''
+                if (before.isascii() and before.isalnum()) or (after.isascii() and after.isalnum()):
+                    continue
+            matches.append((start, end, code))
+
+        selected = []
+        covered_until = 0
+        for start, end, code in sorted(matches, key=lambda match: (match[0], match[0] - match[1])):
+            if start < covered_until:
+                continue
+            selected.append((start, end, code))
+            covered_until = end
+
+        known_codes = set(known_codes)
+        corroborated = known_codes | {
+            code for start, end, code in selected if self._is_corroborated(text, start, end, code)
+        }
+        mentions: Dict[str, int] = {}
+        for _, _, code in selected:
+            if code in corroborated:
+                mentions[code] = mentions.get(code, 0) + 1
+        return mentions
+
+    def get_stock_info(self, code: str) -> Optional[Dict]:
+        """取得比對到的股票信息."""
+        return self.stocks.get(code)
+
+# 創建全局實例
+company_matcher = CompanyMatcher()
@@ -28,11 +28,92 @@ class Settings(BaseSettings):
     # Crawler Settings
     crawl_interval: int = 300
     max_articles_per_crawl: int = 100
+    crawl_mode: str = "search"  # search: 逐一搜尋作者；index: 走訪看板索引頁一次服務所有作者
+    index_max_pages: int = 50  # 看板索引模式最多走訪的頁數
+    search_max_pages: int = 20  # 作者搜尋結果最多往前翻的頁數
+    parse_max_attempts: int = 3  # 文章解析失敗達此次數（跨爬蟲會話）即放棄，水位線可越過
+    parse_backend: str = "inline"  # inline: 在事件迴圈解析；process: 使用多進程池
+    parse_workers: int = 0  # 解析進程數，0 表示依 CPU 核心數自動決定
     enable_selenium: bool = False
     http_proxy_url: Optional[str] = None
     request_min_delay_ms: int = 800
     request_max_delay_ms: int = 2500
     backoff_max_sleep_seconds: int = 20
+    max_concurrent_requests: int = 4  # 同一爬蟲會話的同時請求上限
+    request_burst: int = 2  # 每個主機令牌桶的突發容量
+    max_fetch_retries: int = 3  # 429/5xx 的最大重試次數
+    
+    # Shared HTTP Client（爬蟲、股票驗證與分析器共用的連線池）
+    http_pool_limit: int = 100  # 整個進程的連線上限
+    http_pool_limit_per_host: int = 10  # 每個主機的連線上限
+    http_dns_cache_ttl: int = 300  # DNS 快取秒數
+    http_keepalive_timeout: int = 30  # 閒置 keep-alive 連線保留秒數
+    http_timeout: int = 60  # 預設請求逾時秒數（個別請求可覆寫）
+    
+    # Stock Symbol Master
+    symbol_sync_interval_hours: int = 24  # 股票代碼主檔的批次同步間隔
+    validation_cache_size: int = 5000  # 驗證結果記憶體 LRU 容量
+    validation_positive_ttl_hours: int = 168  # 有效代碼的快取時間
+    validation_negative_ttl_hours: int = 24  # 查無代碼的快取時間
+    finmind_rate_per_minute: float = 10  # FinMind 每分鐘請求數
+    finmind_daily_quota: int = 0  # FinMind 每日請求額度，0 表示不限
+    alpha_vantage_rate_per_minute: float = 5  # Alpha Vantage 每分鐘請求數
+    alpha_vantage_daily_quota: int = 25  # Alpha Vantage 免費方案每日額度
+    validation_max_wait_seconds: float = 5  # 等待令牌的上限，超過則延到下個時段驗證
+    
+    # LLM Worker Pool（AIMD 自適應並發）
+    llm_min_concurrency: int = 1
+    llm_max_concurrency: int = 0  # 0 表示依硬體自動決定
+    llm_timeout_seconds: int = 180  # 單次分析逾時，逾時的文章會重新排入佇列
+    llm_max_retries: int = 2  # 逾時後最多重新排隊次數
+    llm_latency_tolerance: float = 1.5  # 延遲超過基準的倍數時減半並發
+    
+    # Ollama Model Lifecycle
+    ollama_warmup: bool = True  # 爬蟲會話與分析工作者啟動時預先載入模型
+    ollama_keep_alive_seconds: int = 1800  # 每次請求後模型在 Ollama 保留的時間
+    ollama_hold_max_seconds: int = 7200  # 下次會話在此秒數內時保留模型，否則會話結束即卸載
+    llm_profile_path: str = "model_profile.json"  # model_calibration.py 的輸出
+    calibration_models: str = "qwen2.5:0.5b-instruct,qwen2.5:1.5b-instruct,qwen2.5:3b-instruct"  # 逗號分隔的候選模型
+    calibration_min_success_rate: float = 0.8  # JSON 解析成功率低於此值的模型不列入
+    calibration_min_tokens_per_sec: float = 5.0  # 生成速度低於此值的模型不列入
+    
+    # Relevance Filter（LLM 前置篩選）
+    relevance_filter_enabled: bool = True
+    relevance_threshold: float = 2.0  # 標題分類 + 已驗證股票數 + 關鍵詞分數低於此值時不送 LLM
+    
+    # Analysis Job Queue（分析失敗或未分析文章的背景工作）
+    analysis_job_batch_size: int = 4  # 每次領取的工作數
+    analysis_job_max_attempts: int = 5
+    analysis_job_backoff_seconds: int = 60  # 失敗後的退避基準，每次加倍
+    analysis_job_backoff_max_seconds: int = 3600
+    analysis_job_poll_seconds: int = 30  # 佇列為空時的輪詢間隔
+    analysis_job_lock_timeout_seconds: int = 900  # 超過此時間仍為 running 的工作視為工作者中斷並重新領取
+    
+    # LLM Analysis Cache
+    analysis_cache_size: int = 1000  # 記憶體 LRU 容量
+    analysis_cache_max_age_days: int = 30  # 資料庫快取保留天數
+    analysis_cache_max_entries: int = 20000  # 資料庫快取上限，超過時淘汰最久未命中的項目
+    
+    # Database Pool（同步與非同步引擎各自一個連線池）
+    db_pool_size: int = 10
+    db_max_overflow: int = 20  # 尖峰時可額外建立的連線數
+    db_pool_timeout: int = 30  # 等待可用連線的秒數
+    db_pool_recycle: int = 1800  # 連線使用超過此秒數後重新建立
+    
+    # Persistence
+    db_upsert_batch_size: int = 500  # 每個 INSERT ... ON CONFLICT 陳述式最多寫入的文章數
+    
+    # Author Profiles（保存文章時增量更新，python author_profiles.py --reconcile 重建）
+    author_profile_stock_limit: int = 50  # 每位作者保留計數的股票數量上限（依提及文章數）
+    
+    # Crawl Pipeline（各階段工作者數量與佇列大小）
+    pipeline_fetch_workers: int = 4
+    pipeline_parse_workers: int = 2
+    pipeline_validate_workers: int = 4
+    pipeline_analyze_workers: int = 1
+    pipeline_persist_batch_size: int = 0  # 保存階段每批最多文章數，0 表示與 db_upsert_batch_size 相同
+    pipeline_queue_size: int = 20
+    pipeline_stats_log_interval: int = 30
     
     # MCP Server
     mcp_server_host: str = "localhost"
@@ -1,18 +1,133 @@
 """爬蟲協調器 - 避免重複分析."""
 
 import asyncio
+import uuid
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional
 from loguru import logger
+from sqlalchemy import and_, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError
+from config import settings
 from ptt_crawler import PTTCrawler
+from crawl_pipeline import CrawlPipeline
 from database import db_manager
 from models import PTTArticle, CrawlLog
+from symbol_master import symbol_master
+from stock_validator import stock_validator
+from article_stocks import replace_article_stocks, refresh_article_stocks
+from author_profiles import update_author_profiles, record_author_articles
+from analysis_queue import analysis_queue, analysis_fields, ANALYSIS_COLUMNS, PRIORITY_CRAWL_FAILED
 
 class CrawlOrchestrator:
     """協調爬蟲和文章處理的類別."""
     
     def __init__(self):
         self.crawler = PTTCrawler()
+        self.pipeline: Optional[CrawlPipeline] = None
+        self.saved_count = 0
+        self.analyzed_count = 0
+    
+    def get_pipeline_stats(self) -> Dict[str, Any]:
+        """取得目前（或最近一次）管線各階段的佇列深度與吞吐量."""
+        if not self.pipeline:
+            return {}
+        return self.pipeline.get_stats()
+    
+    async def _discover_articles(self, authors: List[str]) -> AsyncIterator[Dict]:
+        """並發搜尋作者，依輪詢順序產生待抓取的新文章."""
+        for article in await self.crawler.discover_all_authors(authors):
+            yield article
+    
+    async def _stage_fetch(self, article: Dict) -> Optional[Dict]:
+        """抓取階段：下載文章頁面（原始 bytes）."""
+        page = await self.crawler._get_page(article['url'], raw=True)
+        if not page:
+            return None
+        return {'article': article, 'page': page}
+    
+    async def _stage_parse(self, item: Dict) -> Optional[Dict]:
+        """解析階段：取得內文並過濾不符條件的文章."""
+        article = item['article']
+        article_data = await self.crawler._parse_article_page(item['page'], article['url'], article['push_count'])
+        if not article_data:
+            self.crawler.mark_article_failed(article['article_id'], article['author'])
+            return None
+        return await self.crawler._accept_article(article_data, article)
+    
+    async def _stage_validate(self, article_data: Dict) -> Dict:
+        """驗證階段：提取並驗證股票代碼."""
+        return await self.crawler._validate_article_stocks(article_data)
+    
+    async def _stage_analyze(self, article_data: Dict) -> Dict:
+        """分析階段：LLM 分析."""
+        return await self.crawler._analyze_article(article_data)
+    
+    async def _stage_persist(self, articles_data: List[Dict]) -> List[Dict]:
+        """保存階段：文章一就緒便寫入資料庫."""
+        saved_count, analyzed_count = await self._save_articles_with_analysis(articles_data)
+        self.saved_count += saved_count
+        self.analyzed_count += analyzed_count
+        return articles_data
+    
+    def _analyze_workers(self) -> int:
+        """分析階段工作者數量至少要能填滿 LLM 工作池的並發上限."""
+        return max(settings.pipeline_analyze_workers, self.crawler.analyzer.worker_pool.max_concurrency)
+    
+    def _persist_batch_size(self) -> int:
+        """保存階段每批的文章數，預設與單一 upsert 陳述式的列數相同."""
+        return max(1, settings.pipeline_persist_batch_size or settings.db_upsert_batch_size)
+    
+    def _build_pipeline(self) -> CrawlPipeline:
+        """建立 fetch → parse → validate → analyze → persist 管線."""
+        queue_size = settings.pipeline_queue_size
+        persist_batch_size = self._persist_batch_size()
+        return (
+            CrawlPipeline()
+            .add_stage("fetch", self._stage_fetch, settings.pipeline_fetch_workers, queue_size)
+            .add_stage("parse", self._stage_parse, settings.pipeline_parse_workers, queue_size)
+            .add_stage("validate", self._stage_validate, settings.pipeline_validate_workers, queue_size)
+            .add_stage("analyze", self._stage_analyze, self._analyze_workers(), queue_size)
+            # 保存階段的佇列要能容納一整批，分析很快（快取命中或預篩略過）時才能湊成大批寫入
+            .add_stage("persist", self._stage_persist, 1, max(queue_size, persist_batch_size),
+                       batch_size=persist_batch_size)
+        )
+    
+    async def _log_pipeline_stats(self):
+        """定期記錄管線狀態，方便找出瓶頸."""
+        while True:
+            await asyncio.sleep(settings.pipeline_stats_log_interval)
+            logger.info(f"Pipeline stats: {self.get_pipeline_stats()}")
+    
+    async def _run_pipeline(self, authors: List[str]) -> tuple[int, int, int]:
+        """對指定作者執行管線，回傳 (found, saved, analyzed)."""
+        # 股票代碼主檔每日批次同步一次，驗證階段只查記憶體
+        await symbol_master.refresh_if_stale()
+        # 上個時段因 API 額度延後的代碼在新時段補驗證
+        await stock_validator.drain_deferred()
+        # 淘汰過期的 LLM 分析快取
+        await self.crawler.analyzer.evict_analysis_cache()
+        
+        self.pipeline = self._build_pipeline()
+        self.saved_count = 0
+        self.analyzed_count = 0
+        
+        # 搜尋與抓取文章的同時讓 Ollama 載入模型
+        warm_up_task = asyncio.create_task(self.crawler.analyzer.warm_up())
+        stats_task = asyncio.create_task(self._log_pipeline_stats())
+        try:
+            await self.pipeline.run(self._discover_articles(authors))
+        finally:
+            stats_task.cancel()
+            await asyncio.gather(warm_up_task, return_exceptions=True)
+        
+        # 只推進到已完整處理的位置，失敗的文章下次會重新抓取
+        await self.crawler.commit_watermarks()
+        
+        stats = self.get_pipeline_stats()
+        logger.info(f"Pipeline finished: {stats}")
+        # found 與管線前的定義相同：搜尋到、交給抓取的新文章數（不是通過解析與過濾後的數量）
+        return stats["fetch"]["received"], self.saved_count, self.analyzed_count
     
     async def run_crawl_session(self) -> Dict[str, Any]:
         """執行一次完整的爬蟲會話."""
@@ -26,15 +141,14 @@ class CrawlOrchestrator:
         
         try:
             async with self.crawler as crawler_instance:
-                # 爬取所有目標作者的文章
-                crawled_articles = await crawler_instance.crawl_all_authors()
-                articles_found = len(crawled_articles)
-                logger.info(f"Found {articles_found} new articles.")
+                if not await crawler_instance._setup_board_access():
+                    raise RuntimeError("Failed to setup board access")
                 
-                # 保存文章到資料庫，包含分析結果
-                saved_count, analyzed_count = await self._save_articles_with_analysis(crawled_articles)
-                articles_saved = saved_count
-                articles_analyzed = analyzed_count
+                # 以分段管線爬取所有目標作者的文章，文章就緒即保存
+                articles_found, articles_saved, articles_analyzed = await self._run_pipeline(
+                    crawler_instance.target_authors
+                )
+                logger.info(f"Found {articles_found} new articles.")
                 
         except Exception as e:
             logger.error(f"Crawl session failed: {e}")
@@ -54,9 +168,9 @@ class CrawlOrchestrator:
             "status": "error" if errors else "success"
         }
         
-        with db_manager.get_session() as session:
+        async with db_manager.get_async_session() as session:
             session.add(CrawlLog(**log_entry))
-            session.commit()
+            await session.commit()
         
         logger.info(f"Crawl session completed: Found {articles_found}, Saved {articles_saved}, Analyzed {articles_analyzed}, Duration: {duration:.2f}s")
         return {
@@ -64,72 +178,138 @@ class CrawlOrchestrator:
             "articles_found": articles_found, 
             "articles_saved": articles_saved,
             "articles_analyzed": articles_analyzed,
-            "duration_seconds": int(duration)
+            "duration_seconds": int(duration),
+            "pipeline": self.get_pipeline_stats()
         }
     
+    def _article_row(self, article_data: Dict) -> Dict[str, Any]:
+        """將文章資料轉為 ptt_articles 的一列（分析失敗時保留為未分析）."""
+        row = {
+            'id': uuid.uuid4(),
+            'article_id': article_data['article_id'],
+            'title': article_data.get('title', 'N/A'),
+            'author': article_data.get('author', 'N/A'),
+            'board': self.crawler.stock_board,
+            'url': article_data.get('url', ''),
+            'content': article_data.get('content', ''),
+            'publish_time': article_data.get('publish_time', datetime.utcnow()),
+            'push_count': article_data.get('push_count', 0),
+            'stock_symbols': article_data.get('stock_symbols', []),
+            'stock_mentions': article_data.get('stock_mentions', {}),
+            'crawl_time': datetime.utcnow(),
+            # 多列 VALUES 每列欄位必須一致，未分析的文章分析欄位填 None
+            **{column: None for column in ANALYSIS_COLUMNS},
+            'is_analyzed': False
+        }
+        analysis = article_data.get('analysis_result')
+        if analysis and not analysis.get('failed'):
+            row.update(analysis_fields(analysis))
+        return row
+    
+    async def _upsert_rows(self, session, rows: List[Dict[str, Any]]) -> List[Any]:
+        """以單一 INSERT ... ON CONFLICT 寫入一批文章，回傳新增或補上分析結果的列.
+        
+        已存在的文章只在原本未分析、這次有分析結果時更新分析欄位，其餘保持不變。
+        """
+        stmt = insert(PTTArticle).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PTTArticle.article_id],
+            set_={column: stmt.excluded[column] for column in ANALYSIS_COLUMNS},
+            where=and_(PTTArticle.is_analyzed == False, stmt.excluded.is_analyzed == True)
+        ).returning(
+            PTTArticle.article_id,
+            PTTArticle.is_analyzed,
+            # xmax 為 0 表示本次新增，否則是更新既有文章
+            literal_column("xmax = 0").label("inserted")
+        )
+        return (await session.execute(stmt)).all()
+    
+    async def _insert_rows_individually(self, session, rows: List[Dict[str, Any]]) -> tuple[List[Any], set]:
+        """批次寫入失敗（例如 url 唯一鍵衝突或單列資料無法寫入）時逐列寫入並略過任何重複，回傳 (寫入的列, 失敗的文章ID)."""
+        returned = []
+        failed_ids = set()
+        for row in rows:
+            try:
+                stmt = insert(PTTArticle).values(row).on_conflict_do_nothing().returning(
+                    PTTArticle.article_id,
+                    PTTArticle.is_analyzed,
+                    literal_column("true").label("inserted")
+                )
+                returned.extend((await session.execute(stmt)).all())
+                await session.commit()
+            except Exception as e:
+                logger.error(f"Error saving article {row['article_id']}: {e}")
+                await session.rollback()
+                failed_ids.add(row['article_id'])
+        return returned, failed_ids
+    
     async def _save_articles_with_analysis(self, articles_data: List[Dict]) -> tuple[int, int]:
-        """將文章資料（包含LLM分析結果）保存到資料庫."""
+        """將文章資料（包含LLM分析結果）以批次 upsert 保存到資料庫."""
         saved_count = 0
         analyzed_count = 0
+        pending_analysis = []
         
-        with db_manager.get_session() as session:
-            for article_data in articles_data:
+        # 同一批中重複的文章只保留最後一筆（ON CONFLICT 不能更新同一列兩次）
+        rows = list({row['article_id']: row for row in map(self._article_row, articles_data)}.values())
+        batch_size = max(1, settings.db_upsert_batch_size)
+        
+        async with db_manager.get_async_session() as session:
+            for offset in range(0, len(rows), batch_size):
+                batch = rows[offset:offset + batch_size]
+                batch_by_id = {row['article_id']: row for row in batch}
+                failed_ids = set()
                 try:
-                    # 再次檢查是否重複（雙重保險）
-                    from sqlalchemy import or_
-                    existing_article = session.query(PTTArticle).filter(
-                        or_(
-                            PTTArticle.article_id == article_data['article_id'],
-                            PTTArticle.url == article_data.get('url', '')
-                        )
-                    ).first()
-                    
-                    if existing_article:
-                        logger.info(f"Article {article_data['article_id']} or URL already exists, skipping")
-                        continue
-                    
-                    logger.info(f"Saving new article: {article_data['article_id']}")
-                    new_article = PTTArticle(
-                        article_id=article_data['article_id'],
-                        title=article_data.get('title', 'N/A'),
-                        author=article_data.get('author', 'N/A'),
-                        board=self.crawler.stock_board,
-                        url=article_data.get('url', ''),
-                        content=article_data.get('content', ''),
-                        publish_time=article_data.get('publish_time', datetime.utcnow()),
-                        push_count=article_data.get('push_count', 0),
-                        stock_symbols=article_data.get('stock_symbols', []),
-                        crawl_time=datetime.utcnow()
+                    returned = await self._upsert_rows(session, batch)
+                    # 新增或補上分析結果的文章在同一交易中更新 article_stocks
+                    stock_deltas = {}
+                    await replace_article_stocks(
+                        session, [batch_by_id[article_id] for article_id, *_ in returned], stock_deltas
                     )
-                    
-                    # 添加 LLM 分析結果
-                    analysis = article_data.get('analysis_result')
-                    if analysis:
-                        new_article.analysis_result = analysis
-                        new_article.analysis_time = datetime.utcnow()
-                        new_article.recommended_stocks = analysis.get('recommended_stocks')
-                        new_article.analysis_reason = analysis.get('reason')
-                        new_article.llm_sentiment = analysis.get('sentiment')
-                        new_article.llm_sectors = analysis.get('sectors')
-                        new_article.llm_strategy = analysis.get('strategy')
-                        new_article.llm_risk_level = analysis.get('risk_level')
-                        new_article.is_analyzed = True
-                        analyzed_count += 1
-                    
-                    session.add(new_article)
-                    session.commit()
-                    saved_count += 1
-                    
+                    # 作者檔案：新增的文章計入總數，既有文章補上分析結果只計入已分析數，
+                    # 最常提及股票依 article_stocks 的增減（含新的推薦標的）更新
+                    await update_author_profiles(
+                        session,
+                        [batch_by_id[article_id] for article_id, _, inserted in returned if inserted],
+                        [batch_by_id[article_id]['author'] for article_id, is_analyzed, inserted in returned
+                         if not inserted and is_analyzed],
+                        stock_deltas
+                    )
+                    await session.commit()
+                except DBAPIError as e:
+                    # 任何資料庫錯誤都改為逐列寫入，單一問題文章不會拖累整批
+                    await session.rollback()
+                    logger.warning(f"Bulk upsert failed, retrying row by row: {e.orig}")
+                    returned, failed_ids = await self._insert_rows_individually(session, batch)
+                    stock_deltas = {}
+                    await refresh_article_stocks([article_id for article_id, *_ in returned], stock_deltas)
+                    await record_author_articles([batch_by_id[article_id] for article_id, *_ in returned], stock_deltas)
                 except Exception as e:
-                    logger.error(f"Error saving article {article_data.get('article_id', 'N/A')}: {e}")
-                    session.rollback()
-                    # 如果是重複鍵錯誤，記錄但不中斷處理
-                    if "duplicate key value violates unique constraint" in str(e):
-                        logger.warning(f"Duplicate article detected, skipping: {article_data.get('article_id', 'N/A')}")
-                        continue
-            
-            logger.info(f"Saved {saved_count} articles, analyzed {analyzed_count} articles")
-            return saved_count, analyzed_count
+                    await session.rollback()
+                    # 未寫入的文章不推進水位，下次會重新抓取
+                    logger.error(f"Error saving batch of {len(batch)} articles: {e}")
+                    continue
+                
+                for article_id, is_analyzed, inserted in returned:
+                    if inserted:
+                        saved_count += 1
+                        if not is_analyzed:
+                            pending_analysis.append(article_id)
+                    if is_analyzed:
+                        analyzed_count += 1
+                
+                skipped = len(batch) - len(returned) - len(failed_ids)
+                if skipped:
+                    logger.info(f"Skipped {skipped} articles that already exist")
+                # 寫入失敗的文章不推進水位，下次會重新抓取
+                for row in batch:
+                    if row['article_id'] not in failed_ids:
+                        self.crawler.mark_article_done(row['article_id'])
+        
+        logger.info(f"Saved {saved_count} articles, analyzed {analyzed_count} articles")
+        
+        # 未完成分析的新文章以較高優先順序交給分析工作者
+        await analysis_queue.enqueue(pending_analysis, PRIORITY_CRAWL_FAILED)
+        return saved_count, analyzed_count
     
     async def crawl_single_author(self, author: str) -> Dict[str, Any]:
         """爬取單一作者的文章."""
@@ -143,16 +323,13 @@ class CrawlOrchestrator:
         
         try:
             async with self.crawler as crawler_instance:
+                if not await crawler_instance._setup_board_access():
+                    raise RuntimeError("Failed to setup board access")
+                
                 # 爬取單一作者的文章
-                crawled_articles = await crawler_instance.crawl_author_articles(author)
-                articles_found = len(crawled_articles)
+                articles_found, articles_saved, articles_analyzed = await self._run_pipeline([author])
                 logger.info(f"Found {articles_found} articles for author {author}.")
                 
-                # 保存文章到資料庫，包含分析結果
-                saved_count, analyzed_count = await self._save_articles_with_analysis(crawled_articles)
-                articles_saved = saved_count
-                articles_analyzed = analyzed_count
-                
         except Exception as e:
             logger.error(f"Crawl for author {author} failed: {e}")
             errors.append(str(e))
@@ -171,9 +348,9 @@ class CrawlOrchestrator:
             "status": "error" if errors else "success"
         }
         
-        with db_manager.get_session() as session:
+        async with db_manager.get_async_session() as session:
             session.add(CrawlLog(**log_entry))
-            session.commit()
+            await session.commit()
         
         logger.info(f"Crawl for author {author} completed: Found {articles_found}, Saved {articles_saved}, Analyzed {articles_analyzed}, Duration: {duration:.2f}s")
         return {
@@ -182,29 +359,17 @@ class CrawlOrchestrator:
             "articles_found": articles_found, 
             "articles_saved": articles_saved,
             "articles_analyzed": articles_analyzed,
-            "duration_seconds": int(duration)
+            "duration_seconds": int(duration),
+            "pipeline": self.get_pipeline_stats()
         }
     
     async def process_unprocessed_articles(self) -> Dict[str, Any]:
-        """處理資料庫中未經 LLM 分析的文章."""
+        """將資料庫中未經 LLM 分析的文章排入分析佇列並處理到期的工作."""
+        from analysis_worker import AnalysisWorker
+        
         logger.info("Processing unprocessed articles...")
-        processed_count = 0
-        
-        with db_manager.get_session() as session:
-            unprocessed_articles = session.query(PTTArticle).filter(
-                PTTArticle.is_analyzed == False
-            ).all()
-            
-            for article in unprocessed_articles:
-                try:
-                    # 這裡可以添加分析邏輯
-                    # 目前先標記為已處理
-                    article.is_analyzed = True
-                    processed_count += 1
-                except Exception as e:
-                    logger.error(f"Error processing article {article.article_id}: {e}")
-            
-            session.commit()
+        enqueued_count = await analysis_queue.enqueue_unanalyzed()
+        result = await AnalysisWorker().drain()
         
-        logger.info(f"Processed {processed_count} unprocessed articles")
-        return {"processed_count": processed_count, "status": "success"}
+        logger.info(f"Processed {result['processed_count']} unprocessed articles")
+        return {**result, "enqueued_count": enqueued_count, "status": "success"}
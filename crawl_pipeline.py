@@ -0,0 +1,167 @@
+"""分段式爬蟲管線 - 以有界 asyncio.Queue 串接各階段並提供背壓."""
+
+import asyncio
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional
+from loguru import logger
+
+# 通知下游階段結束的哨兵物件
+_STOP = object()
+
+class PipelineStage:
+    """管線中的單一階段."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[Any]],
+        workers: int = 1,
+        queue_size: int = 50,
+        batch_size: int = 1,
+    ):
+        self.name = name
+        self.handler = handler  # 回傳 None 表示丟棄該項目
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)  # > 1 時 handler 收到的是 list
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+        # 統計資料
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得階段的佇列深度與吞吐量."""
+        end = self.finished_at or time.monotonic()
+        elapsed = (end - self.started_at) if self.started_at else 0
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_maxsize": self.queue.maxsize,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "throughput_per_min": round(self.processed / elapsed * 60, 2) if elapsed > 0 else 0,
+            "avg_seconds": round(self.busy_seconds / self.processed, 3) if self.processed else 0,
+            # 工作者忙碌比例接近 1 代表此階段是瓶頸
+            "utilization": round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed > 0 else 0
+        }
+
+class CrawlPipeline:
+    """由多個階段組成的爬蟲管線."""
+
+    def __init__(self, name: str = "crawl"):
+        self.name = name
+        self.stages: List[PipelineStage] = []
+        self.running = False
+
+    def add_stage(
+        self,
+        name: str,
+        handler: Callable[[Any], Awaitable[Any]],
+        workers: int = 1,
+        queue_size: int = 50,
+        batch_size: int = 1,
+    ) -> "CrawlPipeline":
+        """新增階段，依加入順序串接."""
+        self.stages.append(PipelineStage(name, handler, workers, queue_size, batch_size))
+        return self
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """取得所有階段的統計資料."""
+        return {stage.name: stage.get_stats() for stage in self.stages}
+
+    async def _feed(self, source: AsyncIterable[Any]):
+        """將來源項目放入第一階段的佇列（佇列滿時自然阻塞）."""
+        first = self.stages[0]
+        try:
+            async for item in source:
+                first.received += 1
+                await first.queue.put(item)
+        except Exception as e:
+            logger.error(f"Pipeline '{self.name}' source failed: {e}")
+        finally:
+            for _ in range(first.workers):
+                await first.queue.put(_STOP)
+
+    async def _take_batch(self, stage: PipelineStage) -> tuple[List[Any], bool]:
+        """從佇列取出一批項目，回傳 (items, 是否收到哨兵)."""
+        item = await stage.queue.get()
+        if item is _STOP:
+            return [], True
+
+        items = [item]
+        while len(items) < stage.batch_size:
+            try:
+                item = stage.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is _STOP:
+                return items, True
+            items.append(item)
+        return items, False
+
+    async def _worker(self, index: int, results: List[Any]):
+        """單一工作者：處理項目並交給下一階段."""
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            items, stop = await self._take_batch(stage)
+            if items:
+                payload = items if stage.batch_size > 1 else items[0]
+                started = time.monotonic()
+                try:
+                    output = await stage.handler(payload)
+                except Exception as e:
+                    logger.error(f"Pipeline stage '{stage.name}' failed: {e}")
+                    stage.failed += len(items)
+                    output = _STOP
+                finally:
+                    stage.busy_seconds += time.monotonic() - started
+
+                if output is None:
+                    stage.dropped += len(items)
+                elif output is not _STOP:
+                    stage.processed += len(items)
+                    if next_stage:
+                        next_stage.received += 1
+                        await next_stage.queue.put(output)
+                    else:
+                        results.append(output)
+            if stop:
+                return
+
+    async def _run_stage(self, index: int, results: List[Any]):
+        """啟動階段的所有工作者，結束後通知下一階段."""
+        stage = self.stages[index]
+        stage.started_at = time.monotonic()
+        try:
+            await asyncio.gather(*(self._worker(index, results) for _ in range(stage.workers)))
+        finally:
+            stage.finished_at = time.monotonic()
+            if index + 1 < len(self.stages):
+                next_stage = self.stages[index + 1]
+                for _ in range(next_stage.workers):
+                    await next_stage.queue.put(_STOP)
+
+    async def run(self, source: AsyncIterable[Any]) -> List[Any]:
+        """執行管線直到來源耗盡，回傳最後階段的輸出."""
+        if not self.stages:
+            return []
+
+        results: List[Any] = []
+        self.running = True
+        try:
+            await asyncio.gather(
+                self._feed(source),
+                *(self._run_stage(index, results) for index in range(len(self.stages)))
+            )
+        finally:
+            self.running = False
+        return results
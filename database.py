@@ -1,26 +1,51 @@
 """Database connection and session management."""
 
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict, Optional
 import asyncio
 from functools import wraps
+from loguru import logger
 
 from config import settings
-from models import Base
+
+# Alembic 設定檔與遷移期間使用的 advisory lock 鍵（避免多個程序同時升級）
+ALEMBIC_INI_PATH = Path(__file__).resolve().parent / "alembic.ini"
+MIGRATION_LOCK_KEY = 7_246_531
+
+def _pool_options() -> Dict[str, Any]:
+    """同步與非同步引擎共用的連線池設定."""
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True
+    }
+
 # 建立資料庫引擎
 engine = create_engine(
     settings.database_url,
-    pool_pre_ping=True,
-    echo=False  # 設為True可看到SQL語句
+    echo=False,  # 設為True可看到SQL語句
+    **_pool_options()
 )
 
 # 建立Session工廠
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def create_tables():
-    """建立所有資料表."""
-    Base.metadata.create_all(bind=engine)
+    """以 Alembic 將資料庫升級到最新版本（取代 create_all）."""
+    config = Config(str(ALEMBIC_INI_PATH))
+    with engine.begin() as connection:
+        # 爬蟲、API 與分析工作者可能同時啟動，以交易層級的 advisory lock 序列化遷移
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
 def get_db() -> Session:
     """取得資料庫session."""
     db = SessionLocal()
@@ -29,13 +54,10 @@ def get_db() -> Session:
     finally:
         db.close()
 @asynccontextmanager
-async def get_async_db() -> AsyncGenerator[Session, None]:
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """異步取得資料庫session."""
-    db = SessionLocal()
-    try:
+    async with db_manager.get_async_session() as db:
         yield db
-    finally:
-        db.close()
 def run_async(func):
     """將同步函數包裝為異步執行."""
     @wraps(func)
@@ -49,6 +71,11 @@ class DatabaseManager:
     def __init__(self):
         self.engine = engine
         self.SessionLocal = SessionLocal
+        
+        # 非同步引擎（psycopg async）：連線綁定建立時的事件迴圈，迴圈更換時重新建立
+        self.async_engine: Optional[AsyncEngine] = None
+        self.AsyncSessionLocal: Optional[async_sessionmaker] = None
+        self.async_loop: Optional[asyncio.AbstractEventLoop] = None
     
     def create_tables(self):
         """建立資料表."""
@@ -58,14 +85,62 @@ class DatabaseManager:
         """取得新的session."""
         return self.SessionLocal()
     
+    def get_async_engine(self) -> AsyncEngine:
+        """取得目前事件迴圈的非同步引擎，必要時（首次或事件迴圈更換）重新建立."""
+        loop = asyncio.get_running_loop()
+        if self.async_engine is not None and self.async_loop is loop:
+            return self.async_engine
+        
+        if self.async_engine is not None:
+            # 舊事件迴圈的連線無法在新迴圈中使用，直接丟棄不關閉
+            logger.warning("Event loop changed, recreating async database engine")
+            self.async_engine.sync_engine.dispose(close=False)
+        
+        self.async_engine = create_async_engine(settings.database_url, echo=False, **_pool_options())
+        self.AsyncSessionLocal = async_sessionmaker(
+            self.async_engine,
+            autoflush=False,
+            expire_on_commit=False  # commit 後仍可讀取物件屬性，不需再次查詢
+        )
+        self.async_loop = loop
+        return self.async_engine
+    
+    def get_async_session(self) -> AsyncSession:
+        """取得新的非同步session（以 async with 使用）."""
+        self.get_async_engine()
+        return self.AsyncSessionLocal()
+    
+    async def close(self):
+        """關閉非同步連線池."""
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+            self.async_engine = None
+            self.AsyncSessionLocal = None
+            self.async_loop = None
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """取得同步與非同步連線池的使用狀態."""
+        def describe(pool) -> Dict[str, Any]:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow()
+            }
+        
+        return {
+            "sync": describe(self.engine.pool),
+            "async": describe(self.async_engine.sync_engine.pool) if self.async_engine else None
+        }
+    
     async def health_check(self) -> bool:
         """檢查資料庫連線狀態."""
         try:
-            with self.get_session() as session:
-                session.execute(text("SELECT 1"))
+            async with self.get_async_session() as session:
+                await session.execute(text("SELECT 1"))
                 return True
         except Exception as e:
-            print(f"Database health check failed: {e}")
+            logger.error(f"Database health check failed: {e}")
             return False
 # 全域資料庫管理實例
 db_manager = DatabaseManager()
@@ -68,6 +68,29 @@ module.exports = {
       out_file: '/var/log/chaser/scheduler-out.log',
       log_file: '/var/log/chaser/scheduler-combined.log',
       time: true
+    },
+    {
+      name: 'chaser-analysis-worker',
+      script: '/var/www/chaser/venv/bin/python',
+      args: 'analysis_worker.py',
+      cwd: '/var/www/chaser',
+      user: 'www-data',
+      instances: 1,
+      autorestart: true,
+      watch: false,
+      max_memory_restart: '256M',
+      restart_delay: 10000, // 工作者重啟延遲 10 秒
+      max_restarts: 5,
+      min_uptime: '30s',
+      kill_timeout: 5000,   // 強制關閉超時
+      env: {
+        NODE_ENV: 'production',
+        PYTHONPATH: '/var/www/chaser'
+      },
+      error_file: '/var/log/chaser/analysis-worker-error.log',
+      out_file: '/var/log/chaser/analysis-worker-out.log',
+      log_file: '/var/log/chaser/analysis-worker-combined.log',
+      time: true
     }
   ]
 };
@@ -0,0 +1,134 @@
+"""共用 HTTP 客戶端 - 每個進程一個 keep-alive 連線池，供爬蟲、股票驗證與分析器使用."""
+
+import asyncio
+from typing import Any, Dict, Optional
+
+import aiohttp
+from loguru import logger
+
+from config import settings
+
+class HTTPClient:
+    """進程層級的 aiohttp 連線池（每主機 keep-alive、DNS 快取、可設定上限）."""
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.connector: Optional[aiohttp.TCPConnector] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # 事件迴圈更換時留下的舊 session，由擁有它的迴圈在 close() 時關閉
+        self.stale_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+        # 連線重用統計；進行中的請求數以追蹤事件自行計算，不讀取 connector 內部狀態
+        self.requests = 0
+        self.in_flight = 0
+        self.in_flight_per_host: Dict[str, int] = {}
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """建立追蹤設定以統計連線建立與重用次數."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+            self.in_flight += 1
+            host = params.url.host
+            self.in_flight_per_host[host] = self.in_flight_per_host.get(host, 0) + 1
+
+        async def on_request_done(session, context, params):
+            self.in_flight -= 1
+            host = params.url.host
+            self.in_flight_per_host[host] = self.in_flight_per_host.get(host, 1) - 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.dns_cache_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_done)
+        trace_config.on_request_exception.append(on_request_done)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """取得共用 session，必要時（首次、已關閉或事件迴圈更換）重新建立."""
+        loop = asyncio.get_running_loop()
+        if self.session is not None and not self.session.closed and self.loop is loop:
+            return self.session
+
+        if self.session is not None and not self.session.closed:
+            # 舊事件迴圈的 session 無法在新迴圈中使用；保留給原本的迴圈關閉，已結束的迴圈則直接放掉
+            logger.warning("Event loop changed, recreating shared HTTP session")
+            if not self.loop.is_closed():
+                self.stale_sessions[self.loop] = self.session
+        self.stale_sessions = {
+            owner: session for owner, session in self.stale_sessions.items() if not owner.is_closed()
+        }
+
+        self.connector = aiohttp.TCPConnector(
+            limit=settings.http_pool_limit,
+            limit_per_host=settings.http_pool_limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=settings.http_dns_cache_ttl,
+            keepalive_timeout=settings.http_keepalive_timeout
+        )
+        self.session = aiohttp.ClientSession(
+            connector=self.connector,
+            timeout=aiohttp.ClientTimeout(total=settings.http_timeout),
+            trace_configs=[self._build_trace_config()]
+        )
+        self.loop = loop
+        logger.info(
+            f"Created shared HTTP session (limit={settings.http_pool_limit}, "
+            f"per_host={settings.http_pool_limit_per_host})"
+        )
+        return self.session
+
+    async def close(self):
+        """關閉目前事件迴圈擁有的 session 與連線池."""
+        loop = asyncio.get_running_loop()
+        stale = self.stale_sessions.pop(loop, None)
+        if stale is not None and not stale.closed:
+            await stale.close()
+        if self.loop is not loop:
+            return
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.connector = None
+        self.loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得連線池使用率（以進行中的請求計）與連線重用統計."""
+        limit = settings.http_pool_limit
+        total_connections = self.connections_created + self.connections_reused
+        return {
+            "active": self.session is not None and not self.session.closed,
+            "limit": limit,
+            "limit_per_host": settings.http_pool_limit_per_host,
+            "in_flight": self.in_flight,
+            "utilization": round(self.in_flight / limit, 3) if limit else 0,
+            "in_flight_per_host": {host: count for host, count in self.in_flight_per_host.items() if count},
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_rate": round(self.connections_reused / total_connections, 3) if total_connections else 0,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses
+        }
+
+# 創建全局實例
+http_client = HTTPClient()
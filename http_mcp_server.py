@@ -1,15 +1,46 @@
 """HTTP MCP Server for PTT Stock Crawler."""
 
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
+from sqlalchemy import select, func
 
 from database import db_manager
-from models import PTTArticle, AuthorProfile, CrawlLog
+from models import PTTArticle, AuthorProfile, CrawlLog, ArticleStock, ARTICLE_LIST_FIELDS
 from crawl_orchestrator import CrawlOrchestrator
+from http_client import http_client
+from symbol_master import symbol_master
+from stock_validator import stock_validator
+from article_analyzer import analyzer
+from analysis_queue import analysis_queue
+from relevance_filter import relevance_filter
+from author_profiles import top_stocks
+
+# 文章列表只查詢列表欄位，不載入 content（依 idx_author_time_desc 的順序取得）
+ARTICLE_LIST_COLUMNS = [PTTArticle.author, PTTArticle.publish_time] + [
+    getattr(PTTArticle, field) for field in ARTICLE_LIST_FIELDS
+]
+
+def _article_list_item(article) -> Dict[str, Any]:
+    """文章列表的單筆輸出."""
+    return {
+        "id": str(article.id),
+        "article_id": article.article_id,
+        "title": article.title,
+        "author": article.author,
+        "board": article.board,
+        "url": article.url,
+        "publish_time": article.publish_time.isoformat() if article.publish_time else None,
+        "push_count": article.push_count,
+        "stock_symbols": article.stock_symbols,
+        "is_analyzed": article.is_analyzed,
+        "llm_sentiment": article.llm_sentiment,
+        "llm_strategy": article.llm_strategy,
+        "recommended_stocks": article.recommended_stocks
+    }
 
 app = FastAPI(title="PTT Stock Crawler API", version="1.0.0")
 
@@ -30,6 +61,7 @@ class CrawlManager:
         self.lock = asyncio.Lock()
         self.is_running = False
         self.current_task = None
+        self.orchestrator = None
         self.current_author = None
         self.start_time = None
         self.status = "idle"  # idle, running, completed, error
@@ -63,8 +95,8 @@ class CrawlManager:
             
             try:
                 # 創建協調器並執行爬蟲
-                orchestrator = CrawlOrchestrator()
-                result = await orchestrator.crawl_single_author(author)
+                self.orchestrator = CrawlOrchestrator()
+                result = await self.orchestrator.crawl_single_author(author)
                 
                 # 更新狀態
                 self.status = result.get("status", "completed")
@@ -87,7 +119,9 @@ class CrawlManager:
             "status": self.status,
             "current_author": self.current_author,
             "start_time": self.start_time.isoformat() if self.start_time else None,
-            "elapsed_seconds": (datetime.now() - self.start_time).total_seconds() if self.start_time else None
+            "elapsed_seconds": (datetime.now() - self.start_time).total_seconds() if self.start_time else None,
+            # 各管線階段的佇列深度與吞吐量（執行中或最近一次）
+            "pipeline": self.orchestrator.get_pipeline_stats() if self.orchestrator else {}
         }
 
 # 創建全局爬蟲管理器
@@ -114,36 +148,28 @@ async def health_check():
 @app.get("/articles")
 async def get_articles(
     author: Optional[str] = Query(None, description="作者名稱"),
+    stock: Optional[str] = Query(None, description="股票代碼（JSONB 包含查詢）"),
+    recommended_only: bool = Query(False, description="只比對 LLM 推薦標的"),
     limit: int = Query(50, description="返回數量限制"),
     offset: int = Query(0, description="偏移量")
 ):
     """獲取文章列表."""
     try:
-        with db_manager.get_session() as session:
-            query = session.query(PTTArticle)
+        async with db_manager.get_async_session() as session:
+            query = select(*ARTICLE_LIST_COLUMNS)
             
             if author:
-                query = query.filter(PTTArticle.author == author)
+                query = query.where(PTTArticle.author == author)
+            if stock:
+                # 以 @> 查詢，使用 jsonb_path_ops GIN 索引
+                column = PTTArticle.recommended_stocks if recommended_only else PTTArticle.stock_symbols
+                query = query.where(column.contains([stock.strip().upper()]))
             
-            articles = query.order_by(PTTArticle.publish_time.desc()).offset(offset).limit(limit).all()
+            articles = (await session.execute(
+                query.order_by(PTTArticle.publish_time.desc()).offset(offset).limit(limit)
+            )).all()
             
-            result = []
-            for article in articles:
-                result.append({
-                    "id": str(article.id),
-                    "article_id": article.article_id,
-                    "title": article.title,
-                    "author": article.author,
-                    "board": article.board,
-                    "url": article.url,
-                    "publish_time": article.publish_time.isoformat() if article.publish_time else None,
-                    "push_count": article.push_count,
-                    "stock_symbols": article.stock_symbols,
-                    "is_analyzed": article.is_analyzed,
-                    "llm_sentiment": article.llm_sentiment,
-                    "llm_strategy": article.llm_strategy,
-                    "recommended_stocks": article.recommended_stocks
-                })
+            result = [_article_list_item(article) for article in articles]
             
             return {
                 "articles": result,
@@ -159,10 +185,10 @@ async def get_articles(
 async def get_article(article_id: str):
     """獲取單篇文章詳情."""
     try:
-        with db_manager.get_session() as session:
-            article = session.query(PTTArticle).filter(
-                PTTArticle.article_id == article_id
-            ).first()
+        async with db_manager.get_async_session() as session:
+            article = await session.scalar(
+                select(PTTArticle).where(PTTArticle.article_id == article_id)
+            )
             
             if not article:
                 raise HTTPException(status_code=404, detail="Article not found")
@@ -206,10 +232,10 @@ async def get_article(article_id: str):
 async def get_article_analysis(article_id: str):
     """獲取文章分析結果."""
     try:
-        with db_manager.get_session() as session:
-            article = session.query(PTTArticle).filter(
-                PTTArticle.article_id == article_id
-            ).first()
+        async with db_manager.get_async_session() as session:
+            article = await session.scalar(
+                select(PTTArticle).where(PTTArticle.article_id == article_id)
+            )
             
             if not article:
                 raise HTTPException(status_code=404, detail="Article not found")
@@ -235,9 +261,11 @@ async def get_article_analysis(article_id: str):
 async def get_authors():
     """獲取作者列表."""
     try:
-        with db_manager.get_session() as session:
-            authors = session.query(PTTArticle.author).distinct().all()
-            author_list = [author[0] for author in authors]
+        async with db_manager.get_async_session() as session:
+            # 讀取作者檔案（O(作者數)），不掃描文章表
+            author_list = list((await session.scalars(
+                select(AuthorProfile.author).where(AuthorProfile.total_articles > 0).order_by(AuthorProfile.author)
+            )).all())
             
             return {
                 "authors": author_list,
@@ -247,6 +275,35 @@ async def get_authors():
         logger.error(f"Error getting authors: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/authors/{author_name}/profile")
+async def get_author_profile(
+    author_name: str,
+    top: int = Query(10, description="最常提及股票的數量")
+):
+    """獲取作者檔案（文章數、平均推噓、最常提及股票與發文時段）."""
+    try:
+        async with db_manager.get_async_session() as session:
+            profile = await session.scalar(select(AuthorProfile).where(AuthorProfile.author == author_name))
+            if profile is None:
+                raise HTTPException(status_code=404, detail="Author not found")
+            
+            return {
+                "author": profile.author,
+                "total_articles": profile.total_articles,
+                "analyzed_articles": profile.analyzed_articles,
+                "last_article_time": profile.last_article_time.isoformat() if profile.last_article_time else None,
+                "avg_push_count": profile.avg_push_count,
+                "avg_boo_count": profile.avg_boo_count,
+                "favorite_stocks": top_stocks(profile, top),
+                "activity_pattern": profile.activity_pattern,
+                "updated_at": profile.updated_at.isoformat() if profile.updated_at else None
+            }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting author profile: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/authors/{author_name}/articles")
 async def get_author_articles(
     author_name: str,
@@ -255,26 +312,14 @@ async def get_author_articles(
 ):
     """獲取特定作者的文章."""
     try:
-        with db_manager.get_session() as session:
-            articles = session.query(PTTArticle).filter(
-                PTTArticle.author == author_name
-            ).order_by(PTTArticle.publish_time.desc()).offset(offset).limit(limit).all()
+        async with db_manager.get_async_session() as session:
+            articles = (await session.execute(
+                select(*ARTICLE_LIST_COLUMNS).where(
+                    PTTArticle.author == author_name
+                ).order_by(PTTArticle.publish_time.desc()).offset(offset).limit(limit)
+            )).all()
             
-            result = []
-            for article in articles:
-                result.append({
-                    "id": str(article.id),
-                    "article_id": article.article_id,
-                    "title": article.title,
-                    "url": article.url,
-                    "publish_time": article.publish_time.isoformat() if article.publish_time else None,
-                    "push_count": article.push_count,
-                    "stock_symbols": article.stock_symbols,
-                    "is_analyzed": article.is_analyzed,
-                    "llm_sentiment": article.llm_sentiment,
-                    "llm_strategy": article.llm_strategy,
-                    "recommended_stocks": article.recommended_stocks
-                })
+            result = [_article_list_item(article) for article in articles]
             
             return {
                 "author": author_name,
@@ -287,14 +332,74 @@ async def get_author_articles(
         logger.error(f"Error getting author articles: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/stocks/{code}/mentions")
+async def get_stock_mentions(
+    code: str,
+    days: int = Query(7, description="查詢天數"),
+    recommended_only: bool = Query(False, description="只列出 LLM 推薦的文章"),
+    limit: int = Query(50, description="返回數量限制")
+):
+    """查詢提及特定股票的文章與作者（article_stocks 索引範圍掃描）."""
+    try:
+        code = code.strip().upper()
+        cutoff = datetime.now() - timedelta(days=days)
+        conditions = [ArticleStock.code == code, ArticleStock.publish_time >= cutoff]
+        if recommended_only:
+            conditions.append(ArticleStock.is_recommended == True)
+        
+        async with db_manager.get_async_session() as session:
+            rows = (await session.execute(
+                select(ArticleStock, PTTArticle.title, PTTArticle.url).join(
+                    PTTArticle, PTTArticle.article_id == ArticleStock.article_id
+                ).where(*conditions).order_by(ArticleStock.publish_time.desc()).limit(limit)
+            )).all()
+            authors = (await session.execute(
+                select(
+                    ArticleStock.author,
+                    func.count(ArticleStock.id),
+                    func.sum(ArticleStock.mention_count)
+                ).where(*conditions).group_by(ArticleStock.author).order_by(func.count(ArticleStock.id).desc())
+            )).all()
+        
+        return {
+            "code": code,
+            "days": days,
+            "authors": [
+                {"author": author, "articles": articles, "mentions": int(mentions or 0)}
+                for author, articles, mentions in authors
+            ],
+            "articles": [
+                {
+                    "article_id": fact.article_id,
+                    "title": title,
+                    "url": url,
+                    "author": fact.author,
+                    "publish_time": fact.publish_time.isoformat() if fact.publish_time else None,
+                    "mention_count": fact.mention_count,
+                    "is_recommended": fact.is_recommended,
+                    "sentiment": fact.sentiment
+                }
+                for fact, title, url in rows
+            ],
+            "total": len(rows)
+        }
+    except Exception as e:
+        logger.error(f"Error getting mentions for stock {code}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/stats")
 async def get_stats():
     """獲取統計信息."""
     try:
-        with db_manager.get_session() as session:
-            total_articles = session.query(PTTArticle).count()
-            analyzed_articles = session.query(PTTArticle).filter(PTTArticle.is_analyzed == True).count()
-            total_authors = session.query(PTTArticle.author).distinct().count()
+        async with db_manager.get_async_session() as session:
+            # 由作者檔案彙總（O(作者數)），保存文章時已增量更新
+            total_articles, analyzed_articles, total_authors = (await session.execute(
+                select(
+                    func.coalesce(func.sum(AuthorProfile.total_articles), 0),
+                    func.coalesce(func.sum(AuthorProfile.analyzed_articles), 0),
+                    func.count(AuthorProfile.id)
+                ).where(AuthorProfile.total_articles > 0)
+            )).one()
             
             return {
                 "total_articles": total_articles,
@@ -335,6 +440,26 @@ async def get_crawl_status():
         logger.error(f"Error getting crawl status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def get_metrics():
+    """查詢執行期指標（連線池使用率等）."""
+    try:
+        return {
+            "http_pool": http_client.get_stats(),
+            "db_pool": db_manager.get_pool_stats(),
+            "symbol_master": symbol_master.get_stats(),
+            "stock_validation_cache": stock_validator.get_cache_stats(),
+            "analysis_cache": analyzer.get_cache_stats(),
+            "analysis_pool": analyzer.worker_pool.get_stats(),
+            "analysis_stream": analyzer.get_stream_stats(),
+            "analysis_jobs": await analysis_queue.get_stats(),
+            "relevance_filter": relevance_filter.get_stats(),
+            "analysis_model": analyzer.get_model_stats()
+        }
+    except Exception as e:
+        logger.error(f"Error getting metrics: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -11,6 +11,9 @@ from database import db_manager
 from ptt_crawler import PTTCrawler
 from http_mcp_server import app as mcp_app
 from crawl_orchestrator import CrawlOrchestrator
+from ptt_parser import parser_pool
+from http_client import http_client
+from article_analyzer import analyzer
 import uvicorn
 
 class PTTStockCrawlerApp:
@@ -60,6 +63,9 @@ class PTTStockCrawlerApp:
                 except Exception as e:
                     logger.error(f"Crawl session failed: {e}")
                 
+                # 間隔短時讓模型留在 Ollama，間隔長時卸載釋放記憶體
+                await analyzer.hold_model(settings.crawl_interval)
+                
                 # 等待下次執行
                 await asyncio.sleep(settings.CRAWL_INTERVAL)
         except Exception as e:
@@ -142,6 +148,14 @@ class PTTStockCrawlerApp:
             except asyncio.CancelledError:
                 pass
         
+        # 關閉解析進程池與 LLM 工作池
+        parser_pool.shutdown()
+        await analyzer.worker_pool.shutdown()
+        
+        # 關閉共用 HTTP 與資料庫連線池
+        await http_client.close()
+        await db_manager.close()
+        
         logger.info("Application shutdown complete")
 
 async def main():
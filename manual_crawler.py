@@ -9,6 +9,8 @@ from config import settings
 from database import db_manager
 from ptt_crawler import PTTCrawler
 from crawl_orchestrator import CrawlOrchestrator
+from http_client import http_client
+from article_analyzer import analyzer
 
 async def manual_crawl():
     """手動執行爬蟲和分析."""
@@ -19,7 +21,12 @@ async def manual_crawl():
     
     # 執行爬蟲
     orchestrator = CrawlOrchestrator()
-    result = await orchestrator.run_crawl_session()
+    try:
+        result = await orchestrator.run_crawl_session()
+    finally:
+        await analyzer.worker_pool.shutdown()
+        await http_client.close()
+        await db_manager.close()
     
     logger.info(f"Manual crawl completed: {result}")
     return result
@@ -5,6 +5,7 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from loguru import logger
+from sqlalchemy import select
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
@@ -43,12 +44,14 @@ class PTTMCPService:
             result = await self.orchestrator.run_crawl_session()
             
             # 獲取最近的文章
-            with db_manager.get_session() as session:
+            async with db_manager.get_async_session() as session:
                 cutoff_date = datetime.now() - timedelta(days=days)
-                articles = session.query(PTTArticle).filter(
-                    PTTArticle.author == author,
-                    PTTArticle.publish_time >= cutoff_date
-                ).order_by(PTTArticle.publish_time.desc()).all()
+                articles = (await session.scalars(
+                    select(PTTArticle).where(
+                        PTTArticle.author == author,
+                        PTTArticle.publish_time >= cutoff_date
+                    ).order_by(PTTArticle.publish_time.desc())
+                )).all()
                 
                 articles_data = []
                 for article in articles:
@@ -82,12 +85,14 @@ class PTTMCPService:
             # 獲取指定時間範圍的文章
             cutoff_date = datetime.now() - timedelta(days=months * 30)
             
-            with db_manager.get_session() as session:
-                articles = session.query(PTTArticle).filter(
-                    PTTArticle.author == author,
-                    PTTArticle.publish_time >= cutoff_date,
-                    PTTArticle.is_analyzed == True
-                ).order_by(PTTArticle.publish_time.desc()).all()
+            async with db_manager.get_async_session() as session:
+                articles = (await session.scalars(
+                    select(PTTArticle).where(
+                        PTTArticle.author == author,
+                        PTTArticle.publish_time >= cutoff_date,
+                        PTTArticle.is_analyzed == True
+                    ).order_by(PTTArticle.publish_time.desc())
+                )).all()
                 
                 if not articles:
                     return {
@@ -139,9 +144,11 @@ class PTTMCPService:
     async def get_author_list(self) -> Dict[str, Any]:
         """獲取所有作者列表."""
         try:
-            with db_manager.get_session() as session:
-                authors = session.query(PTTArticle.author).distinct().all()
-                author_list = [author[0] for author in authors]
+            async with db_manager.get_async_session() as session:
+                # 讀取作者檔案（O(作者數)），不掃描文章表
+                author_list = list((await session.scalars(
+                    select(AuthorProfile.author).where(AuthorProfile.total_articles > 0).order_by(AuthorProfile.author)
+                )).all())
                 
                 return {
                     "authors": author_list,
@@ -210,10 +217,12 @@ async def search_author_articles(author: str, limit: int = 50) -> str:
         limit: 返回文章數量限制
     """
     try:
-        with db_manager.get_session() as session:
-            articles = session.query(PTTArticle).filter(
-                PTTArticle.author == author
-            ).order_by(PTTArticle.publish_time.desc()).limit(limit).all()
+        async with db_manager.get_async_session() as session:
+            articles = (await session.scalars(
+                select(PTTArticle).where(
+                    PTTArticle.author == author
+                ).order_by(PTTArticle.publish_time.desc()).limit(limit)
+            )).all()
             
             articles_data = []
             for article in articles:
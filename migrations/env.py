@@ -0,0 +1,47 @@
+"""Alembic 遷移環境：使用應用程式的連線設定與模型 metadata."""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from config import settings
+from models import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+# 由 database.create_tables() 呼叫時沿用應用程式的 loguru 設定，只有 CLI 才載入 alembic.ini 的 logging
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+def run_migrations_offline() -> None:
+    """產生 SQL 腳本（alembic upgrade head --sql），不連線資料庫."""
+    context.configure(
+        url=settings.database_url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    """連線資料庫執行遷移；若呼叫端已提供連線（含 advisory lock）則沿用."""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    engine = create_engine(settings.database_url, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,213 @@
+"""baseline schema
+
+建立目前所有資料表。先前以 Base.metadata.create_all 建立的資料庫會直接沿用既有的資料表，
+只補建缺少的資料表，因此不需要手動 stamp.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLES = (
+    'ptt_articles', 'crawl_logs', 'author_profiles', 'crawl_watermarks', 'stock_symbols',
+    'stock_validation_cache', 'pending_stock_validations', 'llm_analysis_cache', 'analysis_jobs', 'article_stocks'
+)
+
+
+def _id_column() -> sa.Column:
+    return sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True)
+
+
+def upgrade() -> None:
+    # 離線產生 SQL（--sql）時無法檢查資料庫，視為空資料庫
+    existing = set() if op.get_context().as_sql else set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'ptt_articles' not in existing:
+        op.create_table(
+            'ptt_articles',
+            _id_column(),
+            sa.Column('article_id', sa.String(50), nullable=False),
+            sa.Column('title', sa.String(500), nullable=False),
+            sa.Column('author', sa.String(50), nullable=False),
+            sa.Column('board', sa.String(50), nullable=False),
+            sa.Column('url', sa.String(500), nullable=False, unique=True),
+            sa.Column('content', sa.Text()),
+            sa.Column('publish_time', sa.DateTime(), nullable=False),
+            sa.Column('crawl_time', sa.DateTime(), nullable=False),
+            sa.Column('push_count', sa.Integer()),
+            sa.Column('boo_count', sa.Integer()),
+            sa.Column('arrow_count', sa.Integer()),
+            sa.Column('stock_symbols', sa.JSON()),
+            sa.Column('stock_mentions', sa.JSON()),
+            sa.Column('category', sa.String(100)),
+            sa.Column('tags', sa.JSON()),
+            sa.Column('sentiment', sa.String(20)),
+            sa.Column('analysis_result', sa.JSON()),
+            sa.Column('analysis_time', sa.DateTime()),
+            sa.Column('recommended_stocks', sa.JSON()),
+            sa.Column('analysis_reason', sa.Text()),
+            sa.Column('llm_sentiment', sa.String(20)),
+            sa.Column('llm_sectors', sa.JSON()),
+            sa.Column('llm_strategy', sa.String(50)),
+            sa.Column('llm_risk_level', sa.String(20)),
+            sa.Column('is_processed', sa.Boolean()),
+            sa.Column('is_analyzed', sa.Boolean()),
+            sa.Column('is_relevant', sa.Boolean())
+        )
+        op.create_index('ix_ptt_articles_article_id', 'ptt_articles', ['article_id'], unique=True)
+        op.create_index('ix_ptt_articles_author', 'ptt_articles', ['author'])
+        op.create_index('ix_ptt_articles_board', 'ptt_articles', ['board'])
+        op.create_index('ix_ptt_articles_publish_time', 'ptt_articles', ['publish_time'])
+        op.create_index('idx_author_time', 'ptt_articles', ['author', 'publish_time'])
+        op.create_index('idx_board_time', 'ptt_articles', ['board', 'publish_time'])
+        op.create_index('idx_publish_time', 'ptt_articles', ['publish_time'])
+
+    if 'crawl_logs' not in existing:
+        op.create_table(
+            'crawl_logs',
+            _id_column(),
+            sa.Column('crawl_time', sa.DateTime(), nullable=False),
+            sa.Column('target_authors', sa.JSON()),
+            sa.Column('articles_found', sa.Integer()),
+            sa.Column('articles_saved', sa.Integer()),
+            sa.Column('articles_analyzed', sa.Integer()),
+            sa.Column('errors', sa.JSON()),
+            sa.Column('duration_seconds', sa.Integer()),
+            sa.Column('status', sa.String(20))
+        )
+        op.create_index('ix_crawl_logs_crawl_time', 'crawl_logs', ['crawl_time'])
+
+    if 'author_profiles' not in existing:
+        op.create_table(
+            'author_profiles',
+            _id_column(),
+            sa.Column('author', sa.String(50), nullable=False),
+            sa.Column('total_articles', sa.Integer()),
+            sa.Column('last_article_time', sa.DateTime()),
+            sa.Column('avg_push_count', sa.Integer()),
+            sa.Column('avg_boo_count', sa.Integer()),
+            sa.Column('favorite_stocks', sa.JSON()),
+            sa.Column('activity_pattern', sa.JSON()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime())
+        )
+        op.create_index('ix_author_profiles_author', 'author_profiles', ['author'], unique=True)
+
+    if 'crawl_watermarks' not in existing:
+        op.create_table(
+            'crawl_watermarks',
+            _id_column(),
+            sa.Column('board', sa.String(50), nullable=False),
+            sa.Column('author', sa.String(50), nullable=False),
+            sa.Column('last_article_id', sa.String(50), nullable=False),
+            sa.Column('last_publish_time', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.UniqueConstraint('board', 'author', name='uq_watermark_board_author')
+        )
+
+    if 'stock_symbols' not in existing:
+        op.create_table(
+            'stock_symbols',
+            _id_column(),
+            sa.Column('market', sa.String(10), nullable=False),
+            sa.Column('code', sa.String(20), nullable=False),
+            sa.Column('name', sa.String(200)),
+            sa.Column('exchange', sa.String(50)),
+            sa.Column('category', sa.String(100)),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.UniqueConstraint('market', 'code', name='uq_stock_symbol_market_code')
+        )
+
+    if 'stock_validation_cache' not in existing:
+        op.create_table(
+            'stock_validation_cache',
+            _id_column(),
+            sa.Column('market', sa.String(10), nullable=False),
+            sa.Column('code', sa.String(20), nullable=False),
+            sa.Column('is_valid', sa.Boolean(), nullable=False),
+            sa.Column('result', sa.JSON()),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime()),
+            sa.UniqueConstraint('market', 'code', name='uq_validation_cache_market_code')
+        )
+        op.create_index('ix_stock_validation_cache_expires_at', 'stock_validation_cache', ['expires_at'])
+
+    if 'pending_stock_validations' not in existing:
+        op.create_table(
+            'pending_stock_validations',
+            _id_column(),
+            sa.Column('article_id', sa.String(50), nullable=False),
+            sa.Column('market', sa.String(10), nullable=False),
+            sa.Column('code', sa.String(20), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.UniqueConstraint('article_id', 'market', 'code', name='uq_pending_validation')
+        )
+        op.create_index('idx_pending_validation_code', 'pending_stock_validations', ['market', 'code'])
+
+    if 'llm_analysis_cache' not in existing:
+        op.create_table(
+            'llm_analysis_cache',
+            _id_column(),
+            sa.Column('cache_key', sa.String(64), nullable=False),
+            sa.Column('model_name', sa.String(100), nullable=False),
+            sa.Column('prompt_version', sa.String(20), nullable=False),
+            sa.Column('result', sa.JSON(), nullable=False),
+            sa.Column('hit_count', sa.Integer()),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('last_hit_at', sa.DateTime(), nullable=False)
+        )
+        op.create_index('ix_llm_analysis_cache_cache_key', 'llm_analysis_cache', ['cache_key'], unique=True)
+        op.create_index('ix_llm_analysis_cache_created_at', 'llm_analysis_cache', ['created_at'])
+        op.create_index('ix_llm_analysis_cache_last_hit_at', 'llm_analysis_cache', ['last_hit_at'])
+
+    if 'analysis_jobs' not in existing:
+        op.create_table(
+            'analysis_jobs',
+            _id_column(),
+            sa.Column('article_id', sa.String(50), nullable=False),
+            sa.Column('status', sa.String(20), nullable=False),
+            sa.Column('priority', sa.Integer(), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('max_attempts', sa.Integer(), nullable=False),
+            sa.Column('next_run_at', sa.DateTime(), nullable=False),
+            sa.Column('locked_at', sa.DateTime()),
+            sa.Column('last_error', sa.Text()),
+            sa.Column('created_at', sa.DateTime()),
+            sa.Column('updated_at', sa.DateTime())
+        )
+        op.create_index('ix_analysis_jobs_article_id', 'analysis_jobs', ['article_id'], unique=True)
+        op.create_index('idx_analysis_job_claim', 'analysis_jobs', ['status', 'priority', 'next_run_at'])
+
+    if 'article_stocks' not in existing:
+        op.create_table(
+            'article_stocks',
+            _id_column(),
+            sa.Column('article_id', sa.String(50), nullable=False),
+            sa.Column('code', sa.String(20), nullable=False),
+            sa.Column('market', sa.String(10), nullable=False),
+            sa.Column('author', sa.String(50), nullable=False),
+            sa.Column('publish_time', sa.DateTime(), nullable=False),
+            sa.Column('mention_count', sa.Integer(), nullable=False),
+            sa.Column('is_recommended', sa.Boolean(), nullable=False),
+            sa.Column('sentiment', sa.String(20)),
+            sa.UniqueConstraint('article_id', 'code', name='uq_article_stock')
+        )
+        op.create_index('ix_article_stocks_article_id', 'article_stocks', ['article_id'])
+        op.create_index('idx_article_stock_code_time', 'article_stocks', ['code', 'publish_time'])
+        op.create_index('idx_article_stock_code_recommended', 'article_stocks', ['code', 'is_recommended', 'publish_time'])
+        op.create_index('idx_article_stock_author_code', 'article_stocks', ['author', 'code', 'publish_time'])
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_table(table)
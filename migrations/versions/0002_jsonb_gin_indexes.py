@@ -0,0 +1,65 @@
+"""ptt_articles JSON columns to JSONB, GIN and covering indexes
+
+- JSON 欄位轉為 JSONB（單一 ALTER TABLE，只重寫資料表一次）
+- stock_symbols / recommended_stocks 建立 jsonb_path_ops GIN 索引，支援 @> 包含查詢
+- (author, publish_time DESC) 索引 INCLUDE 窄的定長欄位（不含標題、URL 與 JSONB，避免單一索引列超過
+  btree 上限），取代 idx_author_time；移除與 ix_ptt_articles_publish_time 重複的 idx_publish_time
+
+Revision ID: 0002_jsonb_gin_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_jsonb_gin_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+JSONB_COLUMNS = (
+    'stock_symbols', 'stock_mentions', 'tags', 'analysis_result', 'recommended_stocks', 'llm_sectors'
+)
+
+# idx_author_time_desc 的 INCLUDE 欄位
+INCLUDE_COLUMNS = ('id', 'article_id', 'push_count', 'is_analyzed', 'llm_sentiment')
+
+
+def _alter_json_columns(type_name: str) -> None:
+    op.execute(
+        "ALTER TABLE ptt_articles "
+        + ", ".join(f"ALTER COLUMN {column} TYPE {type_name} USING {column}::{type_name}" for column in JSONB_COLUMNS)
+    )
+
+
+def upgrade() -> None:
+    _alter_json_columns('jsonb')
+
+    op.create_index(
+        'idx_stock_symbols_gin', 'ptt_articles', ['stock_symbols'],
+        postgresql_using='gin', postgresql_ops={'stock_symbols': 'jsonb_path_ops'}
+    )
+    op.create_index(
+        'idx_recommended_stocks_gin', 'ptt_articles', ['recommended_stocks'],
+        postgresql_using='gin', postgresql_ops={'recommended_stocks': 'jsonb_path_ops'}
+    )
+
+    op.drop_index('idx_author_time', table_name='ptt_articles')
+    op.drop_index('idx_publish_time', table_name='ptt_articles')
+    op.create_index(
+        'idx_author_time_desc', 'ptt_articles', ['author', sa.text('publish_time DESC')],
+        postgresql_include=list(INCLUDE_COLUMNS)
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_author_time_desc', table_name='ptt_articles')
+    op.create_index('idx_publish_time', 'ptt_articles', ['publish_time'])
+    op.create_index('idx_author_time', 'ptt_articles', ['author', 'publish_time'])
+
+    op.drop_index('idx_recommended_stocks_gin', table_name='ptt_articles')
+    op.drop_index('idx_stock_symbols_gin', table_name='ptt_articles')
+
+    _alter_json_columns('json')
@@ -0,0 +1,97 @@
+"""author_profiles rollup counters
+
+增量維護作者檔案所需的計數欄位，並由既有文章（ptt_articles 與 article_stocks）回填所有作者檔案，
+升級後 /stats、/authors 立即可用，之後的增量更新也建立在正確的基準上。
+
+Revision ID: 0003_author_profile_rollups
+Revises: 0002_jsonb_gin_indexes
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from config import settings
+
+# revision identifiers, used by Alembic.
+revision = '0003_author_profile_rollups'
+down_revision = '0002_jsonb_gin_indexes'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('analyzed_articles', 'total_push_count', 'total_boo_count')
+
+# 與 author_profiles.reconcile_author_profiles 相同的彙總，以單一 INSERT ... SELECT 完成
+BACKFILL_SQL = """
+WITH totals AS (
+    SELECT author,
+           count(*) AS total,
+           count(*) FILTER (WHERE is_analyzed) AS analyzed,
+           coalesce(sum(push_count), 0) AS push_sum,
+           coalesce(sum(boo_count), 0) AS boo_sum,
+           max(publish_time) AS last_article_time
+    FROM ptt_articles
+    GROUP BY author
+),
+hours AS (
+    SELECT author,
+           (extract(isodow FROM publish_time)::int - 1) * 24 + extract(hour FROM publish_time)::int AS slot,
+           count(*) AS articles
+    FROM ptt_articles
+    GROUP BY 1, 2
+),
+activity AS (
+    SELECT totals.author, json_agg(coalesce(hours.articles, 0) ORDER BY slots.slot) AS pattern
+    FROM totals
+    CROSS JOIN generate_series(0, 167) AS slots(slot)
+    LEFT JOIN hours ON hours.author = totals.author AND hours.slot = slots.slot
+    GROUP BY totals.author
+),
+stock_counts AS (
+    SELECT author, code, count(*) AS articles,
+           row_number() OVER (PARTITION BY author ORDER BY count(*) DESC, code) AS rank
+    FROM article_stocks
+    GROUP BY author, code
+),
+stocks AS (
+    SELECT author, json_object_agg(code, articles ORDER BY rank) AS favorite
+    FROM stock_counts
+    WHERE rank <= {stock_limit}
+    GROUP BY author
+)
+INSERT INTO author_profiles (
+    id, author, total_articles, analyzed_articles, total_push_count, total_boo_count,
+    avg_push_count, avg_boo_count, last_article_time, favorite_stocks, activity_pattern,
+    created_at, updated_at
+)
+SELECT md5(totals.author || clock_timestamp()::text)::uuid, totals.author, totals.total, totals.analyzed,
+       totals.push_sum, totals.boo_sum,
+       round(totals.push_sum::numeric / totals.total), round(totals.boo_sum::numeric / totals.total),
+       totals.last_article_time, coalesce(stocks.favorite, '{{}}'::json), activity.pattern,
+       now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+FROM totals
+JOIN activity ON activity.author = totals.author
+LEFT JOIN stocks ON stocks.author = totals.author
+ON CONFLICT (author) DO UPDATE SET
+    total_articles = EXCLUDED.total_articles,
+    analyzed_articles = EXCLUDED.analyzed_articles,
+    total_push_count = EXCLUDED.total_push_count,
+    total_boo_count = EXCLUDED.total_boo_count,
+    avg_push_count = EXCLUDED.avg_push_count,
+    avg_boo_count = EXCLUDED.avg_boo_count,
+    last_article_time = EXCLUDED.last_article_time,
+    favorite_stocks = EXCLUDED.favorite_stocks,
+    activity_pattern = EXCLUDED.activity_pattern,
+    updated_at = EXCLUDED.updated_at
+"""
+
+
+def upgrade() -> None:
+    for column in COLUMNS:
+        op.add_column('author_profiles', sa.Column(column, sa.Integer(), server_default='0'))
+    op.execute(BACKFILL_SQL.format(stock_limit=int(settings.author_profile_stock_limit)))
+
+
+def downgrade() -> None:
+    for column in COLUMNS:
+        op.drop_column('author_profiles', column)
@@ -0,0 +1,25 @@
+"""crawl_watermarks parse failures
+
+記錄每位作者解析失敗的文章與失敗次數，達上限後放棄，水位線不再停在該文章.
+
+Revision ID: 0004_watermark_parse_failures
+Revises: 0003_author_profile_rollups
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_watermark_parse_failures'
+down_revision = '0003_author_profile_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('crawl_watermarks', sa.Column('parse_failures', sa.JSON()))
+
+
+def downgrade() -> None:
+    op.drop_column('crawl_watermarks', 'parse_failures')
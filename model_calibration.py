@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""模型校準工具 - 以固定樣本文章實測候選 Qwen 模型的生成速度與 JSON 解析成功率，選出本機最適合的模型.
+
+用法:
+    python model_calibration.py                                  # 測試 CALIBRATION_MODELS 並寫入 model_profile.json
+    python model_calibration.py --models qwen2.5:0.5b-instruct,qwen2.5:1.5b-instruct
+    python model_calibration.py --dry-run                        # 只輸出結果，不寫檔
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+
+from article_analyzer import analyzer, PROMPT_TEMPLATE, PROMPT_CONTENT_CHARS, PROMPT_VERSION
+from config import settings
+from http_client import http_client
+
+# 固定的樣本文章，涵蓋標的、新聞、心得與請益
+SAMPLE_ARTICLES = [
+    "[標的] 2330 台積電 多\n分析：先進製程需求強勁，CoWoS 產能持續擴充，本季營收預估季增 10%。"
+    "進場：回測 900 附近分批布局。停損：跌破 850。目標價：1100。",
+    "[新聞] 輝達財報優於預期 盤後大漲\nNVIDIA 公布季度營收年增超過一倍，資料中心業務占比持續提升，"
+    "執行長表示下一代 GPU 需求遠大於供給，台廠供應鏈包含廣達、緯創同步走揚。",
+    "[心得] 航運股這波操作檢討\n長榮 2603 從 150 追進，運價指數連續三週下跌後停損出場，"
+    "陽明、萬海同樣走弱，紅海航線恢復後運價恐怕還有下修空間，短期不再碰貨櫃三雄。",
+    "[標的] 2454 聯發科 空\n手機市場需求疲弱，庫存去化速度不如預期，毛利率有下修風險。"
+    "操作：反彈至 1200 附近布空單，停損 1280，目標 1050。",
+    "[請益] 高股息 ETF 要怎麼挑\n最近 0056、00878、00919 都很熱門，想請問殖利率、填息率和成分股產業分布"
+    "哪個比較重要？打算每月定期定額，持有五年以上。",
+]
+
+class ModelCalibrator:
+    """以實際生成速度與解析成功率比較候選模型."""
+
+    def __init__(self, models: List[str]):
+        self.models = models
+        self.ollama_url = analyzer.ollama_url
+
+    async def _generate(self, model_name: str, content: str) -> Dict[str, Any]:
+        """以與分析器相同的提示詞與參數生成一次（非串流，取得 Ollama 的計時資訊）."""
+        session = await http_client.get_session()
+        start = time.monotonic()
+        async with session.post(
+            f"{self.ollama_url}/api/generate",
+            json={
+                "model": model_name,
+                "prompt": PROMPT_TEMPLATE.format(content=content[:PROMPT_CONTENT_CHARS]),
+                "stream": False,
+                "keep_alive": f"{settings.ollama_keep_alive_seconds}s",
+                "options": analyzer._generation_options()
+            },
+            timeout=aiohttp.ClientTimeout(total=settings.llm_timeout_seconds)
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Ollama returned {response.status}")
+            result = await response.json()
+        result["wall_seconds"] = time.monotonic() - start
+        return result
+
+    async def benchmark_model(self, model_name: str) -> Dict[str, Any]:
+        """測試單一模型：載入時間、每秒 token 數與 JSON 解析成功率."""
+        logger.info(f"Benchmarking model {model_name}...")
+        start = time.monotonic()
+        if not await analyzer._set_keep_alive(f"{settings.ollama_keep_alive_seconds}s", model_name):
+            return {"model": model_name, "error": "model not available"}
+        load_seconds = time.monotonic() - start
+
+        eval_tokens = 0
+        eval_seconds = 0.0
+        wall_seconds = 0.0
+        parsed = 0
+        errors = 0
+        for content in SAMPLE_ARTICLES:
+            try:
+                result = await self._generate(model_name, content)
+            except Exception as e:
+                logger.warning(f"{model_name} generation failed: {e}")
+                errors += 1
+                continue
+            eval_tokens += result.get("eval_count", 0)
+            eval_seconds += result.get("eval_duration", 0) / 1e9  # 奈秒
+            wall_seconds += result["wall_seconds"]
+            if analyzer._extract_analysis(result.get("response", "")) is not None:
+                parsed += 1
+
+        # 測完卸載，避免影響下一個模型的記憶體與速度
+        await analyzer._set_keep_alive("0", model_name)
+
+        samples = len(SAMPLE_ARTICLES)
+        return {
+            "model": model_name,
+            "load_seconds": round(load_seconds, 2),
+            "tokens_per_sec": round(eval_tokens / eval_seconds, 2) if eval_seconds else 0,
+            "avg_latency_seconds": round(wall_seconds / (samples - errors), 2) if samples > errors else None,
+            "success_rate": round(parsed / samples, 3),
+            "errors": errors
+        }
+
+    @staticmethod
+    def choose(results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """優先選擇達到門檻的模型中解析成功率最高者，成功率相同時取較快者."""
+        measured = [result for result in results if "error" not in result]
+        if not measured:
+            return None
+        eligible = [
+            result for result in measured
+            if result["success_rate"] >= settings.calibration_min_success_rate
+            and result["tokens_per_sec"] >= settings.calibration_min_tokens_per_sec
+        ]
+        if eligible:
+            return max(eligible, key=lambda result: (result["success_rate"], result["tokens_per_sec"]))
+        # 都未達門檻時，取每秒可成功解析的文章數最高者
+        return max(measured, key=lambda result: result["success_rate"] * result["tokens_per_sec"])
+
+    async def run(self) -> Dict[str, Any]:
+        """測試所有候選模型並產生校準結果."""
+        results = []
+        for model_name in self.models:
+            results.append(await self.benchmark_model(model_name))
+            logger.info(f"Calibration result: {results[-1]}")
+
+        best = self.choose(results)
+        return {
+            "model": best["model"] if best else None,
+            "host": platform.node(),
+            "prompt_version": PROMPT_VERSION,
+            "calibrated_at": datetime.utcnow().isoformat(),
+            "thresholds": {
+                "min_success_rate": settings.calibration_min_success_rate,
+                "min_tokens_per_sec": settings.calibration_min_tokens_per_sec
+            },
+            "results": results
+        }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark candidate Qwen models on this host")
+    parser.add_argument("--models", type=str, help="逗號分隔的候選模型，預設為 CALIBRATION_MODELS")
+    parser.add_argument("--dry-run", action="store_true", help="只輸出結果，不寫入模型設定檔")
+    args = parser.parse_args()
+
+    models = [model.strip() for model in (args.models or settings.calibration_models).split(",") if model.strip()]
+    try:
+        profile = await ModelCalibrator(models).run()
+    finally:
+        await http_client.close()
+
+    print(json.dumps(profile, ensure_ascii=False, indent=2))
+    if not profile["model"]:
+        logger.error("No candidate model could be benchmarked; model profile not written")
+        return
+    if not args.dry_run:
+        with open(settings.llm_profile_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        logger.info(f"Saved model profile to {settings.llm_profile_path}: {profile['model']}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,12 +2,22 @@
 
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Text, DateTime, Integer, Boolean, JSON, Index
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, DateTime, Integer, Boolean, JSON, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
+# 文章列表 API 回傳的欄位（不含 content）
+ARTICLE_LIST_FIELDS = (
+    'id', 'article_id', 'title', 'board', 'url', 'push_count', 'stock_symbols',
+    'is_analyzed', 'llm_sentiment', 'llm_strategy', 'recommended_stocks'
+)
+
+# idx_author_time_desc 的 INCLUDE 欄位：只放窄的定長欄位。標題、URL 與 JSONB 可能讓單一索引列
+# 超過 btree 的 2704 bytes 上限，使整批寫入失敗
+ARTICLE_INDEX_INCLUDE_FIELDS = ('id', 'article_id', 'push_count', 'is_analyzed', 'llm_sentiment')
+
 class PTTArticle(Base):
     """PTT文章資料模型."""
     
@@ -29,21 +39,21 @@ class PTTArticle(Base):
     arrow_count = Column(Integer, default=0)
     
     # 股票相關資訊
-    stock_symbols = Column(JSON)  # 提取的股票代碼列表
-    stock_mentions = Column(JSON)  # 股票提及次數統計
+    stock_symbols = Column(JSONB)  # 提取的股票代碼列表
+    stock_mentions = Column(JSONB)  # 股票提及次數統計
     
     # 分類和標籤
     category = Column(String(100))  # 文章分類
-    tags = Column(JSON)  # 標籤列表
+    tags = Column(JSONB)  # 標籤列表
     sentiment = Column(String(20))  # 情感分析結果
     
     # LLM 分析結果
-    analysis_result = Column(JSON)  # 完整的 LLM 分析結果
+    analysis_result = Column(JSONB)  # 完整的 LLM 分析結果
     analysis_time = Column(DateTime)  # 分析時間
-    recommended_stocks = Column(JSON)  # 推薦的股票代碼
+    recommended_stocks = Column(JSONB)  # 推薦的股票代碼
     analysis_reason = Column(Text)  # 分析原因
     llm_sentiment = Column(String(20))  # LLM 情感分析
-    llm_sectors = Column(JSON)  # LLM 產業分析
+    llm_sectors = Column(JSONB)  # LLM 產業分析
     llm_strategy = Column(String(50))  # LLM 策略分析
     llm_risk_level = Column(String(20))  # LLM 風險等級
     
@@ -52,11 +62,16 @@ class PTTArticle(Base):
     is_analyzed = Column(Boolean, default=False)  # 是否已進行 LLM 分析
     is_relevant = Column(Boolean, default=True)
     
-    # 建立索引
+    # 建立索引（schema 變更以 migrations/ 的 Alembic 版本管理）
     __table_args__ = (
-        Index('idx_author_time', 'author', 'publish_time'),
+        # 作者文章列表：依時間倒序且 INCLUDE 列表欄位，可用 index-only scan
+        Index('idx_author_time_desc', author, publish_time.desc(), postgresql_include=list(ARTICLE_INDEX_INCLUDE_FIELDS)),
         Index('idx_board_time', 'board', 'publish_time'),
-        Index('idx_publish_time', 'publish_time'),
+        # 支援 stock_symbols @> '["2330"]' 之類的包含查詢
+        Index('idx_stock_symbols_gin', stock_symbols, postgresql_using='gin',
+              postgresql_ops={'stock_symbols': 'jsonb_path_ops'}),
+        Index('idx_recommended_stocks_gin', recommended_stocks, postgresql_using='gin',
+              postgresql_ops={'recommended_stocks': 'jsonb_path_ops'}),
     )
     
     def __repr__(self):
@@ -88,13 +103,161 @@ class AuthorProfile(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     author = Column(String(50), unique=True, nullable=False, index=True)
     total_articles = Column(Integer, default=0)
+    analyzed_articles = Column(Integer, default=0)  # 已完成 LLM 分析的文章數
     last_article_time = Column(DateTime)
+    total_push_count = Column(Integer, default=0)  # 推文數總和（增量計算平均用）
+    total_boo_count = Column(Integer, default=0)  # 噓文數總和
     avg_push_count = Column(Integer, default=0)
     avg_boo_count = Column(Integer, default=0)
-    favorite_stocks = Column(JSON)  # 最常提及的股票
-    activity_pattern = Column(JSON)  # 活動模式分析
+    favorite_stocks = Column(JSON)  # 最常提及的股票：{代碼: 提及文章數}
+    activity_pattern = Column(JSON)  # 發文時段分布：168 格（星期一 0 時起）的每週小時直方圖
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f"<AuthorProfile(author={self.author}, articles={self.total_articles})>"
+
+class CrawlWatermark(Base):
+    """每位作者的增量爬取水位線（最新已處理文章）."""
+    
+    __tablename__ = "crawl_watermarks"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    board = Column(String(50), nullable=False)
+    author = Column(String(50), nullable=False)
+    last_article_id = Column(String(50), nullable=False)  # 最新已處理的 PTT 文章ID
+    last_publish_time = Column(DateTime)  # 該文章的發文時間
+    parse_failures = Column(JSON)  # 解析失敗、尚未放棄的文章：{文章ID: 失敗次數}
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('board', 'author', name='uq_watermark_board_author'),
+    )
+    
+    def __repr__(self):
+        return f"<CrawlWatermark(board={self.board}, author={self.author}, last={self.last_article_id})>"
+
+class StockSymbol(Base):
+    """股票代碼主檔（台股上市/上櫃與美股），由每日批次同步更新."""
+    
+    __tablename__ = "stock_symbols"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    market = Column(String(10), nullable=False)  # TW, US
+    code = Column(String(20), nullable=False)
+    name = Column(String(200))
+    exchange = Column(String(50))  # twse, tpex, NYSE, NASDAQ...
+    category = Column(String(100))  # 台股產業別或美股資產類型
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('market', 'code', name='uq_stock_symbol_market_code'),
+    )
+    
+    def __repr__(self):
+        return f"<StockSymbol(market={self.market}, code={self.code}, name={self.name})>"
+
+class StockValidationCache(Base):
+    """股票代碼驗證結果快取（含查無此代碼的負向結果）."""
+    
+    __tablename__ = "stock_validation_cache"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    market = Column(String(10), nullable=False)  # TW, US
+    code = Column(String(20), nullable=False)
+    is_valid = Column(Boolean, nullable=False)
+    result = Column(JSON)  # 驗證成功時的股票資訊
+    expires_at = Column(DateTime, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('market', 'code', name='uq_validation_cache_market_code'),
+    )
+    
+    def __repr__(self):
+        return f"<StockValidationCache(market={self.market}, code={self.code}, valid={self.is_valid})>"
+
+class PendingStockValidation(Base):
+    """因驗證額度或速率延後的股票代碼與提及它的文章，驗證通過後補寫回文章."""
+    
+    __tablename__ = "pending_stock_validations"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    article_id = Column(String(50), nullable=False)  # PTT文章ID
+    market = Column(String(10), nullable=False)  # TW, US
+    code = Column(String(20), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('article_id', 'market', 'code', name='uq_pending_validation'),
+        Index('idx_pending_validation_code', 'market', 'code'),
+    )
+    
+    def __repr__(self):
+        return f"<PendingStockValidation(article_id={self.article_id}, market={self.market}, code={self.code})>"
+
+class AnalysisCache(Base):
+    """LLM 分析結果快取，以 (截斷內容, 模型, 提示詞版本) 的雜湊為鍵."""
+    
+    __tablename__ = "llm_analysis_cache"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # SHA-256
+    model_name = Column(String(100), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+    result = Column(JSON, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    last_hit_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<AnalysisCache(key={self.cache_key[:12]}, model={self.model_name})>"
+
+class AnalysisJob(Base):
+    """LLM 分析工作佇列（以 FOR UPDATE SKIP LOCKED 領取）."""
+    
+    __tablename__ = "analysis_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    article_id = Column(String(50), unique=True, nullable=False, index=True)  # PTT文章ID
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, done, failed
+    priority = Column(Integer, nullable=False, default=0)  # 數字越大越優先
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    next_run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime)  # 被工作者領取的時間
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_analysis_job_claim', 'status', 'priority', 'next_run_at'),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisJob(article_id={self.article_id}, status={self.status}, attempts={self.attempts})>"
+
+class ArticleStock(Base):
+    """文章與股票的對應事實表（每篇文章每檔股票一列），供個股查詢使用索引範圍掃描."""
+    
+    __tablename__ = "article_stocks"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    article_id = Column(String(50), nullable=False, index=True)  # PTT文章ID
+    code = Column(String(20), nullable=False)  # 股票代碼
+    market = Column(String(10), nullable=False)  # TW, US
+    author = Column(String(50), nullable=False)
+    publish_time = Column(DateTime, nullable=False)
+    mention_count = Column(Integer, nullable=False, default=0)  # 文中提及次數
+    is_recommended = Column(Boolean, nullable=False, default=False)  # 是否為 LLM 推薦標的
+    sentiment = Column(String(20))  # 文章的 LLM 情緒
+    
+    __table_args__ = (
+        UniqueConstraint('article_id', 'code', name='uq_article_stock'),
+        Index('idx_article_stock_code_time', 'code', 'publish_time'),
+        Index('idx_article_stock_code_recommended', 'code', 'is_recommended', 'publish_time'),
+        Index('idx_article_stock_author_code', 'author', 'code', 'publish_time'),
+    )
+    
+    def __repr__(self):
+        return f"<ArticleStock(article_id={self.article_id}, code={self.code}, mentions={self.mention_count})>"
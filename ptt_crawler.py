@@ -6,15 +6,19 @@ import random
 import re
 import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from itertools import zip_longest
+from typing import List, Dict, Optional, Any, AsyncIterator, Tuple, Union
 from urllib.parse import urljoin, urlparse, parse_qs
-from bs4 import BeautifulSoup
 from loguru import logger
 
 from config import settings
-from models import PTTArticle
+from models import PTTArticle, CrawlWatermark
 from article_analyzer import analyzer
 from stock_validator import stock_validator
+from rate_limiter import FetchScheduler
+from http_client import http_client
+import ptt_parser
+from ptt_parser import parser_pool
 
 class PTTCrawler:
     """PTT股票版爬蟲類別."""
@@ -25,54 +29,50 @@ class PTTCrawler:
         self.target_authors = settings.TARGET_AUTHORS
         self.user_agents = settings.USER_AGENTS
         self.session = None
+        self.headers = {'User-Agent': random.choice(self.user_agents)}
         self.analyzer = analyzer
         self.stock_validator = stock_validator
+        self.parser_pool = parser_pool
+        # 整個爬蟲會話共用的抓取排程器（並發上限 + 每主機令牌桶）
+        self.fetch_scheduler = FetchScheduler()
+        # 看板權限檢查結果，每個爬蟲會話只檢查一次
+        self.board_access_ok = False
+        # 本次會話發現的新文章 (作者 -> [(時間戳, 文章ID)]) 與已完成處理的文章ID，用於推進水位線
+        self.scheduled_articles: Dict[str, List[Tuple[int, str]]] = {}
+        self.completed_article_ids: set = set()
+        self.failed_article_ids: Dict[str, str] = {}  # 本次會話解析失敗的文章ID -> 作者
     
     async def __aenter__(self):
         """異步上下文管理器入口."""
-        self.session = aiohttp.ClientSession(
-            headers={'User-Agent': random.choice(self.user_agents)},
-            timeout=aiohttp.ClientTimeout(total=30)
-        )
+        self.board_access_ok = False
+        self.scheduled_articles = {}
+        self.completed_article_ids = set()
+        self.failed_article_ids = {}
+        # 使用進程共用的連線池，User-Agent 改為每個請求帶入
+        self.headers = {'User-Agent': random.choice(self.user_agents)}
+        self.session = await http_client.get_session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """異步上下文管理器出口."""
-        if self.session:
-            await self.session.close()
-    
-    async def _get_page(self, url: str) -> Optional[str]:
-        """取得網頁內容."""
-        if not self.session:
-            # 如果沒有 session，創建一個臨時的
-            async with aiohttp.ClientSession(
-                headers={'User-Agent': random.choice(self.user_agents)},
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as temp_session:
-                try:
-                    async with temp_session.get(url) as response:
-                        if response.status == 200:
-                            return await response.text()
-                        else:
-                            logger.warning(f"Failed to get page {url}: {response.status}")
-                            return None
-                except Exception as e:
-                    logger.error(f"Error getting page {url}: {e}")
-                    return None
-        else:
-            try:
-                async with self.session.get(url) as response:
-                    if response.status == 200:
-                        return await response.text()
-                    else:
-                        logger.warning(f"Failed to get page {url}: {response.status}")
-                        return None
-            except Exception as e:
-                logger.error(f"Error getting page {url}: {e}")
-                return None
+        """異步上下文管理器出口（共用 session 由 http_client 統一關閉）."""
+        self.session = None
+    
+    async def _get_page(self, url: str, raw: bool = False) -> Optional[Union[str, bytes]]:
+        """取得網頁內容（經由共用的抓取排程器限速與退避），raw=True 時回傳原始 bytes."""
+        session = self.session or await http_client.get_session()
+        return await self.fetch_scheduler.fetch(
+            session,
+            url,
+            raw=raw,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
     
     async def _setup_board_access(self) -> bool:
-        """設置看板訪問權限."""
+        """設置看板訪問權限（同一會話成功後不再重複檢查）."""
+        if self.board_access_ok:
+            return True
+        
         try:
             board_url = f"{self.base_url}/bbs/{self.stock_board}/index.html"
             html = await self._get_page(board_url)
@@ -80,14 +80,13 @@ class PTTCrawler:
             if not html:
                 return False
             
-            soup = BeautifulSoup(html, 'html.parser')
-            
             # 檢查是否需要18+驗證
             if "您要查看的看板需要特殊權限" in html:
                 logger.info("Board requires special permission")
                 return False
             
             logger.info("No 18+ verification needed")
+            self.board_access_ok = True
             return True
             
         except Exception as e:
@@ -103,95 +102,188 @@ class PTTCrawler:
         except:
             return url.split('/')[-1].replace('.html', '')
     
-    async def _is_article_exists(self, article_id: str, url: str = None, publish_time: datetime = None) -> bool:
-        """檢查文章是否已存在於資料庫中."""
+    async def _is_article_exists(
+        self,
+        article_id: str,
+        url: str = None,
+        publish_time: datetime = None,
+        author: str = None
+    ) -> bool:
+        """檢查文章是否已存在於資料庫中（ID、URL，或同一作者發文時間相近的文章）."""
         try:
             from database import db_manager
-            from models import PTTArticle
-            from sqlalchemy import or_, and_
+            from sqlalchemy import or_, and_, select
             
-            with db_manager.get_session() as session:
+            async with db_manager.get_async_session() as session:
                 # 使用 OR 條件而不是 UNION 來避免 JSON 字段問題
                 conditions = [PTTArticle.article_id == article_id]
                 if url:
                     conditions.append(PTTArticle.url == url)
                 
-                # 如果有發文時間，也檢查是否有相同發文時間的文章（避免重複爬取）
-                if publish_time:
-                    # 檢查是否有相同發文時間的文章（允許 1 分鐘的誤差）
+                # 同一作者在相同發文時間（允許 1 分鐘的誤差）已有文章，視為重複發文；
+                # 不同作者同一分鐘發文很常見，不能互相排除
+                if publish_time and author:
                     time_tolerance = timedelta(minutes=1)
-                    time_conditions = [
+                    conditions.append(
                         and_(
+                            PTTArticle.author == author,
                             PTTArticle.publish_time >= publish_time - time_tolerance,
                             PTTArticle.publish_time <= publish_time + time_tolerance
                         )
-                    ]
-                    conditions.extend(time_conditions)
+                    )
                 
-                existing_article = session.query(PTTArticle).filter(
-                    or_(*conditions)
-                ).first()
-                return existing_article is not None
+                existing_id = await session.scalar(
+                    select(PTTArticle.id).where(or_(*conditions)).limit(1)
+                )
+                return existing_id is not None
         except Exception as e:
             logger.error(f"Error checking if article exists: {e}")
             return False
     
-    def _extract_publish_time(self, soup: BeautifulSoup) -> datetime:
-        """提取發文時間."""
+    async def _get_existing_article_ids(self, article_ids: List[str]) -> set:
+        """批次查詢已存在於資料庫中的文章ID."""
+        if not article_ids:
+            return set()
         try:
-            # 查找時間信息
-            time_elements = soup.find_all('span', class_='article-meta-value')
-            for element in time_elements:
-                text = element.get_text().strip()
-                logger.debug(f"Found time element: {text}")
-                
-                # 嘗試解析 PTT 完整時間戳格式 (Wed Oct 15 13:16:00 2025)
-                ptt_timestamp_match = re.search(r'(\w{3})\s+(\w{3})\s+(\d{1,2})\s+(\d{2}):(\d{2}):(\d{2})\s+(\d{4})', text)
-                if ptt_timestamp_match:
-                    try:
-                        day_name, month_name, day, hour, minute, second, year = ptt_timestamp_match.groups()
-                        # 轉換月份名稱
-                        month_map = {
-                            'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
-                            'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
-                        }
-                        month = month_map.get(month_name, 1)
-                        parsed_time = datetime(int(year), month, int(day), int(hour), int(minute), int(second))
-                        logger.info(f"Parsed PTT timestamp: {parsed_time}")
-                        return parsed_time
-                    except (ValueError, KeyError) as e:
-                        logger.warning(f"Failed to parse PTT timestamp: {e}")
+            from database import db_manager
+            from sqlalchemy import select
+            
+            async with db_manager.get_async_session() as session:
+                return set((await session.scalars(
+                    select(PTTArticle.article_id).where(PTTArticle.article_id.in_(set(article_ids)))
+                )).all())
+        except Exception as e:
+            logger.error(f"Error checking existing articles: {e}")
+            return set()
+    
+    def _article_timestamp(self, article_id: str) -> Optional[int]:
+        """從文章ID（M.<ts>.A.<id>）取得發文的 Unix 時間戳."""
+        match = re.match(r'M\.(\d+)\.A', article_id or '')
+        return int(match.group(1)) if match else None
+    
+    async def _load_watermarks(self, authors: List[str]) -> Dict[str, int]:
+        """批次讀取作者的水位線，回傳 作者 -> 最新已處理文章的時間戳."""
+        try:
+            from database import db_manager
+            from sqlalchemy import select
+            
+            async with db_manager.get_async_session() as session:
+                rows = (await session.scalars(
+                    select(CrawlWatermark).where(
+                        CrawlWatermark.board == self.stock_board,
+                        CrawlWatermark.author.in_(authors)
+                    )
+                )).all()
+                watermarks = {}
+                for row in rows:
+                    ts = self._article_timestamp(row.last_article_id)
+                    if ts:
+                        watermarks[row.author] = ts
+                return watermarks
+        except Exception as e:
+            logger.error(f"Error loading crawl watermarks: {e}")
+            return {}
+    
+    def _track_scheduled(self, articles: List[Dict]):
+        """記錄本次會話發現的新文章."""
+        for article in articles:
+            ts = self._article_timestamp(article['article_id'])
+            if ts:
+                self.scheduled_articles.setdefault(article['author'], []).append((ts, article['article_id']))
+    
+    def mark_article_done(self, article_id: str):
+        """標記文章已完成處理（已保存或確定略過）."""
+        self.completed_article_ids.add(article_id)
+    
+    def mark_article_failed(self, article_id: str, author: str):
+        """標記文章解析失敗；累計達 parse_max_attempts 次後於 commit_watermarks 放棄."""
+        self.failed_article_ids[article_id] = author
+    
+    def _resolve_parse_failures(self, watermark: CrawlWatermark, author: str) -> Dict[str, int]:
+        """更新作者的解析失敗次數，已達上限的文章標記為完成，回傳仍要重試的文章."""
+        failures = dict(watermark.parse_failures or {}) if watermark else {}
+        for article_id, failed_author in self.failed_article_ids.items():
+            if failed_author == author:
+                failures[article_id] = failures.get(article_id, 0) + 1
+        
+        retry = {}
+        for article_id, attempts in failures.items():
+            if article_id in self.completed_article_ids:
+                continue
+            if attempts >= settings.parse_max_attempts:
+                logger.warning(f"Giving up on article {article_id} after {attempts} failed parses")
+                self.mark_article_done(article_id)
+            else:
+                retry[article_id] = attempts
+        return retry
+    
+    async def commit_watermarks(self):
+        """將每位作者的水位線推進到「更早的新文章都已完成」的最新文章."""
+        try:
+            from database import db_manager
+            from sqlalchemy import select
+            
+            async with db_manager.get_async_session() as session:
+                for author, scheduled in self.scheduled_articles.items():
+                    watermark = await session.scalar(
+                        select(CrawlWatermark).where(
+                            CrawlWatermark.board == self.stock_board,
+                            CrawlWatermark.author == author
+                        )
+                    )
+                    # 解析失敗的次數跨會話累計，放棄的文章不再擋住水位線
+                    retry = self._resolve_parse_failures(watermark, author)
+                    
+                    newest = None
+                    for ts, article_id in sorted(scheduled):
+                        if article_id not in self.completed_article_ids:
+                            break
+                        newest = (ts, article_id)
+                    
+                    if watermark is None:
+                        if not newest and not retry:
+                            continue
+                        # 尚未推進過的作者以空的文章ID建立，只記錄解析失敗次數
+                        watermark = CrawlWatermark(board=self.stock_board, author=author, last_article_id='')
+                        session.add(watermark)
+                    if (watermark.parse_failures or {}) != retry:
+                        watermark.parse_failures = retry
+                    if not newest:
                         continue
-                
-                # 嘗試解析中文日期格式 (2025年10月15日)
-                elif '年' in text and '月' in text and '日' in text:
-                    time_match = re.search(r'(\d{4})年(\d{1,2})月(\d{1,2})日', text)
-                    if time_match:
-                        year, month, day = time_match.groups()
-                        logger.info(f"Parsed Chinese date: {year}-{month}-{day}")
-                        return datetime(int(year), int(month), int(day))
-                
-                # 嘗試解析英文日期格式 (10/15/2025)
-                elif '/' in text and len(text.split('/')) == 3:
-                    try:
-                        parts = text.split('/')
-                        if len(parts) == 3:
-                            month, day, year = parts
-                            # 處理兩位數年份
-                            if len(year) == 2:
-                                year = '20' + year
-                            logger.info(f"Parsed English date: {year}-{month}-{day}")
-                            return datetime(int(year), int(month), int(day))
-                    except ValueError:
+                    
+                    ts, article_id = newest
+                    if (self._article_timestamp(watermark.last_article_id) or 0) >= ts:
                         continue
+                    
+                    watermark.last_article_id = article_id
+                    watermark.last_publish_time = datetime.fromtimestamp(ts)
+                    logger.info(f"Watermark for {author} advanced to {article_id}")
                 
-                # 嘗試解析 ISO 格式 (2025-10-15)
-                elif re.match(r'\d{4}-\d{1,2}-\d{1,2}', text):
-                    try:
-                        logger.info(f"Parsed ISO date: {text}")
-                        return datetime.fromisoformat(text)
-                    except ValueError:
-                        continue
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error committing crawl watermarks: {e}")
+        finally:
+            self.scheduled_articles = {}
+            self.completed_article_ids = set()
+            self.failed_article_ids = {}
+    
+    async def _filter_new_articles(self, articles: List[Dict]) -> List[Dict]:
+        """在抓取內文前，以文章ID批次過濾掉已存在的文章."""
+        for article in articles:
+            article['article_id'] = self._extract_article_id(article['url'])
+        
+        existing_ids = await self._get_existing_article_ids([article['article_id'] for article in articles])
+        new_articles = [article for article in articles if article['article_id'] not in existing_ids]
+        
+        logger.info(f"Pre-fetch dedup: {len(articles) - len(new_articles)} known, {len(new_articles)} new")
+        return new_articles
+    
+    def _extract_publish_time(self, doc) -> datetime:
+        """提取發文時間."""
+        try:
+            publish_time = ptt_parser.parse_publish_time(ptt_parser.extract_meta_values(doc))
+            if publish_time:
+                return publish_time
             
             logger.warning("Could not parse publish time, using current time")
             return datetime.now()
@@ -199,183 +291,132 @@ class PTTCrawler:
             logger.error(f"Error parsing publish time: {e}")
             return datetime.now()
     
-    async def _extract_and_validate_stocks(self, content: str) -> List[Dict]:
-        """提取並驗證股票代碼."""
+    async def _extract_and_validate_stocks(
+        self,
+        content: str,
+        article_id: Optional[str] = None
+    ) -> Tuple[List[Dict], Dict[str, int]]:
+        """提取並驗證股票代碼，回傳 (股票信息, 提及次數)；延後驗證的代碼會記錄到文章."""
         try:
-            # 使用股票驗證器來獲取有效的股票代碼
-            validated_stocks = await self.stock_validator.validate_stocks(content)
+            # 使用股票驗證器來獲取有效的股票代碼與中文名稱提及
+            validated_stocks, mentions = await self.stock_validator.validate_stocks_with_mentions(content, article_id)
             
             # 提取股票代碼列表
             stock_codes = [stock['code'] for stock in validated_stocks]
             
             logger.info(f"Found {len(validated_stocks)} valid stocks: {stock_codes}")
-            return validated_stocks
+            return validated_stocks, mentions
             
         except Exception as e:
             logger.error(f"Error extracting and validating stocks: {e}")
-            return []
+            return [], {}
     
-    def _extract_author_from_article(self, soup: BeautifulSoup) -> Optional[str]:
+    def _extract_author_from_article(self, doc) -> Optional[str]:
         """從文章HTML中提取作者名稱."""
         try:
-            # 查找作者信息（通常在 article-meta-tag 中）
-            author_elements = soup.find_all('span', class_='article-meta-value')
-            # 通常第一個是作者名稱（格式：作者名稱 (暱稱)）
-            if author_elements:
-                author_text = author_elements[0].get_text().strip()
-                # 提取作者名稱（去掉括號內的暱稱）
-                author_match = re.match(r'^([^\s\(]+)', author_text)
-                if author_match:
-                    return author_match.group(1).strip()
-            return None
+            return ptt_parser.extract_author(doc)
         except Exception as e:
             logger.warning(f"Error extracting author from article: {e}")
             return None
 
-    async def _get_article_content(self, article_url: str, push_count: int = 0) -> Optional[Dict]:
-        """取得文章詳細內容並進行 LLM 分析."""
-        html = await self._get_page(article_url)
-        if not html:
-            return None
-
-        soup = BeautifulSoup(html, 'html.parser')
-
+    async def _parse_article_page(
+        self,
+        page: Union[str, bytes],
+        article_url: str,
+        push_count: int = 0
+    ) -> Optional[Dict]:
+        """解析文章頁面，取得作者、發文時間與純文字內容."""
         try:
-            # 提取實際的作者名稱
-            actual_author = self._extract_author_from_article(soup)
-            
-            # 取得文章內容
-            main_content = soup.find('div', id='main-content')
-            if not main_content:
+            # 依 parse_backend 設定在事件迴圈或進程池中解析
+            parsed = await self.parser_pool.parse_article(page)
+            if not parsed:
                 return None
-
-            # 移除推文部分
-            for push in main_content.find_all('div', class_='push'):
-                push.decompose()
-
-            # 移除回文部分（以冒號開頭的span元素）
-            for span in main_content.find_all('span', class_='f6'):
-                if span.text.strip().startswith(':'):
-                    span.decompose()
-
-            # 取得純文字內容
-            content = main_content.get_text().strip()
             
-            # 取得文章ID
-            article_id = self._extract_article_id(article_url)
+            publish_time = parsed['publish_time']
+            if not publish_time:
+                logger.warning(f"Could not parse publish time for {article_url}, using current time")
+                publish_time = datetime.now()
             
-            # 取得發文時間
-            publish_time = self._extract_publish_time(soup)
+            return {
+                'article_id': self._extract_article_id(article_url),
+                'title': '',  # 標題會在後續處理中設置
+                'author': parsed['author'] or '',  # 使用提取的實際作者名稱
+                'url': article_url,
+                'content': parsed['content'],
+                'publish_time': publish_time,
+                'push_count': push_count  # 使用傳入的推文數
+            }
             
-            # 提取並驗證股票代碼
-            validated_stocks = await self._extract_and_validate_stocks(content)
-            stock_symbols = [stock['code'] for stock in validated_stocks]
+        except Exception as e:
+            logger.error(f"Error parsing article content from {article_url}: {e}")
+            return None
+    
+    async def _validate_article_stocks(self, article_data: Dict) -> Dict:
+        """提取並驗證文章中的股票代碼，寫回 article_data."""
+        validated_stocks, mentions = await self._extract_and_validate_stocks(
+            article_data.get('content', ''), article_data.get('article_id')
+        )
+        article_data['validated_stocks'] = validated_stocks  # 驗證後的股票信息
+        article_data['stock_symbols'] = [stock['code'] for stock in validated_stocks]
+        article_data['stock_mentions'] = mentions  # 代碼 -> 提及次數
+        return article_data
+    
+    async def _analyze_article(self, article_data: Dict) -> Dict:
+        """對文章進行 LLM 分析，失敗時 analysis_result 為 None."""
+        article_id = article_data['article_id']
+        logger.info(f"Starting LLM analysis for article: {article_id}")
+        try:
+            # 創建臨時的 PTTArticle 對象進行分析
+            temp_article = PTTArticle(
+                article_id=article_id,
+                title=article_data.get('title', ''),
+                author=article_data.get('author', ''),
+                board=self.stock_board,
+                url=article_data['url'],
+                content=article_data.get('content', ''),
+                publish_time=article_data.get('publish_time'),
+                stock_symbols=article_data.get('stock_symbols', []),
+                stock_mentions=article_data.get('stock_mentions', {})
+            )
             
-            # 進行 LLM 分析
-            logger.info(f"Starting LLM analysis for article: {article_id}")
-            try:
-                # 創建臨時的 PTTArticle 對象進行分析
-                temp_article = PTTArticle(
-                    article_id=article_id,
-                    title="",  # 標題會在後續處理中設置
-                    author="",  # 作者會在後續處理中設置
-                    board=self.stock_board,
-                    url=article_url,
-                    content=content,
-                    publish_time=publish_time,
-                    stock_symbols=stock_symbols
-                )
-                
-                # 使用 LLM 分析器
-                analysis_result = await self.analyzer._analyze_content(temp_article)
-                
-                logger.info(f"LLM analysis completed for article: {article_id}")
-                
-                return {
-                    'article_id': article_id,
-                    'title': '',  # 標題會在後續處理中設置
-                    'author': actual_author or '',  # 使用提取的實際作者名稱
-                    'url': article_url,
-                    'content': content,
-                    'publish_time': publish_time,
-                    'push_count': push_count,  # 使用傳入的推文數
-                    'stock_symbols': stock_symbols,
-                    'validated_stocks': validated_stocks,  # 添加驗證後的股票信息
-                    'analysis_result': analysis_result
-                }
-                
-            except Exception as e:
-                logger.error(f"LLM analysis failed for article {article_id}: {e}")
-                # 即使分析失敗，也返回基本內容
-                return {
-                    'article_id': article_id,
-                    'title': '',  # 標題會在後續處理中設置
-                    'author': actual_author or '',  # 使用提取的實際作者名稱
-                    'url': article_url,
-                    'content': content,
-                    'publish_time': publish_time,
-                    'push_count': push_count,  # 使用傳入的推文數
-                    'stock_symbols': stock_symbols,
-                    'validated_stocks': validated_stocks,
-                    'analysis_result': None
-                }
+            # 使用 LLM 分析器
+            article_data['analysis_result'] = await self.analyzer._analyze_content(temp_article)
+            logger.info(f"LLM analysis completed for article: {article_id}")
             
         except Exception as e:
-            logger.error(f"Error parsing article content from {article_url}: {e}")
+            logger.error(f"LLM analysis failed for article {article_id}: {e}")
+            # 即使分析失敗，也保留基本內容
+            article_data['analysis_result'] = None
+        
+        return article_data
+    
+    async def _get_article_content(self, article_url: str, push_count: int = 0) -> Optional[Dict]:
+        """取得文章詳細內容並進行 LLM 分析."""
+        page = await self._get_page(article_url, raw=True)
+        if not page:
+            return None
+
+        article_data = await self._parse_article_page(page, article_url, push_count)
+        if not article_data:
             return None
+        
+        await self._validate_article_stocks(article_data)
+        return await self._analyze_article(article_data)
+    
+    async def _parse_list_page(self, page: Union[str, bytes]) -> Tuple[List[Dict], Optional[str]]:
+        """解析看板列表或搜尋結果頁，回傳 (文章列, 上頁連結)，不含置底文章."""
+        try:
+            return await self.parser_pool.parse_list_page(page, self.base_url)
+        except Exception as e:
+            logger.error(f"Error parsing list page: {e}")
+            return [], None
     
     async def _parse_author_search_results(self, html: str, author: str) -> List[Dict]:
         """解析作者搜尋結果."""
-        soup = BeautifulSoup(html, 'html.parser')
-        articles = []
-        
         try:
-            # 查找文章列表
-            article_elements = soup.find_all('div', class_='r-ent')
-            
-            for element in article_elements:
-                try:
-                    # 提取文章標題和連結
-                    title_element = element.find('div', class_='title')
-                    if not title_element:
-                        continue
-                    
-                    link_element = title_element.find('a')
-                    if not link_element:
-                        continue
-                    
-                    title = link_element.get_text().strip()
-                    article_url = urljoin(self.base_url, link_element.get('href'))
-                    
-                    # 提取推文數
-                    push_element = element.find('div', class_='nrec')
-                    push_count = 0
-                    if push_element:
-                        push_text = push_element.get_text().strip()
-                        if push_text.isdigit():
-                            push_count = int(push_text)
-                        elif push_text == '爆':
-                            push_count = 100  # PTT 的"爆"表示推文數超過100
-                        elif push_text == 'X':
-                            push_count = -1  # PTT 的"X"表示被噓爆
-                        elif push_text == '→':
-                            push_count = 0  # PTT 的"→"表示沒有推文
-                    
-                    # 提取日期
-                    date_element = element.find('div', class_='date')
-                    date_str = date_element.get_text().strip() if date_element else ""
-                    
-                    articles.append({
-                        'title': title,
-                        'url': article_url,
-                        'push_count': push_count,
-                        'date': date_str,
-                        'author': author
-                    })
-                    
-                except Exception as e:
-                    logger.warning(f"Error parsing article element: {e}")
-                    continue
+            articles, _ = await self._parse_list_page(html)
+            for article in articles:
+                article['author'] = author
             
             logger.info(f"Parsed {len(articles)} articles for author {author}")
             return articles
@@ -384,6 +425,136 @@ class PTTCrawler:
             logger.error(f"Error parsing search results: {e}")
             return []
     
+    def _estimate_row_time(self, article: Dict) -> Optional[datetime]:
+        """估計列表列的發文時間：優先使用文章ID中的時間戳，其次使用 M/DD 日期."""
+        match = re.search(r'M\.(\d+)\.A', article.get('url', ''))
+        if match:
+            return datetime.fromtimestamp(int(match.group(1)))
+        
+        date_match = re.match(r'(\d{1,2})/(\d{1,2})', article.get('date', ''))
+        if date_match:
+            now = datetime.now()
+            month, day = int(date_match.group(1)), int(date_match.group(2))
+            try:
+                row_time = datetime(now.year, month, day)
+            except ValueError:
+                return None
+            # 列表日期沒有年份，晚於今天代表是去年的文章
+            return row_time if row_time <= now else row_time.replace(year=now.year - 1)
+        return None
+    
+    async def _iter_list_rows(
+        self,
+        start_url: str,
+        max_pages: int,
+        days: Optional[int] = None,
+        skip_known: bool = False,
+        watermark_ts: Optional[int] = None
+    ) -> AsyncIterator[Dict]:
+        """沿著「上頁」連結由新到舊逐列產生文章，超出天數或到達水位線即停止.
+        
+        skip_known 時略過已入庫的文章但繼續往舊翻頁：較新的文章可能已保存而較舊的抓取失敗，
+        遇到已知文章就停止會讓失敗的文章永遠不再被走訪。
+        """
+        cutoff = datetime.now() - timedelta(days=days if days is not None else settings.SEARCH_DAYS)
+        url = start_url
+        pages = 0
+        
+        while url and pages < max_pages:
+            page = await self._get_page(url, raw=True)
+            if not page:
+                logger.error(f"Failed to get list page {url}")
+                return
+            pages += 1
+            
+            rows, url = await self._parse_list_page(page)
+            for row in rows:
+                row['article_id'] = self._extract_article_id(row['url'])
+            
+            # 每頁只做一次批次查詢
+            known_ids = await self._get_existing_article_ids([row['article_id'] for row in rows]) if skip_known else set()
+            
+            # 同一頁內由舊到新排列，反向走訪以便遇到邊界即停止
+            for row in reversed(rows):
+                row_ts = self._article_timestamp(row['article_id'])
+                if watermark_ts and row_ts and row_ts <= watermark_ts:
+                    logger.info(f"Reached watermark at {row['article_id']} after {pages} pages")
+                    return
+                row_time = self._estimate_row_time(row)
+                if row_time and row_time < cutoff:
+                    logger.info(f"Reached {cutoff:%Y-%m-%d} boundary after {pages} pages")
+                    return
+                if row['article_id'] in known_ids:
+                    continue
+                yield row
+    
+    async def iter_author_search_results(
+        self,
+        author: str,
+        days: Optional[int] = None,
+        watermark_ts: Optional[int] = None
+    ) -> AsyncIterator[Dict]:
+        """以非同步產生器逐列產生作者搜尋結果（由新到舊），略過已知文章，遇到過期或水位線即停止."""
+        search_url = f"{self.base_url}/bbs/{self.stock_board}/search?q=author:{author}"
+        logger.info(f"Searching for author {author} at {search_url}")
+        
+        async for row in self._iter_list_rows(
+            search_url, settings.search_max_pages, days, skip_known=True, watermark_ts=watermark_ts
+        ):
+            row['author'] = author
+            yield row
+    
+    async def discover_from_board_index(self, authors: List[str]) -> List[List[Dict]]:
+        """由新到舊走訪看板索引頁，一次取得所有追蹤作者在 SEARCH_DAYS 內的文章."""
+        tracked_authors = set(authors)
+        author_articles: Dict[str, List[Dict]] = {author: [] for author in authors}
+        
+        watermarks = await self._load_watermarks(authors)
+        
+        index_url = f"{self.base_url}/bbs/{self.stock_board}/index.html"
+        async for row in self._iter_list_rows(index_url, settings.index_max_pages):
+            if row['author'] not in tracked_authors:
+                continue
+            # 已在先前會話處理過的文章不再抓取
+            row_ts = self._article_timestamp(row['article_id'])
+            if row_ts and row_ts <= watermarks.get(row['author'], 0):
+                continue
+            author_articles[row['author']].append(row)
+        
+        found = sum(len(articles) for articles in author_articles.values())
+        logger.info(f"Board index crawl matched {found} articles")
+        
+        # 抓取內文前批次排除已存在的文章，再依作者分組
+        new_articles = await self._filter_new_articles(
+            [article for articles in author_articles.values() for article in articles]
+        )
+        grouped: Dict[str, List[Dict]] = {author: [] for author in authors}
+        for article in new_articles:
+            grouped[article['author']].append(article)
+        # 與搜尋模式一致，回傳由舊到新
+        return [grouped[author][::-1] for author in authors]
+    
+    async def discover_author_articles(self, author: str, days: Optional[int] = None) -> List[Dict]:
+        """取得作者尚未入庫的文章（由舊到新，最多 max_articles_per_crawl 篇）.
+        
+        名額由水位線之上最舊的文章開始填，水位線才能推進到實際完成的文章；較新的文章留待下次。
+        """
+        # 指定天數回補時忽略水位線
+        watermark_ts = None
+        if days is None:
+            watermark_ts = (await self._load_watermarks([author])).get(author)
+        
+        articles = [row async for row in self.iter_author_search_results(author, days, watermark_ts)]
+        articles.reverse()
+        
+        budget = settings.max_articles_per_crawl
+        if len(articles) > budget:
+            logger.info(f"Found {len(articles)} new articles for {author}, keeping the oldest {budget}")
+            articles = articles[:budget]
+        
+        logger.info(f"Found {len(articles)} new articles from search results for {author}")
+        return articles
+    
     async def crawl_author_articles(self, author: str) -> List[Dict]:
         """爬取特定作者的文章."""
         logger.info(f"Starting to crawl articles for author: {author}")
@@ -394,70 +565,13 @@ class PTTCrawler:
             return []
         
         try:
-            # 搜尋作者文章
-            search_url = f"{self.base_url}/bbs/{self.stock_board}/search?q=author:{author}"
-            logger.info(f"Searching for author {author} at {search_url}")
+            articles = await self.discover_author_articles(author)
             
-            html = await self._get_page(search_url)
-            if not html:
-                logger.error(f"Failed to get search results for {author}")
-                return []
-            
-            # 解析搜尋結果
-            articles = await self._parse_author_search_results(html, author)
-            logger.info(f"Found {len(articles)} articles from search results")
-            
-            # 處理每篇文章
-            processed_articles = []
-            for article in articles:
-                try:
-                    logger.info(f"Processing article: {article['title']}")
-                    
-                    # 先檢查文章是否已存在於資料庫
-                    article_id = self._extract_article_id(article['url'])
-                    
-                    # 先取得文章內容以獲取發文時間和實際作者名稱
-                    article_data = await self._get_article_content(article['url'], article['push_count'])
-                    if not article_data:
-                        continue
-                    
-                    # 驗證作者名稱是否精確匹配（大小寫敏感）
-                    actual_author = article_data.get('author', '').strip()
-                    if actual_author and actual_author != author:
-                        logger.info(f"Article author '{actual_author}' does not match search author '{author}', skipping")
-                        continue
-                    
-                    # 如果無法提取作者名稱，使用搜索的作者名稱（可能是搜索結果中的誤報）
-                    if not actual_author:
-                        logger.warning(f"Could not extract author from article, using search author '{author}'")
-                        actual_author = author
-                    
-                    # 使用發文時間進行重複檢查
-                    if article_id and await self._is_article_exists(article_id, article['url'], article_data.get('publish_time')):
-                        logger.info(f"Article {article_id} or similar publish time already exists, skipping")
-                        continue
-                    
-                    # 合併數據（使用實際提取的作者名稱）
-                    article_data.update({
-                        'title': article['title'],
-                        'author': actual_author,
-                        'push_count': article['push_count']
-                    })
-                    
-                    # 檢查文章是否在時間範圍內
-                    days_ago = (datetime.now() - article_data['publish_time']).days
-                    if days_ago > settings.SEARCH_DAYS:
-                        logger.info(f"Article is older than {settings.SEARCH_DAYS} days, stopping processing")
-                        break
-                    
-                    processed_articles.append(article_data)
-                    
-                    # 添加延遲避免被阻擋
-                    await asyncio.sleep(random.uniform(1, 3))
-                    
-                except Exception as e:
-                    logger.error(f"Error processing article {article.get('title', 'Unknown')}: {e}")
-                    continue
+            # 並發處理每篇文章，速率由 fetch_scheduler 控制
+            results = await asyncio.gather(
+                *(self._process_search_result(article) for article in articles)
+            )
+            processed_articles = [article_data for article_data in results if article_data]
             
             logger.info(f"Found {len(processed_articles)} new articles for author {author}")
             return processed_articles
@@ -466,15 +580,124 @@ class PTTCrawler:
             logger.error(f"Error crawling articles for author {author}: {e}")
             return []
     
+    async def _accept_article(self, article_data: Dict, article: Dict) -> Optional[Dict]:
+        """檢查解析後的文章是否符合作者、重複與時間條件，並合併搜尋結果資訊."""
+        author = article['author']
+        article_id = article_data['article_id']
+        
+        # 驗證作者名稱是否精確匹配（大小寫敏感）
+        actual_author = article_data.get('author', '').strip()
+        if actual_author and actual_author != author:
+            logger.info(f"Article author '{actual_author}' does not match search author '{author}', skipping")
+            self.mark_article_done(article_id)
+            return None
+        
+        # 如果無法提取作者名稱，使用搜索的作者名稱（可能是搜索結果中的誤報）
+        if not actual_author:
+            logger.warning(f"Could not extract author from article, using search author '{author}'")
+            actual_author = author
+        
+        # 以ID、URL與同一作者的發文時間進行重複檢查
+        if article_id and await self._is_article_exists(
+            article_id, article['url'], article_data.get('publish_time'), actual_author
+        ):
+            logger.info(f"Article {article_id} or similar publish time already exists, skipping")
+            self.mark_article_done(article_id)
+            return None
+        
+        # 檢查文章是否在時間範圍內
+        days_ago = (datetime.now() - article_data['publish_time']).days
+        if days_ago > settings.SEARCH_DAYS:
+            logger.info(f"Article {article_id} is older than {settings.SEARCH_DAYS} days, skipping")
+            self.mark_article_done(article_id)
+            return None
+        
+        # 合併數據（使用實際提取的作者名稱）
+        article_data.update({
+            'title': article['title'],
+            'author': actual_author,
+            'push_count': article['push_count']
+        })
+        return article_data
+    
+    async def _process_search_result(self, article: Dict) -> Optional[Dict]:
+        """抓取、檢查並分析單篇搜尋結果，不符合條件時回傳 None."""
+        try:
+            logger.info(f"Processing article: {article['title']}")
+            
+            page = await self._get_page(article['url'], raw=True)
+            if not page:
+                return None
+            
+            article_data = await self._parse_article_page(page, article['url'], article['push_count'])
+            if not article_data:
+                self.mark_article_failed(article['article_id'], article['author'])
+                return None
+            
+            # 先做便宜的檢查，再進行股票驗證與 LLM 分析
+            article_data = await self._accept_article(article_data, article)
+            if not article_data:
+                return None
+            
+            await self._validate_article_stocks(article_data)
+            return await self._analyze_article(article_data)
+            
+        except Exception as e:
+            logger.error(f"Error processing article {article.get('title', 'Unknown')}: {e}")
+            return None
+    
+    @staticmethod
+    def _round_robin(article_lists: List[List[Dict]]) -> List[Dict]:
+        """將各作者的文章列表交錯排列，讓每位作者輪流取得抓取名額."""
+        interleaved = []
+        for round_articles in zip_longest(*article_lists):
+            interleaved.extend(article for article in round_articles if article is not None)
+        return interleaved
+    
+    async def _discover_author_safely(self, author: str) -> List[Dict]:
+        """搜尋單一作者，失敗時回傳空列表以免影響其他作者."""
+        try:
+            return await self.discover_author_articles(author)
+        except Exception as e:
+            logger.error(f"Error discovering articles for author {author}: {e}")
+            return []
+    
+    async def discover_all_authors(self, authors: List[str]) -> List[Dict]:
+        """取得所有作者的新文章（各作者由舊到新），以輪詢方式排序並套用全域抓取名額."""
+        if settings.crawl_mode == "index":
+            # 看板索引模式：請求數與作者數無關
+            article_lists = await self.discover_from_board_index(authors)
+        else:
+            article_lists = await asyncio.gather(
+                *(self._discover_author_safely(author) for author in authors)
+            )
+        for author, articles in zip(authors, article_lists):
+            logger.info(f"Found {len(articles)} new articles for {author}")
+        
+        # 各作者由舊到新輪詢，超出名額時捨棄的是較新的文章
+        articles = self._round_robin(article_lists)
+        # 超出名額而未抓取的文章也要記錄，避免水位線越過它們
+        self._track_scheduled(articles)
+        
+        budget = settings.max_articles_per_crawl
+        if len(articles) > budget:
+            logger.info(f"Fetch budget reached: {len(articles)} new articles, keeping {budget}")
+            articles = articles[:budget]
+        return articles
+    
     async def crawl_all_authors(self) -> List[Dict]:
-        """爬取所有目標作者的文章."""
-        all_articles = []
+        """並發爬取所有目標作者的文章（共用同一會話與抓取名額）."""
+        if not await self._setup_board_access():
+            logger.error("Failed to setup board access")
+            return []
         
-        for author in self.target_authors:
-            logger.info(f"Crawling articles for author: {author}")
-            articles = await self.crawl_author_articles(author)
-            all_articles.extend(articles)
-            logger.info(f"Found {len(articles)} articles for {author}")
+        articles = await self.discover_all_authors(self.target_authors)
+        
+        # 任務建立順序即輪詢順序，fetch_scheduler 的號誌依序放行
+        results = await asyncio.gather(
+            *(self._process_search_result(article) for article in articles)
+        )
+        all_articles = [article_data for article_data in results if article_data]
         
         logger.info(f"Total articles found: {len(all_articles)}")
         return all_articles
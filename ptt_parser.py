@@ -0,0 +1,238 @@
+"""PTT 頁面解析模組 - 使用 lxml（C 實作）與 XPath 取代 BeautifulSoup html.parser."""
+
+import asyncio
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from lxml import etree
+from lxml import html as lxml_html
+from loguru import logger
+
+from config import settings
+from system_detector import system_detector
+
+# 預先編譯的 XPath 與正規表示式
+_META_VALUES = etree.XPath('//span[@class="article-meta-value"]')
+_MAIN_CONTENT = etree.XPath('//div[@id="main-content"]')
+# 推文與以冒號開頭的引言，一次選出後移除
+_REMOVABLE_NODES = etree.XPath(
+    './/div[contains(concat(" ", normalize-space(@class), " "), " push ")]'
+    ' | .//span[contains(concat(" ", normalize-space(@class), " "), " f6 ")]'
+    '[starts-with(normalize-space(.), ":")]'
+)
+_LIST_ROWS = etree.XPath(
+    '//div[contains(concat(" ", normalize-space(@class), " "), " r-ent ")'
+    ' or contains(concat(" ", normalize-space(@class), " "), " r-list-sep ")]'
+)
+_PAGING_LINKS = etree.XPath(
+    '//div[contains(concat(" ", normalize-space(@class), " "), " btn-group-paging ")]/a'
+)
+
+_PTT_TIMESTAMP = re.compile(r'(\w{3})\s+(\w{3})\s+(\d{1,2})\s+(\d{2}):(\d{2}):(\d{2})\s+(\d{4})')
+_CHINESE_DATE = re.compile(r'(\d{4})年(\d{1,2})月(\d{1,2})日')
+_ISO_DATE = re.compile(r'\d{4}-\d{1,2}-\d{1,2}')
+_AUTHOR = re.compile(r'^([^\s\(]+)')
+
+_MONTH_MAP = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+def parse_document(html: Union[str, bytes]) -> lxml_html.HtmlElement:
+    """將 HTML 解析為 lxml 文件樹（bytes 以 UTF-8 解碼）."""
+    if isinstance(html, bytes):
+        parser = lxml_html.HTMLParser(encoding='utf-8')
+        return lxml_html.document_fromstring(html, parser=parser)
+    return lxml_html.document_fromstring(html)
+
+def _class_list(element) -> List[str]:
+    """取得元素的 class 列表."""
+    return (element.get('class') or '').split()
+
+def _child_text(element, class_name: str) -> str:
+    """取得指定 class 子孫元素的文字."""
+    nodes = element.find_class(class_name)
+    return nodes[0].text_content().strip() if nodes else ""
+
+def extract_meta_values(doc) -> List[str]:
+    """取得文章標頭（作者、看板、標題、時間）的值."""
+    return [node.text_content().strip() for node in _META_VALUES(doc)]
+
+def _author_from_meta(meta_values: List[str]) -> Optional[str]:
+    """第一個標頭值為「作者 (暱稱)」，去掉括號內的暱稱."""
+    if meta_values:
+        author_match = _AUTHOR.match(meta_values[0])
+        if author_match:
+            return author_match.group(1).strip()
+    return None
+
+def extract_author(doc) -> Optional[str]:
+    """從文章標頭提取作者名稱."""
+    return _author_from_meta(extract_meta_values(doc))
+
+def parse_publish_time(meta_values: List[str]) -> Optional[datetime]:
+    """從標頭值中解析發文時間，無法解析時回傳 None."""
+    for text in meta_values:
+        # PTT 完整時間戳格式 (Wed Oct 15 13:16:00 2025)
+        ptt_timestamp_match = _PTT_TIMESTAMP.search(text)
+        if ptt_timestamp_match:
+            try:
+                _, month_name, day, hour, minute, second, year = ptt_timestamp_match.groups()
+                month = _MONTH_MAP.get(month_name, 1)
+                return datetime(int(year), month, int(day), int(hour), int(minute), int(second))
+            except ValueError as e:
+                logger.warning(f"Failed to parse PTT timestamp: {e}")
+                continue
+
+        # 中文日期格式 (2025年10月15日)
+        elif '年' in text and '月' in text and '日' in text:
+            time_match = _CHINESE_DATE.search(text)
+            if time_match:
+                year, month, day = time_match.groups()
+                return datetime(int(year), int(month), int(day))
+
+        # 英文日期格式 (10/15/2025)
+        elif '/' in text and len(text.split('/')) == 3:
+            try:
+                month, day, year = text.split('/')
+                # 處理兩位數年份
+                if len(year) == 2:
+                    year = '20' + year
+                return datetime(int(year), int(month), int(day))
+            except ValueError:
+                continue
+
+        # ISO 格式 (2025-10-15)
+        elif _ISO_DATE.match(text):
+            try:
+                return datetime.fromisoformat(text)
+            except ValueError:
+                continue
+
+    return None
+
+def extract_content(doc) -> Optional[str]:
+    """取得文章純文字內容（移除推文與引言）."""
+    main_nodes = _MAIN_CONTENT(doc)
+    if not main_nodes:
+        return None
+
+    main_content = main_nodes[0]
+    # drop_tree 會保留節點後方的文字，與 decompose 行為一致
+    for node in _REMOVABLE_NODES(main_content):
+        node.drop_tree()
+    return main_content.text_content().strip()
+
+def parse_article(html: Union[str, bytes]) -> Optional[Dict]:
+    """解析文章頁面，回傳精簡的紀錄 {author, publish_time, content}."""
+    doc = parse_document(html)
+    meta_values = extract_meta_values(doc)
+
+    content = extract_content(doc)
+    if content is None:
+        return None
+
+    return {
+        'author': _author_from_meta(meta_values),
+        'publish_time': parse_publish_time(meta_values),
+        'content': content
+    }
+
+def _parse_push_count(push_text: str) -> int:
+    """將列表的推文數欄位轉為整數."""
+    if push_text.isdigit():
+        return int(push_text)
+    if push_text == '爆':
+        return 100  # PTT 的"爆"表示推文數超過100
+    if push_text == 'X':
+        return -1  # PTT 的"X"表示被噓爆
+    return 0  # PTT 的"→"或空白表示沒有推文
+
+def parse_list_page(html: Union[str, bytes], base_url: str) -> Tuple[List[Dict], Optional[str]]:
+    """解析看板列表或搜尋結果頁，回傳 (文章列, 上頁連結)，不含置底文章."""
+    doc = parse_document(html)
+    articles = []
+
+    for element in _LIST_ROWS(doc):
+        # r-list-sep 之後為置底公告
+        if 'r-list-sep' in _class_list(element):
+            break
+
+        # 已刪除的文章沒有連結
+        links = element.xpath('./div[@class="title"]/a')
+        if not links:
+            continue
+        link_element = links[0]
+
+        articles.append({
+            'title': link_element.text_content().strip(),
+            'url': urljoin(base_url, link_element.get('href')),
+            'push_count': _parse_push_count(_child_text(element, 'nrec')),
+            'date': _child_text(element, 'date'),
+            'author': _child_text(element, 'author')
+        })
+
+    # 上頁連結（較舊的文章）
+    prev_url = None
+    for link in _PAGING_LINKS(doc):
+        if '上頁' in link.text_content() and link.get('href'):
+            prev_url = urljoin(base_url, link.get('href'))
+            break
+
+    return articles, prev_url
+
+class ParserPool:
+    """解析後端：inline 在事件迴圈執行緒解析，process 交給多進程池以使用多核心."""
+
+    def __init__(self, backend: Optional[str] = None, workers: Optional[int] = None):
+        self.backend = backend or settings.parse_backend
+        self.workers = workers or settings.parse_workers or self._default_workers()
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def _default_workers() -> int:
+        """依 CPU 資訊決定進程數，保留一個核心給事件迴圈."""
+        cpu_info = system_detector.get_cpu_info()
+        cores = cpu_info.get("physical_cores") or cpu_info.get("total_cores") or 1
+        return max(1, cores - 1)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """延遲建立進程池."""
+        if self.executor is None:
+            logger.info(f"Starting parser process pool with {self.workers} workers")
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    async def _run(self, func: Callable, *args):
+        """依後端設定執行解析函式，進程池失效時退回 inline."""
+        if self.backend != "process":
+            return func(*args)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool as e:
+            logger.error(f"Parser process pool broken, falling back to inline parsing: {e}")
+            self.shutdown()
+            self.backend = "inline"
+            return func(*args)
+
+    async def parse_article(self, page: Union[str, bytes]) -> Optional[Dict]:
+        """解析文章頁面."""
+        return await self._run(parse_article, page)
+
+    async def parse_list_page(self, page: Union[str, bytes], base_url: str) -> Tuple[List[Dict], Optional[str]]:
+        """解析列表頁面."""
+        return await self._run(parse_list_page, page, base_url)
+
+    def shutdown(self):
+        """關閉進程池."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+# 創建全局實例
+parser_pool = ParserPool()
@@ -0,0 +1,172 @@
+"""請求速率控制模組 - 並發上限、每主機令牌桶與指數退避."""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Dict, Optional, Union
+from urllib.parse import urlparse
+
+import aiohttp
+from loguru import logger
+
+from config import settings
+
+# 需要退避重試的 HTTP 狀態碼
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """令牌桶速率限制器."""
+
+    def __init__(self, rate: float, capacity: float = 1.0, jitter: float = 0.0):
+        self.rate = rate  # 每秒補充的令牌數
+        self.capacity = capacity
+        self.jitter = jitter  # 等待時額外加入的隨機秒數上限
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        """依經過時間補充令牌."""
+        elapsed = now - self.last_refill
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.last_refill = now
+
+    def pause(self, seconds: float):
+        """暫停發放令牌（例如收到 429 時）."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """取得一個令牌，必要時等待."""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+                await asyncio.sleep(wait + random.uniform(0, self.jitter))
+
+class DailyQuota:
+    """每日呼叫額度（UTC 日期變更時重置），limit <= 0 表示不限."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.day = datetime.utcnow().date()
+
+    def _reset_if_new_day(self):
+        """跨日時重置已用額度."""
+        today = datetime.utcnow().date()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """剩餘額度，不限時為 None."""
+        if self.limit <= 0:
+            return None
+        self._reset_if_new_day()
+        return max(self.limit - self.used, 0)
+
+    def available(self) -> bool:
+        """是否仍有額度."""
+        remaining = self.remaining
+        return remaining is None or remaining > 0
+
+    def try_consume(self) -> bool:
+        """使用一次額度，已用盡時回傳 False."""
+        if not self.available():
+            return False
+        self.used += 1
+        return True
+
+    def exhaust(self):
+        """供應商回報額度用盡時，將今日額度標記為已用完."""
+        if self.limit > 0:
+            self._reset_if_new_day()
+            self.used = self.limit
+
+class FetchScheduler:
+    """共用的抓取排程器：全域並發上限 + 每主機令牌桶 + 429/5xx 退避."""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        min_delay_ms: Optional[int] = None,
+        max_delay_ms: Optional[int] = None,
+        max_backoff_seconds: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.max_concurrency = max_concurrency or settings.max_concurrent_requests
+        self.min_delay = (min_delay_ms if min_delay_ms is not None else settings.request_min_delay_ms) / 1000
+        self.max_delay = (max_delay_ms if max_delay_ms is not None else settings.request_max_delay_ms) / 1000
+        self.max_backoff = max_backoff_seconds if max_backoff_seconds is not None else settings.backoff_max_sleep_seconds
+        self.max_retries = max_retries if max_retries is not None else settings.max_fetch_retries
+
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def _get_bucket(self, url: str) -> TokenBucket:
+        """取得（或建立）指定主機的令牌桶."""
+        host = urlparse(url).netloc
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            # 平均請求間隔決定補充速率，上下限差距作為抖動範圍
+            mean_delay = max((self.min_delay + self.max_delay) / 2, 0.001)
+            bucket = TokenBucket(
+                rate=1 / mean_delay,
+                capacity=settings.request_burst,
+                jitter=max(self.max_delay - self.min_delay, 0) / 2
+            )
+            self.buckets[host] = bucket
+        return bucket
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """計算指數退避時間（full jitter），優先採用 Retry-After."""
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        base = max(self.min_delay, 0.5)
+        return random.uniform(0, min(self.max_backoff, base * (2 ** attempt)))
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        raw: bool = False,
+        **kwargs
+    ) -> Optional[Union[str, bytes]]:
+        """在速率限制下取得網頁內容（raw=True 時回傳 bytes），遇到 429/5xx 或連線錯誤時退避重試."""
+        bucket = self._get_bucket(url)
+
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            retry_after = None
+            try:
+                async with self.semaphore:
+                    async with session.get(url, **kwargs) as response:
+                        if response.status == 200:
+                            return await response.read() if raw else await response.text()
+                        if response.status not in RETRYABLE_STATUS:
+                            logger.warning(f"Failed to get page {url}: {response.status}")
+                            return None
+                        retry_after = response.headers.get('Retry-After')
+                        logger.warning(f"Retryable status {response.status} for {url} (attempt {attempt + 1})")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Error getting page {url} (attempt {attempt + 1}): {e}")
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt, retry_after)
+                # 整個主機一起退避，下一輪 acquire 會等到退避結束
+                bucket.pause(delay)
+
+        logger.error(f"Giving up on {url} after {self.max_retries + 1} attempts")
+        return None
@@ -0,0 +1,180 @@
+"""LLM 前置相關性篩選 - 依標題分類、已驗證股票數與關鍵詞分數決定文章是否需要送 LLM 分析."""
+
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from company_matcher import AhoCorasick
+from config import settings
+
+# PTT 標題分類（可能帶 Re:/Fw: 前綴）
+TITLE_TAG_PATTERN = re.compile(r'^\s*(?:(?:Re|Fw|RE|FW)\s*:\s*)*[\[［【]\s*([^\]］】]+?)\s*[\]］】]')
+
+# 一定要送 LLM 的分類 / 一定不送的分類
+ALWAYS_ANALYZE_TAGS = {'標的'}
+NEVER_ANALYZE_TAGS = {'公告'}
+
+# 其他分類的基礎分數
+TAG_WEIGHTS: Dict[str, float] = {
+    '新聞': 1.5,
+    '心得': 1.5,
+    '請益': 1.0,
+    '情報': 0.0,
+    '其他': 0.0,
+    '閒聊': -1.0,
+    '問卦': -1.0,
+}
+
+STOCK_WEIGHT = 1.0  # 每檔已驗證股票的分數
+MAX_COUNTED_STOCKS = 3
+
+# 關鍵詞：(詞, 相關性, 偏多, 偏空)
+LEXICON = [
+    ('目標價', 1.5, 0.0, 0.0),
+    ('停損', 1.0, 0.0, 0.0),
+    ('停利', 1.0, 0.0, 0.0),
+    ('進場', 1.0, 0.0, 0.0),
+    ('出場', 0.8, 0.0, 0.0),
+    ('財報', 0.8, 0.0, 0.0),
+    ('營收', 0.8, 0.0, 0.0),
+    ('EPS', 0.8, 0.0, 0.0),
+    ('本益比', 0.8, 0.0, 0.0),
+    ('法說', 0.8, 0.0, 0.0),
+    ('毛利', 0.6, 0.0, 0.0),
+    ('殖利率', 0.6, 0.0, 0.0),
+    ('技術面', 0.6, 0.0, 0.0),
+    ('基本面', 0.6, 0.0, 0.0),
+    ('籌碼', 0.6, 0.0, 0.0),
+    ('支撐', 0.6, 0.0, 0.0),
+    ('選擇權', 0.6, 0.0, 0.0),
+    ('期貨', 0.5, 0.0, 0.0),
+    ('外資', 0.5, 0.0, 0.0),
+    ('除息', 0.5, 0.0, 0.0),
+    ('壓力', 0.4, 0.0, 0.0),
+    ('做多', 1.0, 1.0, 0.0),
+    ('多單', 1.0, 1.0, 0.0),
+    ('看多', 0.8, 1.0, 0.0),
+    ('買進', 0.8, 1.0, 0.0),
+    ('加碼', 0.8, 1.0, 0.0),
+    ('突破', 0.5, 1.0, 0.0),
+    ('利多', 0.5, 1.0, 0.0),
+    ('漲停', 0.6, 1.0, 0.0),
+    ('做空', 1.0, 0.0, 1.0),
+    ('空單', 1.0, 0.0, 1.0),
+    ('看空', 0.8, 0.0, 1.0),
+    ('賣出', 0.8, 0.0, 1.0),
+    ('減碼', 0.8, 0.0, 1.0),
+    ('跌破', 0.5, 0.0, 1.0),
+    ('利空', 0.5, 0.0, 1.0),
+    ('跌停', 0.6, 0.0, 1.0),
+]
+
+class RelevanceFilter:
+    """在 LLM 分析前以低成本規則篩掉沒有可交易內容的文章."""
+
+    def __init__(self):
+        self.terms = [term for term, *_ in LEXICON]
+        # 權重矩陣：詞數 × (相關性, 偏多, 偏空)
+        self.weights = np.array([weights for _, *weights in LEXICON], dtype=np.float64)
+        self.automaton = AhoCorasick()
+        for index, term in enumerate(self.terms):
+            self.automaton.add(term, str(index))
+        self.automaton.build()
+
+        # 統計資料
+        self.passed = 0
+        self.skipped = 0
+        self.skipped_by_tag: Dict[str, int] = {}
+
+    @staticmethod
+    def parse_title_tag(title: Optional[str]) -> Optional[str]:
+        """取得標題分類，例如 "Re: [標的] 2330 台積電 多" -> "標的"."""
+        match = TITLE_TAG_PATTERN.match(title or '')
+        return match.group(1) if match else None
+
+    def lexicon_scores(self, text: str) -> np.ndarray:
+        """單次掃描計算 (相關性, 偏多, 偏空) 分數；重複出現的詞以 log1p 遞減計分."""
+        counts = np.zeros(len(self.terms), dtype=np.float64)
+        for _, _, index in self.automaton.iter_matches(text or ''):
+            counts[int(index)] += 1
+        return np.log1p(counts) @ self.weights
+
+    def evaluate(self, title: Optional[str], stock_symbols: Optional[List[str]], content: Optional[str]) -> Dict[str, Any]:
+        """評估文章是否需要 LLM 分析."""
+        tag = self.parse_title_tag(title)
+        stock_count = len(stock_symbols or [])
+        relevance, bullish, bearish = (float(value) for value in self.lexicon_scores(f"{title or ''}\n{content or ''}"))
+
+        score = (
+            TAG_WEIGHTS.get(tag, 0.0)
+            + STOCK_WEIGHT * min(stock_count, MAX_COUNTED_STOCKS)
+            + relevance
+        )
+        if tag in ALWAYS_ANALYZE_TAGS:
+            needs_llm = True
+        elif tag in NEVER_ANALYZE_TAGS:
+            needs_llm = False
+        else:
+            needs_llm = score >= settings.relevance_threshold
+
+        return {
+            "needs_llm": needs_llm,
+            "tag": tag,
+            "stock_count": stock_count,
+            "score": round(score, 3),
+            "bullish": round(bullish, 3),
+            "bearish": round(bearish, 3)
+        }
+
+    def should_analyze(self, article) -> Dict[str, Any]:
+        """評估文章並更新統計；停用篩選時一律送 LLM."""
+        if not settings.relevance_filter_enabled:
+            return {"needs_llm": True}
+
+        decision = self.evaluate(article.title, article.stock_symbols, article.content)
+        if decision["needs_llm"]:
+            self.passed += 1
+        else:
+            self.skipped += 1
+            tag = decision["tag"] or "無分類"
+            self.skipped_by_tag[tag] = self.skipped_by_tag.get(tag, 0) + 1
+            logger.info(f"Skipping LLM for article {article.article_id}: {decision}")
+        return decision
+
+    def cheap_analysis(self, stock_symbols: Optional[List[str]], decision: Dict[str, Any]) -> Dict[str, Any]:
+        """未送 LLM 的文章使用確定性的簡易分析，並以 prefiltered 標記方便日後補送 LLM."""
+        if decision["bullish"] > decision["bearish"]:
+            sentiment = "pos"
+        elif decision["bearish"] > decision["bullish"]:
+            sentiment = "neg"
+        else:
+            sentiment = "neu"
+
+        return {
+            "recommended_stocks": [],
+            "mentioned_stocks": list(stock_symbols or []),
+            "reason": f"預篩判定非投資相關文章（分類：{decision['tag'] or '無'}，分數：{decision['score']}）",
+            "sentiment": sentiment,
+            "sectors": [],
+            "strategy": "未知",
+            "risk_level": "medium",
+            "prefiltered": True,
+            "relevance": decision
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得篩選統計."""
+        total = self.passed + self.skipped
+        return {
+            "enabled": settings.relevance_filter_enabled,
+            "threshold": settings.relevance_threshold,
+            "passed": self.passed,
+            "skipped": self.skipped,
+            "skip_rate": round(self.skipped / total, 3) if total else 0,
+            "skipped_by_tag": dict(self.skipped_by_tag)
+        }
+
+# 創建全局實例
+relevance_filter = RelevanceFilter()
@@ -3,8 +3,27 @@
 import asyncio
 import aiohttp
 import re
-from typing import Dict, List, Optional, Tuple
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from loguru import logger
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from cache import TTLLRUCache
+from company_matcher import company_matcher
+from config import settings
+from database import db_manager
+from http_client import http_client
+from models import PendingStockValidation, PTTArticle, StockValidationCache
+from article_stocks import refresh_article_stocks
+from author_profiles import record_author_articles
+from rate_limiter import DailyQuota, TokenBucket
+from symbol_master import symbol_master
+
+class QuotaExceededError(RuntimeError):
+    """驗證 API 回報額度用盡."""
 
 class StockValidator:
     """股票代碼驗證器."""
@@ -16,8 +35,29 @@ class StockValidator:
         self.finmind_base_url = "https://api.finmindtrade.com/api/v4"
         self.alpha_vantage_base_url = "https://www.alphavantage.co/query"
         
-        # 台股代碼模式 (4位數字)
-        self.taiwan_pattern = re.compile(r'\b(\d{4})\b')
+        # 驗證結果快取：記憶體 LRU + 資料庫（負向結果使用較短 TTL）
+        self.memory_cache = TTLLRUCache(maxsize=settings.validation_cache_size)
+        self.db_hits = 0
+        self.db_misses = 0
+        self.api_calls = 0
+        
+        # 每個供應商的令牌桶與每日額度；額度或令牌不足的代碼延到下個時段驗證
+        self.buckets = {
+            'TW': TokenBucket(rate=settings.finmind_rate_per_minute / 60),
+            'US': TokenBucket(rate=settings.alpha_vantage_rate_per_minute / 60)
+        }
+        self.quotas = {
+            'TW': DailyQuota(settings.finmind_daily_quota),
+            'US': DailyQuota(settings.alpha_vantage_daily_quota)
+        }
+        self.deferred: set = set()  # 本進程延後的 (market, code)；提及它們的文章記錄在 pending_stock_validations
+        self.inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        
+        # 台股代碼模式 (4位數字)，排除年份、日期、價格、點數與張數
+        self.taiwan_pattern = re.compile(
+            r'(?<![A-Za-z\d.,/$＄])(?<!西元)(?<!民國)(\d{4})'
+            r'(?![\d%％]|[.,/:]\d|\s*(?:年|元|塊|點|萬|億|張|月|股|K\b|k\b))'
+        )
         # 美股代碼模式 (1-5位字母)
         self.us_pattern = re.compile(r'\b([A-Z]{1,5})\b')
     
@@ -122,81 +162,356 @@ class StockValidator:
         
         return True
     
-    async def validate_taiwan_stock(self, code: str) -> Optional[Dict]:
-        """驗證台股代碼並獲取基本信息."""
+    async def _get_cached(self, market: str, code: str) -> Tuple[bool, Optional[Dict]]:
+        """依序查詢記憶體 LRU 與資料庫快取，回傳 (是否命中, 驗證結果)."""
+        found, stock_info = self.memory_cache.get((market, code))
+        if found:
+            return True, stock_info
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                # 使用 FinMind API 查詢台股基本信息
-                url = f"{self.finmind_base_url}/taiwan_stock_info"
-                params = {
-                    'token': self.finmind_api_key,
-                    'stock_id': code
-                }
+            async with db_manager.get_async_session() as session:
+                entry = await session.scalar(
+                    select(StockValidationCache).where(
+                        StockValidationCache.market == market,
+                        StockValidationCache.code == code,
+                        StockValidationCache.expires_at > datetime.utcnow()
+                    )
+                )
+                if entry is None:
+                    self.db_misses += 1
+                    return False, None
                 
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('status') == 200 and data.get('data'):
-                            stock_info = data['data'][0]
-                            return {
-                                'code': code,
-                                'name': stock_info.get('stock_name', ''),
-                                'market': 'TW',
-                                'type': 'taiwan_stock',
-                                'valid': True
-                            }
+                self.db_hits += 1
+                stock_info = entry.result if entry.is_valid else None
+                remaining = (entry.expires_at - datetime.utcnow()).total_seconds()
+                self.memory_cache.set((market, code), stock_info, ttl=remaining)
+                return True, stock_info
         except Exception as e:
-            logger.warning(f"Error validating Taiwan stock {code}: {e}")
-        
-        return None
+            logger.warning(f"Error reading validation cache for {market}:{code}: {e}")
+            return False, None
     
-    async def validate_us_stock(self, code: str) -> Optional[Dict]:
-        """驗證美股代碼並獲取基本信息."""
+    async def _set_cached(self, market: str, code: str, stock_info: Optional[Dict]):
+        """寫入兩層快取，查無代碼以較短的 TTL 快取."""
+        ttl_hours = settings.validation_positive_ttl_hours if stock_info else settings.validation_negative_ttl_hours
+        self.memory_cache.set((market, code), stock_info, ttl=ttl_hours * 3600)
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                # 使用 Alpha Vantage API 查詢美股基本信息
-                url = self.alpha_vantage_base_url
-                params = {
-                    'function': 'SYMBOL_SEARCH',
-                    'keywords': code,
-                    'apikey': self.alpha_vantage_api_key
-                }
+            async with db_manager.get_async_session() as session:
+                entry = await session.scalar(
+                    select(StockValidationCache).where(
+                        StockValidationCache.market == market,
+                        StockValidationCache.code == code
+                    )
+                )
+                if entry is None:
+                    entry = StockValidationCache(market=market, code=code)
+                    session.add(entry)
                 
-                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if 'bestMatches' in data and data['bestMatches']:
-                            match = data['bestMatches'][0]
-                            if match.get('1. symbol', '').upper() == code.upper():
-                                return {
-                                    'code': code,
-                                    'name': match.get('2. name', ''),
-                                    'market': 'US',
-                                    'type': 'us_stock',
-                                    'valid': True
-                                }
+                entry.is_valid = stock_info is not None
+                entry.result = stock_info
+                entry.expires_at = datetime.utcnow() + timedelta(hours=ttl_hours)
+                await session.commit()
         except Exception as e:
-            logger.warning(f"Error validating US stock {code}: {e}")
+            logger.warning(f"Error writing validation cache for {market}:{code}: {e}")
+    
+    async def _validate_with_cache(
+        self,
+        market: str,
+        code: str,
+        fetcher: Callable[[str], Awaitable[Optional[Dict]]]
+    ) -> Optional[Dict]:
+        """經由快取驗證；同一代碼同時只發出一個請求，其他呼叫者共用結果."""
+        found, stock_info = await self._get_cached(market, code)
+        if found:
+            return stock_info
+        
+        key = (market, code)
+        future = self.inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
         
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            stock_info = await self._call_provider(market, code, fetcher)
+            future.set_result(stock_info)
+            return stock_info
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            del self.inflight[key]
+    
+    async def _call_provider(
+        self,
+        market: str,
+        code: str,
+        fetcher: Callable[[str], Awaitable[Optional[Dict]]]
+    ) -> Optional[Dict]:
+        """在供應商令牌桶與每日額度內呼叫 API，不足時延後而不阻塞擷取流程."""
+        quota = self.quotas[market]
+        if not quota.available():
+            self.deferred.add((market, code))
+            return None
+        
+        try:
+            await asyncio.wait_for(self.buckets[market].acquire(), timeout=settings.validation_max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.deferred.add((market, code))
+            return None
+        
+        if not quota.try_consume():
+            self.deferred.add((market, code))
+            return None
+        
+        try:
+            self.api_calls += 1
+            stock_info = await fetcher(code)
+        except QuotaExceededError as e:
+            logger.warning(f"{market} validation quota exhausted, deferring remaining codes: {e}")
+            quota.exhaust()
+            self.deferred.add((market, code))
+            return None
+        except Exception as e:
+            # 暫時性錯誤不寫入快取，下次會重試
+            logger.warning(f"Error validating {market} stock {code}: {e}")
+            return None
+        
+        self.deferred.discard((market, code))
+        await self._set_cached(market, code, stock_info)
+        return stock_info
+    
+    async def _record_deferred(self, article_id: str, keys: List[Tuple[str, str]]):
+        """記錄文章中延後驗證的代碼，驗證通過後由 drain_deferred 補寫回文章."""
+        try:
+            now = datetime.utcnow()
+            async with db_manager.get_async_session() as session:
+                await session.execute(insert(PendingStockValidation).values([
+                    {'id': uuid.uuid4(), 'article_id': article_id, 'market': market, 'code': code, 'created_at': now}
+                    for market, code in keys
+                ]).on_conflict_do_nothing())
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Error recording deferred validations for {article_id}: {e}")
+    
+    async def _load_pending(self) -> List[Tuple[str, str, str]]:
+        """讀取所有待補驗證的 (文章ID, market, code)."""
+        try:
+            async with db_manager.get_async_session() as session:
+                return [tuple(row) for row in (await session.execute(
+                    select(PendingStockValidation.article_id, PendingStockValidation.market, PendingStockValidation.code)
+                )).all()]
+        except Exception as e:
+            logger.warning(f"Error loading pending validations: {e}")
+            return []
+    
+    async def _apply_resolved(
+        self,
+        pending: List[Tuple[str, str, str]],
+        results: Dict[Tuple[str, str], Optional[Dict]]
+    ) -> List[str]:
+        """將驗證通過的代碼補寫回文章的 stock_symbols / stock_mentions，移除已完成的待驗證紀錄，回傳更新的文章ID."""
+        codes_by_article: Dict[str, List[str]] = {}
+        for article_id, market, code in pending:
+            if results.get((market, code)):
+                codes_by_article.setdefault(article_id, []).append(code)
+        
+        async with db_manager.get_async_session() as session:
+            articles = (await session.scalars(
+                select(PTTArticle).where(PTTArticle.article_id.in_(list(codes_by_article)))
+            )).all() if codes_by_article else []
+            
+            for article in articles:
+                symbols = list(article.stock_symbols or [])
+                mentions = dict(article.stock_mentions or {})
+                taiwan_codes, us_codes = self.extract_potential_codes(article.content or '')
+                counts = Counter(taiwan_codes + [code.upper() for code in us_codes])
+                for code in codes_by_article[article.article_id]:
+                    if code in symbols:
+                        continue
+                    symbols.append(code)
+                    # 代碼先前未通過驗證，出現次數尚未計入
+                    mentions[code] = mentions.get(code, 0) + max(1, counts[code])
+                article.stock_symbols = symbols
+                article.stock_mentions = mentions
+            
+            # 已得到結果（有效或查無）的代碼不再等待，仍被延後的保留到下次
+            await session.execute(
+                delete(PendingStockValidation).where(
+                    tuple_(PendingStockValidation.market, PendingStockValidation.code).in_(list(results))
+                )
+            )
+            await session.commit()
+        
+        article_ids = [article.article_id for article in articles]
+        # 補上的代碼同步到 article_stocks 與作者最常提及的股票
+        stock_deltas = {}
+        await refresh_article_stocks(article_ids, stock_deltas)
+        await record_author_articles([], stock_deltas)
+        return article_ids
+    
+    async def drain_deferred(self) -> int:
+        """在新的時段重新驗證先前因額度或速率延後的代碼，並補寫回提及它們的文章，回傳完成數量."""
+        pending = await self._load_pending()
+        keys = set(self.deferred) | {(market, code) for _, market, code in pending}
+        if not keys:
+            return 0
+        
+        fetchers = {'TW': self._fetch_taiwan_stock, 'US': self._fetch_us_stock}
+        keys = list(keys)
+        self.deferred.clear()
+        results = await asyncio.gather(*(
+            self._validate_with_cache(market, code, fetchers[market]) for market, code in keys
+        ))
+        # 仍被延後（或暫時性錯誤未寫入快取）的代碼沒有結果
+        resolved = {
+            key: stock_info for key, stock_info in zip(keys, results)
+            if key not in self.deferred and key in self.memory_cache
+        }
+        
+        patched = []
+        if resolved:
+            try:
+                patched = await self._apply_resolved(pending, resolved)
+            except Exception as e:
+                logger.error(f"Error applying drained validations to articles: {e}")
+        
+        logger.info(
+            f"Drained deferred validations: {len(resolved)} resolved, {len(keys) - len(resolved)} still pending, "
+            f"{len(patched)} articles updated"
+        )
+        return len(resolved)
+    
+    async def _fetch_taiwan_stock(self, code: str) -> Optional[Dict]:
+        """以 FinMind API 查詢台股基本信息，查無代碼回傳 None，API 錯誤時拋出例外."""
+        session = await http_client.get_session()
+        url = f"{self.finmind_base_url}/taiwan_stock_info"
+        params = {
+            'token': self.finmind_api_key,
+            'stock_id': code
+        }
+        
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status in (402, 429):
+                raise QuotaExceededError(f"FinMind HTTP {response.status}")
+            response.raise_for_status()
+            data = await response.json()
+        
+        if data.get('status') == 402:
+            raise QuotaExceededError(data.get('msg', 'FinMind request limit reached'))
+        if data.get('status') != 200:
+            raise RuntimeError(f"FinMind error: {data.get('msg', data.get('status'))}")
+        if not data.get('data'):
+            return None
+        
+        stock_info = data['data'][0]
+        return {
+            'code': code,
+            'name': stock_info.get('stock_name', ''),
+            'market': 'TW',
+            'type': 'taiwan_stock',
+            'valid': True
+        }
+    
+    async def _fetch_us_stock(self, code: str) -> Optional[Dict]:
+        """以 Alpha Vantage API 查詢美股基本信息，查無代碼回傳 None，API 錯誤時拋出例外."""
+        session = await http_client.get_session()
+        url = self.alpha_vantage_base_url
+        params = {
+            'function': 'SYMBOL_SEARCH',
+            'keywords': code,
+            'apikey': self.alpha_vantage_api_key
+        }
+        
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            response.raise_for_status()
+            data = await response.json()
+        
+        # 額度用盡時回傳 Note/Information 而沒有 bestMatches
+        if 'Note' in data or 'Information' in data:
+            raise QuotaExceededError(data.get('Note') or data.get('Information'))
+        if 'bestMatches' not in data:
+            raise RuntimeError(f"Alpha Vantage error: {data}")
+        
+        for match in data['bestMatches'][:1]:
+            if match.get('1. symbol', '').upper() == code.upper():
+                return {
+                    'code': code,
+                    'name': match.get('2. name', ''),
+                    'market': 'US',
+                    'type': 'us_stock',
+                    'valid': True
+                }
         return None
     
-    async def validate_stocks(self, content: str) -> List[Dict]:
-        """驗證內容中的所有股票代碼."""
+    async def validate_taiwan_stock(self, code: str) -> Optional[Dict]:
+        """驗證台股代碼並獲取基本信息（優先查詢本地主檔）."""
+        if symbol_master.has_taiwan():
+            return symbol_master.lookup_taiwan(code)
+        
+        # 主檔尚未同步時才呼叫 API（經由快取）
+        return await self._validate_with_cache('TW', code, self._fetch_taiwan_stock)
+    
+    async def validate_us_stock(self, code: str) -> Optional[Dict]:
+        """驗證美股代碼並獲取基本信息（優先查詢本地主檔）."""
+        if symbol_master.has_us():
+            return symbol_master.lookup_us(code)
+        
+        # 主檔尚未同步時才呼叫 API（經由快取）
+        return await self._validate_with_cache('US', code, self._fetch_us_stock)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """取得驗證快取的命中統計."""
+        return {
+            "memory": self.memory_cache.get_stats(),
+            "db_hits": self.db_hits,
+            "db_misses": self.db_misses,
+            "api_calls": self.api_calls,
+            "deferred": len(self.deferred),
+            "quota_remaining": {market: quota.remaining for market, quota in self.quotas.items()}
+        }
+    
+    async def validate_codes(self, taiwan_codes: List[str], us_codes: List[str]) -> List[Dict]:
+        """並發驗證一批代碼（去重後），回傳有效的股票信息."""
+        taiwan_codes = list(dict.fromkeys(taiwan_codes))
+        us_codes = list(dict.fromkeys(code.upper() for code in us_codes))
+        
+        results = await asyncio.gather(
+            *(self.validate_taiwan_stock(code) for code in taiwan_codes),
+            *(self.validate_us_stock(code) for code in us_codes)
+        )
+        return [stock_info for stock_info in results if stock_info]
+    
+    async def validate_stocks_with_mentions(
+        self,
+        content: str,
+        article_id: Optional[str] = None
+    ) -> Tuple[List[Dict], Dict[str, int]]:
+        """驗證內容中的股票代碼並比對中文公司名稱，回傳 (股票信息, 代碼 -> 提及次數).
+        
+        指定 article_id 時，記錄因額度延後驗證的代碼，之後驗證通過會補寫回該文章。
+        """
         taiwan_codes, us_codes = self.extract_potential_codes(content)
+        validated_stocks = await self.validate_codes(taiwan_codes, us_codes)
+        valid_codes = {stock['code'] for stock in validated_stocks}
         
-        validated_stocks = []
+        if article_id:
+            candidates = dict.fromkeys([('TW', code) for code in taiwan_codes] + [('US', code.upper()) for code in us_codes])
+            deferred = [key for key in candidates if key in self.deferred]
+            if deferred:
+                await self._record_deferred(article_id, deferred)
         
-        # 驗證台股代碼
-        for code in taiwan_codes:
-            stock_info = await self.validate_taiwan_stock(code)
-            if stock_info:
-                validated_stocks.append(stock_info)
+        # 代碼本身的出現次數
+        mentions: Dict[str, int] = {}
+        for code in taiwan_codes + [code.upper() for code in us_codes]:
+            if code in valid_codes:
+                mentions[code] = mentions.get(code, 0) + 1
         
-        # 驗證美股代碼
-        for code in us_codes:
-            stock_info = await self.validate_us_stock(code)
-            if stock_info:
-                validated_stocks.append(stock_info)
+        # 公司名稱與別名（由主檔建立，不需再驗證）；只回傳有代碼或股票相關詞佐證的名稱
+        for code, count in company_matcher.find_mentions(content, valid_codes).items():
+            mentions[code] = mentions.get(code, 0) + count
+            if code not in valid_codes:
+                validated_stocks.append(company_matcher.get_stock_info(code))
         
         # 去重
         seen_codes = set()
@@ -207,7 +522,12 @@ class StockValidator:
                 unique_stocks.append(stock)
         
         logger.info(f"Validated {len(unique_stocks)} stocks from content")
-        return unique_stocks
+        return unique_stocks, mentions
+    
+    async def validate_stocks(self, content: str) -> List[Dict]:
+        """驗證內容中的所有股票代碼."""
+        validated_stocks, _ = await self.validate_stocks_with_mentions(content)
+        return validated_stocks
 
 # 創建全局實例
 stock_validator = StockValidator()
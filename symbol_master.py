@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""股票代碼主檔 - 本地保存台股與美股代碼，載入記憶體供 O(1) 驗證，每日批次同步.
+
+用法:
+    python symbol_master.py --sync     # 立即從 FinMind / Alpha Vantage 批次同步
+    python symbol_master.py            # 顯示目前主檔統計
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from loguru import logger
+from sqlalchemy import func
+
+from config import settings
+from database import db_manager
+from http_client import http_client
+from models import StockSymbol
+
+class SymbolMaster:
+    """股票代碼主檔，以 dict 保存 代碼 -> 股票資訊."""
+
+    def __init__(self):
+        self.finmind_api_key = os.getenv("FINMIND_API_KEY", "")
+        self.alpha_vantage_api_key = os.getenv("ALPHA_VANTAGE_API_KEY", "")
+        self.finmind_base_url = "https://api.finmindtrade.com/api/v4"
+        self.alpha_vantage_base_url = "https://www.alphavantage.co/query"
+
+        self.taiwan: Dict[str, Dict] = {}
+        self.us: Dict[str, Dict] = {}
+        self.loaded = False
+        self.version = 0  # 每次重新載入遞增，供名稱比對器判斷是否需要重建
+        self.last_synced: Optional[datetime] = None
+        self.last_sync_attempt: Optional[datetime] = None
+        self.sync_lock = asyncio.Lock()
+
+    @staticmethod
+    def _to_record(row: StockSymbol) -> Dict:
+        """轉為與 API 驗證相同格式的股票資訊."""
+        return {
+            'code': row.code,
+            'name': row.name or '',
+            'market': row.market,
+            'type': 'taiwan_stock' if row.market == 'TW' else 'us_stock',
+            'valid': True
+        }
+
+    def load(self) -> bool:
+        """從資料庫載入主檔到記憶體."""
+        try:
+            with db_manager.get_session() as session:
+                rows = session.query(StockSymbol).all()
+                self.last_synced = session.query(func.max(StockSymbol.updated_at)).scalar()
+
+            taiwan, us = {}, {}
+            for row in rows:
+                target = taiwan if row.market == 'TW' else us
+                target[row.code] = self._to_record(row)
+            self.taiwan, self.us = taiwan, us
+            self.version += 1
+            logger.info(f"Loaded symbol master: {len(self.taiwan)} TW, {len(self.us)} US symbols")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading symbol master: {e}")
+            return False
+        finally:
+            # 載入失敗也不在熱路徑上重複嘗試，交給下次同步
+            self.loaded = True
+
+    def _ensure_loaded(self):
+        """首次查詢時載入主檔."""
+        if not self.loaded:
+            self.load()
+
+    def has_taiwan(self) -> bool:
+        """台股主檔是否可用."""
+        self._ensure_loaded()
+        return bool(self.taiwan)
+
+    def has_us(self) -> bool:
+        """美股主檔是否可用."""
+        self._ensure_loaded()
+        return bool(self.us)
+
+    def lookup_taiwan(self, code: str) -> Optional[Dict]:
+        """查詢台股代碼，不存在時回傳 None."""
+        self._ensure_loaded()
+        return self.taiwan.get(code)
+
+    def lookup_us(self, code: str) -> Optional[Dict]:
+        """查詢美股代碼，不存在時回傳 None."""
+        self._ensure_loaded()
+        return self.us.get(code.upper())
+
+    async def fetch_taiwan_symbols(self) -> List[Dict]:
+        """以 FinMind TaiwanStockInfo 一次取得所有上市/上櫃代碼."""
+        try:
+            session = await http_client.get_session()
+            params = {'dataset': 'TaiwanStockInfo', 'token': self.finmind_api_key}
+            async with session.get(
+                f"{self.finmind_base_url}/data",
+                params=params,
+                timeout=aiohttp.ClientTimeout(total=60)
+            ) as response:
+                if response.status != 200:
+                    logger.error(f"FinMind TaiwanStockInfo error: {response.status}")
+                    return []
+                data = await response.json()
+
+            symbols = {}
+            for item in data.get('data') or []:
+                code = (item.get('stock_id') or '').strip()
+                # 同一代碼可能因多個產業別重複出現
+                if code and code not in symbols:
+                    symbols[code] = {
+                        'market': 'TW',
+                        'code': code,
+                        'name': item.get('stock_name', ''),
+                        'exchange': item.get('type', ''),
+                        'category': item.get('industry_category', '')
+                    }
+            logger.info(f"Fetched {len(symbols)} Taiwan symbols from FinMind")
+            return list(symbols.values())
+        except Exception as e:
+            logger.error(f"Error fetching Taiwan symbols: {e}")
+            return []
+
+    async def fetch_us_symbols(self) -> List[Dict]:
+        """以 Alpha Vantage LISTING_STATUS（CSV）一次取得所有上市中的美股代碼."""
+        try:
+            session = await http_client.get_session()
+            params = {'function': 'LISTING_STATUS', 'apikey': self.alpha_vantage_api_key}
+            async with session.get(
+                self.alpha_vantage_base_url,
+                params=params,
+                timeout=aiohttp.ClientTimeout(total=120)
+            ) as response:
+                if response.status != 200:
+                    logger.error(f"Alpha Vantage LISTING_STATUS error: {response.status}")
+                    return []
+                text = await response.text()
+
+            # 額度用盡或金鑰錯誤時回傳的是 JSON 訊息而非 CSV
+            if not text.lstrip().lower().startswith('symbol'):
+                logger.error(f"Unexpected LISTING_STATUS response: {text[:200]}")
+                return []
+
+            symbols = {}
+            for row in csv.DictReader(io.StringIO(text)):
+                code = (row.get('symbol') or '').strip().upper()
+                if code and row.get('status', 'Active') == 'Active' and code not in symbols:
+                    symbols[code] = {
+                        'market': 'US',
+                        'code': code,
+                        'name': row.get('name', ''),
+                        'exchange': row.get('exchange', ''),
+                        'category': row.get('assetType', '')
+                    }
+            logger.info(f"Fetched {len(symbols)} US symbols from Alpha Vantage")
+            return list(symbols.values())
+        except Exception as e:
+            logger.error(f"Error fetching US symbols: {e}")
+            return []
+
+    def _replace_market(self, market: str, symbols: List[Dict]) -> int:
+        """以單一交易替換某市場的全部代碼."""
+        now = datetime.utcnow()
+        with db_manager.get_session() as session:
+            try:
+                session.query(StockSymbol).filter(StockSymbol.market == market).delete(synchronize_session=False)
+                session.bulk_insert_mappings(StockSymbol, [{**symbol, 'updated_at': now} for symbol in symbols])
+                session.commit()
+                return len(symbols)
+            except Exception:
+                session.rollback()
+                raise
+
+    async def sync(self) -> Dict[str, int]:
+        """批次同步兩個市場並重新載入記憶體主檔，抓取失敗的市場保留舊資料."""
+        async with self.sync_lock:
+            self.last_sync_attempt = datetime.utcnow()
+            taiwan_symbols, us_symbols = await asyncio.gather(
+                self.fetch_taiwan_symbols(),
+                self.fetch_us_symbols()
+            )
+
+            result = {'TW': 0, 'US': 0}
+            for market, symbols in (('TW', taiwan_symbols), ('US', us_symbols)):
+                if not symbols:
+                    logger.warning(f"No {market} symbols fetched, keeping existing master data")
+                    continue
+                try:
+                    result[market] = self._replace_market(market, symbols)
+                except Exception as e:
+                    logger.error(f"Error saving {market} symbols: {e}")
+
+            self.load()
+            logger.info(f"Symbol master synced: {result}")
+            return result
+
+    async def refresh_if_stale(self) -> bool:
+        """主檔超過同步間隔（或從未同步）時執行批次同步，回傳是否有同步."""
+        self._ensure_loaded()
+        interval = timedelta(hours=settings.symbol_sync_interval_hours)
+        now = datetime.utcnow()
+        if self.last_synced and now - self.last_synced < interval:
+            return False
+        # 同步失敗時（API 額度或網路問題）一小時內不重試
+        if self.last_sync_attempt and now - self.last_sync_attempt < min(interval, timedelta(hours=1)):
+            return False
+
+        await self.sync()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """取得主檔統計."""
+        return {
+            "taiwan_symbols": len(self.taiwan),
+            "us_symbols": len(self.us),
+            "last_synced": self.last_synced.isoformat() if self.last_synced else None
+        }
+
+# 創建全局實例
+symbol_master = SymbolMaster()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Stock symbol master")
+    parser.add_argument("--sync", action="store_true", help="立即批次同步股票代碼主檔")
+    args = parser.parse_args()
+
+    db_manager.create_tables()
+    try:
+        if args.sync:
+            await symbol_master.sync()
+        else:
+            symbol_master.load()
+        logger.info(f"Symbol master stats: {symbol_master.get_stats()}")
+    finally:
+        await http_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())